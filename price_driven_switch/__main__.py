@@ -1,24 +1,55 @@
+import argparse
 import asyncio
+import json
 import os
 import sys
-from collections.abc import AsyncGenerator, Hashable
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Hashable, Mapping
 from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Annotated, Any
+from uuid import uuid4
 
-import pandas as pd
 import uvicorn
-from fastapi import FastAPI, HTTPException, Path
+from fastapi import FastAPI, Header, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
-from price_driven_switch.backend.configuration import load_settings_file
+from price_driven_switch.backend import backtest
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.capacity_tariff import (
+    DEFAULT_CAPACITY_STEPS,
+    CapacityTracker,
+)
+from price_driven_switch.backend.configuration import settings_snapshot
+from price_driven_switch.backend.decision_loop import Decision, DecisionLoop
+from price_driven_switch.backend.decision_memo import (
+    DECISION_MEMO_POWER_STEP_W,
+    DecisionMemo,
+    limit_side,
+    power_bucket,
+    states_fingerprint,
+)
 from price_driven_switch.backend.logging_utils import (
+    log_decision_events,
     log_switch_decision_summary,
     structured_logger,
 )
-from price_driven_switch.backend.price_file import PriceFile
-from price_driven_switch.backend.prices import Prices
+from price_driven_switch.backend.power_estimator import PowerEstimator
+from price_driven_switch.backend.power_forecast import HoltForecaster
+from price_driven_switch.backend.power_history import PowerHistory
+from price_driven_switch.backend.price_prefetch import PricePrefetcher
+from price_driven_switch.backend.prices import seconds_until_next_slot
+from price_driven_switch.backend.schedule import ScheduleCache, SwitchSchedule
+from price_driven_switch.backend.sites import MultiSiteEngine, SiteDecision
 from price_driven_switch.backend.switch_logic import (
-    limit_power,
-    set_price_only_based_states,
+    SHEDDING_BUDGET_MS,
+    PowerLimitResult,
+    decide_power_limit,
+)
+from price_driven_switch.backend.switch_state import (
+    SwitchStateRecord,
+    SwitchStateStore,
 )
 from price_driven_switch.backend.tibber_connection import TibberRealtimeConnection
 
@@ -61,10 +92,47 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     global task
     task = asyncio.create_task(tibber_instance.subscribe_to_realtime_data())
     logger.info("Tibber realtime subscription task created successfully")
+    global prefetch_task
+    prefetch_task = asyncio.create_task(PricePrefetcher(schedule_cache).run())
+    logger.info("Price prefetch task created successfully")
+    global decision_task
+    tibber_instance.add_listener(
+        lambda power: power_estimator.observe_power(power, time.monotonic())
+    )
+    tibber_instance.add_listener(
+        lambda power: power_forecaster.update(power, time.monotonic())
+    )
+    tibber_instance.add_listener(
+        lambda power: capacity_tracker.add(power, datetime.now().astimezone())
+    )
+    tibber_instance.add_listener(lambda _power: decision_loop.trigger())
+    decision_task = asyncio.create_task(decision_loop.run())
+    logger.info("Switch decision task created successfully")
+    site_tasks = []
+    for site in site_engine.sites.values():
+        site.realtime.add_listener(
+            lambda _power, name=site.name: site_engine.trigger(name)
+        )
+        site_tasks.append(
+            asyncio.create_task(site.realtime.subscribe_to_realtime_data())
+        )
+        site_tasks.append(
+            asyncio.create_task(PricePrefetcher(site.schedule_cache).run())
+        )
+    if site_engine.sites:
+        site_tasks.append(asyncio.create_task(site_engine.run()))
+        logger.info(f"Serving sites: {', '.join(site_engine.sites)}")
 
     yield
 
     # Shutdown
+    decision_task.cancel()
+    prefetch_task.cancel()
+    for site_task in site_tasks:
+        site_task.cancel()
+    for site in site_engine.sites.values():
+        await site.realtime.close()
+    capacity_tracker.save()
     await tibber_instance.close()  # Gracefully close the Tibber connection
 
 
@@ -72,52 +140,223 @@ app = FastAPI(lifespan=lifespan)
 
 SETTINGS_PATH = "price_driven_switch/config/settings.toml"
 
+# Most buckets one power history request may return
+POWER_HISTORY_MAX_BUCKETS = 10_000
+
+# Longest wait of a long-poll request, and between SSE keep-alive comments
+LONG_POLL_MAX_SECONDS = 60.0
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# Decision and settings versions restart at 1 with the process, so ETags also
+# carry an id of this process to never match a tag from before a restart
+BOOT_ID = uuid4().hex
+
 # Global variables for application state
 tibber_instance: TibberRealtimeConnection | None = None
 task: asyncio.Task | None = None
+prefetch_task: asyncio.Task | None = None
+decision_task: asyncio.Task | None = None
 _last_price_offset: float = 0.5  # Cache for price offset used in logging
+_last_slot: tuple[date, int] | None = None  # Price slot of the last decision
+
+# Power limiting results, reused while their inputs repeat
+decision_memo: DecisionMemo[PowerLimitResult] = DecisionMemo()
+
+# Appliance power learned from the steps in the realtime readings
+power_estimator = PowerEstimator()
+
+# Trend of the realtime readings, for limiting ahead of time
+power_forecaster = HoltForecaster()
+
+# Monthly hourly peaks for the capacity tariff, kept across restarts
+capacity_tracker = CapacityTracker()
+# Lowest capacity limit in kW; a limit of 0 would switch the limiter off
+MIN_CAPACITY_LIMIT = 0.001
 
 # TODO: ensure its empty at startup and add logic int the power_limit to use power based then
-previous_switch_states: pd.DataFrame = pd.DataFrame(
-    {
-        "Appliance": [],
-        "Power": [],
-        "Priority": [],
-        "on": [],
-    }
-)
+switch_state_store = SwitchStateStore(ApplianceTable.empty())
 
 
-async def offset_now() -> float:
-    return Prices(await PriceFile().load_prices()).offset_now
+# Price-only states compiled per price file / settings change
+schedule_cache = ScheduleCache(SETTINGS_PATH)
 
+# Further sites served by this process, one directory each
+site_engine = MultiSiteEngine.from_directory()
 
-async def price_only_switch_states() -> pd.DataFrame:
-    global _last_price_offset
-    current_offset = await offset_now()
-    result = set_price_only_based_states(
-        settings=load_settings_file(SETTINGS_PATH), offset_now=current_offset
-    )
+
+async def current_schedule() -> SwitchSchedule:
+    try:
+        return await schedule_cache.get()
+    except LookupError as error:
+        raise HTTPException(status_code=503, detail=str(error)) from error
+
+
+async def price_only_switch_states() -> ApplianceTable:
+    global _last_price_offset, _last_slot
+    schedule = await current_schedule()
+    slot = schedule.slot_now()
+    _last_slot = (schedule.today.day, slot)
+    current_offset = schedule.offset_at(slot)
+    result = schedule.states_at(slot)
+    structured_logger.log_price_logic_result(result, current_offset)
     # Store offset for logging context
     _last_price_offset = current_offset
     return result
 
 
+def current_settings() -> Mapping[str, Any]:
+    """Read-only settings, re-read only when the settings file changes."""
+    return settings_snapshot(SETTINGS_PATH).data
+
+
 def power_limit() -> float:
-    return load_settings_file(SETTINGS_PATH)["Settings"]["MaxPower"]
+    return current_settings()["Settings"]["MaxPower"]
+
+
+def memo_power_step() -> int:
+    """Width in W of the power buckets that share a memoized decision."""
+    settings = current_settings().get("Settings", {})
+    return settings.get("DecisionMemoPowerStepW", DECISION_MEMO_POWER_STEP_W)
+
+
+def capacity_steps() -> tuple[float, ...]:
+    settings = current_settings().get("Settings", {})
+    return tuple(sorted(settings.get("CapacitySteps", DEFAULT_CAPACITY_STEPS)))
+
+
+def capacity_power_limit(max_power: float) -> float:
+    """MaxPower, lowered to stay under the next capacity step when enabled."""
+    settings = current_settings().get("Settings", {})
+    if not settings.get("UseCapacityTariff", False):
+        return max_power
+    limit = capacity_tracker.power_limit(datetime.now().astimezone(), capacity_steps())
+    if limit is None:
+        return max_power
+    limit = max(limit, MIN_CAPACITY_LIMIT)
+    return limit if max_power == 0 else min(max_power, limit)
+
 
+def limited_power(power_reading: int) -> int:
+    """The reading, or the forecast power when it is higher and enabled.
 
-def create_on_status_dict(switches_df: pd.DataFrame) -> dict[Hashable | None, int]:
-    on_status_dict = {}
-    for appliance, row in switches_df.iterrows():
-        on_status_dict[appliance] = 1 if bool(row["on"]) else 0
-    return on_status_dict
+    Acting on the higher value sheds before a rising load crosses the limit
+    and holds back restoring while it rises. Without a reading the limiter
+    stays bypassed.
+    """
+    horizon = current_settings().get("Settings", {}).get("ForecastHorizonSeconds", 0)
+    forecast = power_forecaster.forecast(horizon) if horizon else None
+    if power_reading == 0 or forecast is None:
+        return power_reading
+    return max(power_reading, round(forecast))
+
+
+def use_learned_power() -> bool:
+    return current_settings().get("Settings", {}).get("UseLearnedPower", False)
+
+
+def shedding_strategy() -> tuple[str, float]:
+    """Strategy name and time budget in ms for the power limiter."""
+    settings = current_settings().get("Settings", {})
+    return (
+        settings.get("SheddingStrategy", "greedy"),
+        settings.get("SheddingBudgetMs", SHEDDING_BUDGET_MS),
+    )
+
+
+async def decide_switch_states() -> Decision:
+    """Recompute the switch states; only ever called by the decision loop."""
+    price_states = await price_only_switch_states()
+    power_reading = tibber_instance.power_reading if tibber_instance else 0
+    power_now = limited_power(power_reading)
+    current_power_limit = capacity_power_limit(power_limit())
+    strategy, budget_ms = shedding_strategy()
+    learned_power = use_learned_power()
+    current_offset = _last_price_offset
+    limit_states = (
+        power_estimator.apply(price_states) if learned_power else price_states
+    )
+    memo_key = (
+        settings_version(),
+        _last_slot,
+        states_fingerprint(price_states),
+        power_bucket(power_now, memo_power_step()),
+        limit_side(power_now, current_power_limit),
+        current_power_limit,
+        strategy,
+        budget_ms,
+        power_estimator.version if learned_power else None,
+    )
+
+    def limit_previous(previous: SwitchStateRecord) -> ApplianceTable:
+        previous_switch_states = previous.states
+        if learned_power:
+            previous_switch_states = power_estimator.apply(previous_switch_states)
+
+        def compute() -> PowerLimitResult:
+            # Log start of decision process
+            structured_logger.log_power_limit_start(
+                power_now, current_power_limit, previous_switch_states
+            )
+            result = decide_power_limit(
+                switch_states=limit_states,
+                power_limit=current_power_limit,
+                prev_states=previous_switch_states,
+                power_now=power_now,
+                strategy=strategy,
+                budget_ms=budget_ms,
+            )
+            log_decision_events(result.events)
+            return result
+
+        key = (*memo_key, states_fingerprint(previous_switch_states))
+        return decision_memo.get_or_compute(key, compute).states
+
+    record = switch_state_store.update(limit_previous)
+    power_and_price_switch_states = record.states
+    power_estimator.observe_states(power_and_price_switch_states, time.monotonic())
+
+    # Log comprehensive summary of the decision
+    log_switch_decision_summary(
+        price_states,
+        power_and_price_switch_states,
+        power_reading,
+        current_power_limit,
+        current_offset,
+    )
+
+    return Decision(
+        version=0,
+        sequence=record.sequence,
+        price_states=price_states,
+        states=power_and_price_switch_states,
+        power_now=power_reading,
+        power_limit=current_power_limit,
+        offset=current_offset,
+    )
+
+
+def seconds_until_next_decision() -> float:
+    """Time until the next price slot starts, when the states change anyway."""
+    schedule = schedule_cache.warm()
+    if schedule is None or not schedule.today.slots:
+        return seconds_until_next_slot(datetime.now(), 24)
+    return schedule.seconds_until_next_slot()
+
+
+# Single writer of the switch states, fed by power readings and slot boundaries
+decision_loop = DecisionLoop(decide_switch_states, seconds_until_next_decision)
+
+
+def create_on_status_dict(switches: ApplianceTable) -> dict[Hashable | None, int]:
+    return {
+        appliance: 1 if on else 0
+        for appliance, on in zip(switches.names, switches.on.tolist(), strict=True)
+    }
 
 
 def get_appliance_names() -> list[str]:
     """Get list of all appliance names from settings."""
-    settings = load_settings_file(SETTINGS_PATH)
-    return list(settings["Appliances"].keys())
+    return list(current_settings()["Appliances"].keys())
 
 
 def appliance_name_to_url_safe(name: str) -> str:
@@ -130,17 +369,73 @@ def url_safe_to_appliance_name(url_name: str) -> str:
     return url_name.replace("_", " ")
 
 
+def settings_version() -> int:
+    return settings_snapshot(SETTINGS_PATH).version
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def check_etag(request: Request, response: Response, etag: str) -> None:
+    """Tag the response, or answer 304 when the client already has this version."""
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+
+def decision_etag(decision: Decision) -> str:
+    return f'"{BOOT_ID}-{decision.version}-{settings_version()}"'
+
+
+def set_decision_headers(response: Response, decision: Decision) -> None:
+    """Expose which decision a response was served from."""
+    response.headers["X-Decision-Sequence"] = str(decision.sequence)
+
+
+# Fields the batch endpoint can return for each appliance
+BATCH_FIELDS = ("final", "price", "setpoint")
+
+
+def select_appliances(
+    switches: ApplianceTable, names: list[str], group: str | None
+) -> list[str]:
+    """Appliance names matching the URL-safe ``names`` and ``group``, all if none."""
+    selected = list(switches.names)
+    if group is not None:
+        selected = [
+            name
+            for name, appliance_group in zip(selected, switches.group, strict=True)
+            if appliance_group == group
+        ]
+        if not selected:
+            raise HTTPException(status_code=404, detail=f"Group '{group}' not found")
+    if names:
+        requested = [url_safe_to_appliance_name(name) for name in names]
+        for appliance_name in requested:
+            if appliance_name not in switches.names:
+                raise HTTPException(
+                    status_code=404, detail=f"Appliance '{appliance_name}' not found"
+                )
+        selected = [name for name in requested if name in selected]
+    return selected
+
+
 def get_individual_appliance_state(
-    appliance_name: str, switches_df: pd.DataFrame
+    appliance_name: str, switches: ApplianceTable
 ) -> int:
     """Get on/off state for a specific appliance."""
-    if appliance_name not in switches_df.index:
+    try:
+        index = switches.index_of(appliance_name)
+    except KeyError:
         raise HTTPException(
             status_code=404, detail=f"Appliance '{appliance_name}' not found"
-        )
+        ) from None
 
-    row = switches_df.loc[appliance_name]
-    return 1 if bool(row["on"]) else 0
+    return 1 if switches.on[index] else 0
 
 
 @app.get("/")
@@ -152,43 +447,84 @@ async def root() -> dict[str, str | dict[str, str]]:
             "all_states": "/api/",
             "appliances": "/appliances",
             "individual": "/appliance/{name}",
+            "batch": "/appliances/states",
+            "long_poll": "/api/poll?since={version}",
+            "stream": "/api/stream",
             "subscription": "/subscription_info",
+            "sites": "/sites",
+            "decision_cache": "/decision_cache",
+            "power_estimates": "/power/estimates",
+            "power_history": "/power/history?window={seconds}&resolution={seconds}",
+            "power_forecast": "/power/forecast?horizon={seconds}",
+            "capacity": "/capacity",
         },
     }
 
 
 @app.get("/api/")
-async def switch_states() -> dict[Hashable | None, int]:
-    switch_states_async = await price_only_switch_states()
-    global previous_switch_states
-    power_reading = tibber_instance.power_reading if tibber_instance else 0
-    current_power_limit = power_limit()
-    current_offset = _last_price_offset
-
-    # Log start of decision process
-    structured_logger.log_power_limit_start(
-        power_reading, current_power_limit, previous_switch_states
-    )
+async def switch_states(
+    request: Request, response: Response
+) -> dict[Hashable | None, int]:
+    # With the decision task running this only reads the published snapshot
+    decision = await decision_loop.latest()
+    check_etag(request, response, decision_etag(decision))
+    set_decision_headers(response, decision)
+    return create_on_status_dict(decision.states)
+
+
+@app.get("/api/poll")
+async def poll_switch_states(
+    response: Response,
+    since: Annotated[int, Query(ge=0, description="Last version seen")] = 0,
+    timeout: Annotated[
+        float, Query(gt=0, le=LONG_POLL_MAX_SECONDS, description="Seconds to wait")
+    ] = 30.0,
+) -> dict[str, Any]:
+    """Long-poll: answer once the states differ from version ``since``.
+
+    When nothing changes within ``timeout`` the current version is returned,
+    and the client polls again with it.
+    """
+    decision = await decision_loop.wait_for_version(since, timeout)
+    set_decision_headers(response, decision)
+    return {
+        "version": decision.version,
+        "states": create_on_status_dict(decision.states),
+    }
 
-    power_and_price_switch_states = limit_power(
-        switch_states=switch_states_async,
-        power_limit=current_power_limit,
-        prev_states=previous_switch_states,
-        power_now=power_reading,
-    )
 
-    # Log comprehensive summary of the decision
-    log_switch_decision_summary(
-        switch_states_async,
-        power_and_price_switch_states,
-        power_reading,
-        current_power_limit,
-        current_offset,
+async def switch_state_events(request: Request, since: int) -> AsyncIterator[str]:
+    """Server-sent events with the switch states, sent whenever they change."""
+    version = since
+    while not await request.is_disconnected():
+        decision = await decision_loop.wait_for_version(version, SSE_KEEPALIVE_SECONDS)
+        if decision.version != version:
+            # Also after a restart reset the versions below the client's
+            version = decision.version
+            payload = json.dumps(create_on_status_dict(decision.states))
+            yield f"id: {version}\nevent: states\ndata: {payload}\n\n"
+        elif not decision_loop.running:
+            # Without the decision task no change will ever arrive
+            return
+        else:
+            yield ": keep-alive\n\n"
+
+
+@app.get("/api/stream")
+async def stream_switch_states(
+    request: Request,
+    since: Annotated[int, Query(ge=0, description="Last version seen")] = 0,
+    last_event_id: Annotated[int | None, Header()] = None,
+) -> StreamingResponse:
+    """Push the switch states to the client as server-sent events."""
+    # Reconnecting EventSource clients resume from the last event they got
+    start = last_event_id if last_event_id is not None else since
+    return StreamingResponse(
+        switch_state_events(request, start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
     )
 
-    previous_switch_states = power_and_price_switch_states
-    return create_on_status_dict(power_and_price_switch_states)
-
 
 @app.get("/subscription_info")
 async def subscription_info() -> dict[str, int | str]:
@@ -203,67 +539,224 @@ async def subscription_info() -> dict[str, int | str]:
     }
 
 
+@app.get("/decision_cache")
+async def decision_cache_stats() -> dict[str, int]:
+    """Hit and miss counters of the power limiting memo."""
+    return decision_memo.stats()
+
+
+@app.get("/power/history")
+async def power_history(
+    window: Annotated[
+        float, Query(gt=0, description="Seconds of history up to now")
+    ] = 24 * 3600.0,
+    resolution: Annotated[float, Query(gt=0, description="Seconds per bucket")] = 300.0,
+    field: Annotated[str, Query(description="liveMeasurement field")] = "power",
+) -> dict[str, Any]:
+    """Min, mean and max of the realtime readings per bucket."""
+    if window / resolution > POWER_HISTORY_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {POWER_HISTORY_MAX_BUCKETS} buckets per request",
+        )
+    history = tibber_instance.history if tibber_instance else PowerHistory(capacity=1)
+    if field not in history.fields:
+        raise HTTPException(status_code=422, detail=f"Unknown field: {field}")
+    return {
+        "field": field,
+        "resolution": resolution,
+        **history.downsample(window, resolution, time.time(), field),
+    }
+
+
+@app.get("/power/forecast")
+async def power_forecast(
+    horizon: Annotated[
+        float, Query(ge=0, le=3600, description="Seconds after the last reading")
+    ] = 60.0,
+) -> dict[str, float | None]:
+    """Forecast power in W from the trend of the realtime readings."""
+    return {
+        "horizon": horizon,
+        "power": power_forecaster.forecast(horizon),
+        "trend": power_forecaster.trend,
+    }
+
+
+@app.get("/capacity")
+async def capacity_status() -> dict[str, Any]:
+    """Capacity tariff peaks of the month and the power that keeps the step."""
+    return capacity_tracker.status(datetime.now().astimezone(), capacity_steps())
+
+
+@app.get("/power/estimates")
+async def power_estimates() -> dict[str, float]:
+    """Learned power in kW of the appliances with enough observed switches."""
+    estimates = {
+        name: power_estimator.estimate(name) for name in power_estimator.medians
+    }
+    return {name: kw for name, kw in estimates.items() if kw is not None}
+
+
 @app.get("/previous_setpoints")
-async def previous_setpoints() -> dict[Hashable | None, int]:
-    return create_on_status_dict(await price_only_switch_states())
+async def previous_setpoints(
+    request: Request, response: Response
+) -> dict[Hashable | None, int]:
+    decision = await decision_loop.latest()
+    check_etag(request, response, decision_etag(decision))
+    set_decision_headers(response, decision)
+    return create_on_status_dict(decision.price_states)
 
 
 @app.get("/appliances")
-async def list_appliances() -> dict[str, list[str]]:
+async def list_appliances(request: Request, response: Response) -> dict[str, list[str]]:
     """List all available appliances with URL-safe names."""
+    check_etag(request, response, f'"{BOOT_ID}-settings-{settings_version()}"')
     appliance_names = get_appliance_names()
     url_safe_names = [appliance_name_to_url_safe(name) for name in appliance_names]
     return {"appliances": url_safe_names}
 
 
+@app.get("/appliances/states")
+async def get_appliance_states(
+    response: Response,
+    names: Annotated[
+        list[str] | None, Query(description="URL-safe appliance names, all if empty")
+    ] = None,
+    group: Annotated[str | None, Query(description="Only appliances in group")] = None,
+    fields: Annotated[
+        list[str] | None,
+        Query(description="Fields to return: final (default), price, setpoint"),
+    ] = None,
+) -> dict[str, Any]:
+    """States of several appliances, all answered from one decision."""
+    fields = fields or ["final"]
+    unknown_fields = sorted(set(fields) - set(BATCH_FIELDS))
+    if unknown_fields:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown fields: {', '.join(unknown_fields)}"
+        )
+
+    decision = await decision_loop.latest()
+    set_decision_headers(response, decision)
+    states = decision.states
+    price_states = decision.price_states
+
+    appliances = {}
+    for appliance_name in select_appliances(price_states, names or [], group):
+        values: dict[str, int | float] = {}
+        if "final" in fields:
+            values["final"] = get_individual_appliance_state(appliance_name, states)
+        if "price" in fields:
+            values["price"] = get_individual_appliance_state(
+                appliance_name, price_states
+            )
+        if "setpoint" in fields:
+            values["setpoint"] = float(
+                price_states.setpoint[price_states.index_of(appliance_name)]
+            )
+        appliances[appliance_name_to_url_safe(appliance_name)] = values
+
+    return {
+        "sequence": decision.sequence,
+        "offset": decision.offset,
+        "appliances": appliances,
+    }
+
+
 @app.get("/appliance/{appliance_name}")
 async def get_appliance_state(
+    response: Response,
     appliance_name: str = Path(..., description="URL-safe name of the appliance"),
 ) -> int:
     """Get on/off state for a specific appliance by URL-safe name."""
     # Convert URL-safe name back to actual appliance name
     actual_appliance_name = url_safe_to_appliance_name(appliance_name)
 
-    switch_states_async = await price_only_switch_states()
-    global previous_switch_states
-    power_reading = tibber_instance.power_reading if tibber_instance else 0
-    current_power_limit = power_limit()
-    current_offset = _last_price_offset
-
-    power_and_price_switch_states = limit_power(
-        switch_states=switch_states_async,
-        power_limit=current_power_limit,
-        prev_states=previous_switch_states,
-        power_now=power_reading,
-    )
-
-    # Only log summary for individual calls if it's different from recent bulk call
-    log_switch_decision_summary(
-        switch_states_async,
-        power_and_price_switch_states,
-        power_reading,
-        current_power_limit,
-        current_offset,
-    )
-
-    previous_switch_states = power_and_price_switch_states
-
-    return get_individual_appliance_state(
-        actual_appliance_name, power_and_price_switch_states
-    )
+    decision = await decision_loop.latest()
+    set_decision_headers(response, decision)
+    return get_individual_appliance_state(actual_appliance_name, decision.states)
 
 
 @app.get("/appliance/{appliance_name}/previous")
 async def get_appliance_previous_state(
+    response: Response,
     appliance_name: str = Path(..., description="URL-safe name of the appliance"),
 ) -> int:
     """Get previous price-only on/off state for a specific appliance by URL-safe name."""
     # Convert URL-safe name back to actual appliance name
     actual_appliance_name = url_safe_to_appliance_name(appliance_name)
 
-    price_only_states = await price_only_switch_states()
-    return get_individual_appliance_state(actual_appliance_name, price_only_states)
+    decision = await decision_loop.latest()
+    set_decision_headers(response, decision)
+    return get_individual_appliance_state(actual_appliance_name, decision.price_states)
 
 
-if __name__ == "__main__":
+async def site_decision(site: str) -> SiteDecision:
+    if site not in site_engine.sites:
+        raise HTTPException(status_code=404, detail=f"Site '{site}' not found")
+    # Only this site's snapshot is read; other sites failing do not matter
+    try:
+        return await site_engine.latest(site)
+    except LookupError as error:
+        raise HTTPException(status_code=503, detail=str(error)) from error
+
+
+@app.get("/sites")
+async def list_sites() -> dict[str, list[str]]:
+    """Sites served next to the default one, see backend.sites."""
+    return {"sites": list(site_engine.sites)}
+
+
+@app.get("/sites/{site}/api/")
+async def site_switch_states(site: str) -> dict[Hashable | None, int]:
+    decision = await site_decision(site)
+    return create_on_status_dict(decision.states)
+
+
+@app.get("/sites/{site}/previous_setpoints")
+async def site_previous_setpoints(site: str) -> dict[Hashable | None, int]:
+    decision = await site_decision(site)
+    return create_on_status_dict(decision.price_states)
+
+
+@app.get("/sites/{site}/appliance/{appliance_name}")
+async def get_site_appliance_state(
+    site: str,
+    appliance_name: str = Path(..., description="URL-safe name of the appliance"),
+) -> int:
+    decision = await site_decision(site)
+    return get_individual_appliance_state(
+        url_safe_to_appliance_name(appliance_name), decision.states
+    )
+
+
+@app.get("/sites/{site}/subscription_info")
+async def site_subscription_info(site: str) -> dict[str, int | str]:
+    if site not in site_engine.sites:
+        raise HTTPException(status_code=404, detail=f"Site '{site}' not found")
+    realtime = site_engine.sites[site].realtime
+    return {
+        "power_reading": realtime.power_reading,
+        "subscription_status": realtime.subscription_status,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m price_driven_switch")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="run the API server (default)")
+    backtest.add_arguments(
+        commands.add_parser(
+            "backtest", help="cost of a grid of setpoints on archived prices"
+        )
+    )
+    args = parser.parse_args(argv)
+    if args.command == "backtest":
+        print(backtest.run(args, current_settings()))
+        return
     uvicorn.run("__main__:app", port=8080)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Compact array-backed appliance table.
+
+The switch decisions only need names, power, priority, setpoint and on/off
+state for a handful of appliances. Keeping them in read-only NumPy arrays
+avoids building and walking pandas frames on every decision; a DataFrame is
+only made on request, e.g. for the Streamlit editor.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+def _read_only(values: Any, dtype: type) -> np.ndarray:
+    array = np.array(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+@dataclass(frozen=True, eq=False)
+class ApplianceTable:
+    """One row per appliance; power in kW. Never modified, see with_on()."""
+
+    names: tuple[str, ...]
+    power: np.ndarray
+    priority: np.ndarray
+    setpoint: np.ndarray
+    on: np.ndarray
+    group: tuple[str | None, ...]
+
+    def __post_init__(self) -> None:
+        count = len(self.names)
+        for field, dtype in (
+            ("power", float),
+            ("priority", np.int64),
+            ("setpoint", float),
+            ("on", bool),
+        ):
+            array = _read_only(getattr(self, field), dtype)
+            if array.shape != (count,):
+                raise ValueError(f"Expected {count} values for {field}")
+            object.__setattr__(self, field, array)
+
+    @classmethod
+    def from_settings(cls, settings: Mapping[str, Any]) -> "ApplianceTable":
+        """Appliances of a settings dict, all switched off."""
+        appliances = settings["Appliances"]
+        names = tuple(appliances)
+        return cls(
+            names=names,
+            power=[appliances[name]["Power"] for name in names],
+            priority=[appliances[name]["Priority"] for name in names],
+            setpoint=[appliances[name].get("Setpoint", np.nan) for name in names],
+            on=np.zeros(len(names), dtype=bool),
+            group=tuple(appliances[name].get("Group") for name in names),
+        )
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "ApplianceTable":
+        """Table of a switch state frame, missing columns get neutral values."""
+        count = len(frame)
+
+        def column(name: str, default: Any) -> Any:
+            if name in frame:
+                return frame[name].to_numpy()
+            return np.full(count, default)
+
+        groups = frame["Group"] if "Group" in frame else pd.Series([None] * count)
+        return cls(
+            names=tuple(str(name) for name in frame.index),
+            power=column("Power", 0.0),
+            priority=column("Priority", 0),
+            setpoint=column("Setpoint", np.nan),
+            on=np.asarray(column("on", False), dtype=bool),
+            group=tuple(None if pd.isna(group) else group for group in groups),
+        )
+
+    @classmethod
+    def empty(cls) -> "ApplianceTable":
+        return cls(names=(), power=[], priority=[], setpoint=[], on=[], group=())
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def with_on(self, on: np.ndarray) -> "ApplianceTable":
+        """A copy of the table with new on/off states."""
+        return replace(self, on=on)
+
+    def with_power(self, power: np.ndarray) -> "ApplianceTable":
+        """A copy of the table with other power values, e.g. learned ones."""
+        return replace(self, power=power)
+
+    def index_of(self, name: str) -> int:
+        """Row of appliance ``name``, raises KeyError for unknown names."""
+        try:
+            return self.names.index(name)
+        except ValueError:
+            raise KeyError(name) from None
+
+    def same_appliances(self, other: "ApplianceTable") -> bool:
+        """Equal in everything but the on/off states."""
+        return (
+            self.names == other.names
+            and self.group == other.group
+            and np.array_equal(self.power, other.power)
+            and np.array_equal(self.priority, other.priority)
+            and np.array_equal(self.setpoint, other.setpoint, equal_nan=True)
+        )
+
+    def states_equal(self, other: "ApplianceTable") -> bool:
+        return self.names == other.names and np.array_equal(self.on, other.on)
+
+    def on_names(self) -> list[str]:
+        return [name for name, on in zip(self.names, self.on, strict=True) if on]
+
+    def off_names(self) -> list[str]:
+        return [name for name, on in zip(self.names, self.on, strict=True) if not on]
+
+    def on_dict(self) -> dict[str, bool]:
+        return dict(zip(self.names, self.on.tolist(), strict=True))
+
+    def power_on(self) -> float:
+        """Total power of the appliances that are on, in kW."""
+        return float(self.power[self.on].sum())
+
+    def to_frame(self) -> pd.DataFrame:
+        """The table as a DataFrame indexed by appliance name."""
+        columns: dict[str, Any] = {
+            "Power": self.power,
+            "Priority": self.priority,
+            "Setpoint": self.setpoint,
+        }
+        if any(group is not None for group in self.group):
+            columns["Group"] = list(self.group)
+        columns["on"] = self.on
+        frame = pd.DataFrame(columns, index=pd.Index(self.names, name="Appliance"))
+        return frame.copy()  # writable arrays for the caller
+
+
+def as_table(states: "ApplianceTable | pd.DataFrame") -> ApplianceTable:
+    """Accept either representation of switch states."""
+    if isinstance(states, ApplianceTable):
+        return states
+    return ApplianceTable.from_frame(states)
@@ -0,0 +1,156 @@
+"""
+Backtest of setpoints on archived prices.
+
+Each archived day is ranked the way the switch ranks it, and the price-only
+rule (ON when the setpoint is at or above the slot's offset) is evaluated for
+a whole grid of setpoints at once, as one days x slots x setpoints array. The
+result is the on-hours and the cost per kW of appliance power of every
+setpoint, which scales to each appliance by its power.
+"""
+
+import argparse
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.grid_rent import add_grid_rent_to_prices
+from price_driven_switch.backend.price_archive import PATH_PRICE_ARCHIVE, PriceArchive
+from price_driven_switch.backend.price_rank import rank_index
+from price_driven_switch.backend.price_slots import day_bounds, local_midnight
+
+# Setpoints are set in steps of an hour of the day in the Dashboard
+SETPOINT_STEPS = 24
+
+
+@dataclass(frozen=True)
+class PriceDays:
+    """Archived days as padded days x slots arrays."""
+
+    days: tuple[date, ...]
+    prices: np.ndarray  # NOK/kWh, 0 in padding
+    offsets: np.ndarray  # offset of every slot, inf in padding
+    hours: np.ndarray  # length of every slot in hours, 0 in padding
+
+
+@dataclass(frozen=True)
+class BacktestResult:
+    """Totals over all days per setpoint, for 1 kW of appliance power."""
+
+    days: int
+    setpoints: np.ndarray
+    on_hours: np.ndarray
+    cost_per_kw: np.ndarray  # NOK
+
+    def for_appliances(self, table: ApplianceTable) -> pd.DataFrame:
+        """Energy and cost of every appliance at every setpoint."""
+        frame = pd.DataFrame(
+            {
+                "appliance": np.repeat(table.names, len(self.setpoints)),
+                "setpoint": np.tile(self.setpoints, len(table)),
+                "on_hours": np.tile(self.on_hours, len(table)),
+                "energy_kwh": np.outer(table.power, self.on_hours).ravel(),
+                "cost": np.outer(table.power, self.cost_per_kw).ravel(),
+            }
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Energy-weighted average price in NOK/kWh
+            frame["average_price"] = np.tile(
+                self.cost_per_kw / self.on_hours, len(table)
+            )
+        return frame
+
+
+def price_days(
+    archive: PriceArchive,
+    start: date,
+    end: date,
+    grid_rent: Mapping[str, Any] | None = None,
+) -> PriceDays:
+    """Load and rank the archived days from ``start`` to ``end``.
+
+    With ``grid_rent`` configured it is added to the prices, as the switch
+    does when ranking them.
+    """
+    index = archive.index()
+    selected = index[
+        (index["day"] >= start.toordinal()) & (index["day"] <= end.toordinal())
+    ]
+    archived = archive.read(start, end)
+    width = int(selected["count"].max()) if len(selected) else 0
+    prices = np.zeros((len(selected), width))
+    offsets = np.full((len(selected), width), np.inf)
+    hours = np.zeros((len(selected), width))
+
+    row = 0
+    for number, record in enumerate(selected):
+        count = int(record["count"])
+        day = date.fromordinal(int(record["day"]))
+        starts = archived.starts[row : row + count]
+        day_prices = archived.prices[row : row + count].astype(float)
+        row += count
+        if grid_rent:
+            slot_starts = [datetime.fromtimestamp(int(second)) for second in starts]
+            day_prices = np.asarray(
+                add_grid_rent_to_prices(
+                    day_prices.tolist(),
+                    local_midnight(day),
+                    dict(grid_rent),
+                    slot_starts,
+                )
+            )
+        ends = np.append(starts[1:], day_bounds(day)[1])
+        prices[number, :count] = day_prices
+        offsets[number, :count] = rank_index(day_prices.tolist()).offsets
+        hours[number, :count] = (ends - starts) / 3600
+    days = tuple(date.fromordinal(int(day)) for day in selected["day"])
+    return PriceDays(days, prices, offsets, hours)
+
+
+def backtest(price_days: PriceDays, setpoints: Sequence[float]) -> BacktestResult:
+    """On-hours and cost per kW of every setpoint over all days."""
+    setpoint_array = np.asarray(setpoints, dtype=float)
+    # Same rule as get_price_based_states: ON when setpoint >= offset
+    on = (
+        setpoint_array[np.newaxis, np.newaxis, :]
+        >= price_days.offsets[:, :, np.newaxis]
+    )
+    on_hours = np.einsum("dsk,ds->k", on, price_days.hours)
+    cost_per_kw = np.einsum("dsk,ds->k", on, price_days.hours * price_days.prices)
+    return BacktestResult(len(price_days.days), setpoint_array, on_hours, cost_per_kw)
+
+
+def setpoint_grid(table: ApplianceTable, steps: int = SETPOINT_STEPS) -> np.ndarray:
+    """Setpoints in ``steps`` even steps from 0 to 1, plus the configured ones."""
+    return np.union1d(np.linspace(0, 1, steps + 1), table.setpoint)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--steps", type=int, default=SETPOINT_STEPS)
+    parser.add_argument("--archive", default=PATH_PRICE_ARCHIVE)
+
+
+def run(args: argparse.Namespace, settings: Mapping[str, Any]) -> str:
+    """Backtest the configured appliances; returns the report to print."""
+    table = ApplianceTable.from_settings(settings)
+    options = settings.get("Settings", {})
+    grid_rent = (
+        options.get("GridRent") if options.get("IncludeGridRent", True) else None
+    )
+    days = price_days(PriceArchive(args.archive), args.start, args.end, grid_rent)
+    if not days.days:
+        return f"No archived prices from {args.start} to {args.end}"
+    result = backtest(days, setpoint_grid(table, args.steps))
+    frame = result.for_appliances(table)
+    configured = frame["setpoint"].to_numpy() == np.repeat(
+        table.setpoint, len(result.setpoints)
+    )
+    frame["configured"] = np.where(configured, "*", "")
+    header = f"{result.days} days from {days.days[0]} to {days.days[-1]}"
+    return header + "\n" + frame.to_string(index=False, float_format="{:.3f}".format)
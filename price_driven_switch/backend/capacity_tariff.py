@@ -0,0 +1,205 @@
+"""
+Capacity tariff (effekttrinn) tracking.
+
+Norwegian grid companies bill a monthly capacity step chosen by the average of
+the three highest hourly energy uses, taken from three different days of the
+month. The tracker integrates the realtime power into hourly kWh, keeps the
+three highest daily peaks of the month in a bounded heap and stores them in a
+small JSON file, so a restart does not forget the month. Hours are kept as
+aware local times, so the hour repeated when daylight saving time ends is an
+hour of its own instead of restarting the one before it.
+
+From the peaks it derives the power that keeps the rest of the current hour
+below the next capacity step, which the power limiter can use as its limit.
+"""
+
+import bisect
+import heapq
+import json
+import os
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from tempfile import NamedTemporaryFile
+
+from loguru import logger
+
+PATH_CAPACITY_PEAKS = "price_driven_switch/config/capacity_peaks.json"
+# Typical step boundaries in kW (kWh per hour) of the Norwegian grid companies
+DEFAULT_CAPACITY_STEPS = (2.0, 5.0, 10.0, 15.0, 20.0, 25.0, 50.0, 75.0, 100.0)
+# Readings further apart than this are a gap in the data, not a constant load
+MAX_READING_GAP_SECONDS = 300
+# Spread the remaining energy over at least this long at the end of an hour
+MIN_REMAINING_SECONDS = 60
+PEAK_DAYS = 3
+
+
+def _local(moment: datetime) -> datetime:
+    """``moment`` as an aware local time; naive times are taken as local."""
+    return moment.astimezone()
+
+
+def _hour_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class CapacityTracker:
+    def __init__(
+        self,
+        path: str | None = PATH_CAPACITY_PEAKS,
+        steps: tuple[float, ...] = DEFAULT_CAPACITY_STEPS,
+    ) -> None:
+        self.path = path
+        self.steps = tuple(sorted(steps))
+        self.month: str | None = None
+        # Min-heap of (kWh, day) of the highest completed days of the month
+        self.peaks: list[tuple[float, str]] = []
+        self.day: str | None = None
+        self.day_peak = 0.0  # highest completed hour of the day, kWh
+        self.hour: datetime | None = None
+        self.hour_energy = 0.0  # kWh so far in the current hour
+        self._last: tuple[datetime, float] | None = None
+        self._load()
+
+    def add(self, power: float, now: datetime) -> None:
+        """Integrate a realtime reading in W taken at ``now``."""
+        now = _local(now)
+        if self.hour is None or now < self.hour:
+            self._start_hour(_hour_start(now))
+        last = self._last
+        self._last = (now, power)
+        if last is not None and (now - last[0]).total_seconds() > (
+            MAX_READING_GAP_SECONDS
+        ):
+            last = None
+        while now >= self.hour + timedelta(hours=1):
+            hour_end = self.hour + timedelta(hours=1)
+            if last is not None:
+                self._integrate(last[1], (hour_end - max(last[0], self.hour)))
+                last = (hour_end, last[1])
+            self._finish_hour()
+            self._start_hour(_hour_start(now) if last is None else hour_end)
+        if last is not None:
+            self._integrate(last[1], now - max(last[0], self.hour))
+
+    def _integrate(self, power: float, duration: timedelta) -> None:
+        self.hour_energy += power * duration.total_seconds() / 3.6e6
+
+    def _start_hour(self, hour: datetime) -> None:
+        hour = _local(hour)
+        month = hour.strftime("%Y-%m")
+        day = hour.date().isoformat()
+        if month != self.month:
+            self.month = month
+            self.peaks = []
+            self.day = day
+            self.day_peak = 0.0
+        elif day != self.day:
+            self._finish_day()
+            self.day = day
+        self.hour = hour
+        self.hour_energy = 0.0
+
+    def _finish_hour(self) -> None:
+        self.day_peak = max(self.day_peak, self.hour_energy)
+        self.save()
+
+    def _finish_day(self) -> None:
+        if self.day is None or self.day_peak <= 0:
+            self.day_peak = 0.0
+            return
+        heapq.heappush(self.peaks, (self.day_peak, self.day))
+        if len(self.peaks) > PEAK_DAYS:
+            heapq.heappop(self.peaks)
+        self.day_peak = 0.0
+
+    def today_peak(self) -> float:
+        """Highest hour of today in kWh, counting the hour in progress."""
+        return max(self.day_peak, self.hour_energy)
+
+    def top_peaks(self) -> list[float]:
+        """Highest daily peaks of the month in kWh, highest first."""
+        peaks = [kwh for kwh, _ in self.peaks]
+        if self.today_peak() > 0:
+            peaks.append(self.today_peak())
+        return sorted(peaks, reverse=True)[:PEAK_DAYS]
+
+    def average(self) -> float:
+        """Average of the top peaks, the value the capacity step is chosen by."""
+        peaks = self.top_peaks()
+        return sum(peaks) / len(peaks) if peaks else 0.0
+
+    def threshold(self, steps: Sequence[float] | None = None) -> float | None:
+        """Boundary in kW of the next capacity step, None above the last one.
+
+        ``steps`` must be sorted; the tracker's own steps are used without.
+        """
+        steps = self.steps if steps is None else steps
+        index = bisect.bisect_right(steps, self.average())
+        return steps[index] if index < len(steps) else None
+
+    def power_limit(
+        self, now: datetime, steps: Sequence[float] | None = None
+    ) -> float | None:
+        """Power in kW that keeps the rest of this hour under the next step."""
+        now = _local(now)
+        threshold = self.threshold(steps)
+        if threshold is None or self.hour is None:
+            return None
+        others = sorted((kwh for kwh, _ in self.peaks), reverse=True)
+        counted = others[: PEAK_DAYS - 1]
+        days = len(counted) + 1
+        # Today's peak may grow until the average of the top days reaches the step
+        allowed = max(days * threshold - sum(counted), self.day_peak)
+        remaining_kwh = max(allowed - self.hour_energy, 0.0)
+        seconds_left = (self.hour + timedelta(hours=1) - now).total_seconds()
+        return remaining_kwh * 3600 / max(seconds_left, MIN_REMAINING_SECONDS)
+
+    def status(self, now: datetime, steps: Sequence[float] | None = None) -> dict:
+        return {
+            "month": self.month,
+            "peaks": [
+                {"day": day, "kwh": kwh}
+                for kwh, day in sorted(self.peaks, reverse=True)
+            ],
+            "today_peak": self.today_peak(),
+            "hour_energy": self.hour_energy,
+            "average": self.average(),
+            "threshold": self.threshold(steps),
+            "power_limit": self.power_limit(now, steps),
+        }
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        state = {
+            "month": self.month,
+            "peaks": [[kwh, day] for kwh, day in self.peaks],
+            "day": self.day,
+            "day_peak": self.day_peak,
+            "hour": self.hour.isoformat() if self.hour else None,
+            "hour_energy": self.hour_energy,
+        }
+        try:
+            directory = os.path.dirname(self.path) or "."
+            with NamedTemporaryFile("w", dir=directory, delete=False) as tmp:
+                json.dump(state, tmp)
+            os.replace(tmp.name, self.path)
+        except OSError as error:
+            logger.warning(f"Could not save capacity peaks: {error}")
+
+    def _load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                state = json.load(file)
+            self.month = state["month"]
+            self.peaks = [(float(kwh), day) for kwh, day in state["peaks"]]
+            heapq.heapify(self.peaks)
+            self.day = state["day"]
+            self.day_peak = float(state["day_peak"])
+            hour = state["hour"]
+            self.hour = _local(datetime.fromisoformat(hour)) if hour else None
+            self.hour_energy = float(state["hour_energy"])
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            logger.warning(f"Ignoring unreadable capacity peaks file: {error}")
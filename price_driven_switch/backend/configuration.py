@@ -1,11 +1,15 @@
 # mypy: disable-error-code="index"
+import itertools
 import logging
 import os
 import threading
+from collections.abc import Mapping
 from copy import deepcopy
+from dataclasses import dataclass
 from shutil import move
 from tempfile import NamedTemporaryFile
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Literal
 
 import toml
 from dotenv import load_dotenv, set_key
@@ -159,6 +163,7 @@ class Appliance(BaseModel):
     Power: float
     Priority: int = Field(..., ge=1)
     Setpoint: float = Field(..., ge=0, le=1)  # Setpoint must be between 0 and 1
+    Group: str | None = None  # Appliances can be queried together by group
 
 
 class Settings(BaseModel):
@@ -173,6 +178,22 @@ class Settings(BaseModel):
     )
     UseNorgespris: bool = False
     NorgesprisRate: float = Field(default=50.0, ge=0)
+    # "knapsack" sheds only as much as needed, within SheddingBudgetMs
+    SheddingStrategy: Literal["greedy", "knapsack"] = "greedy"
+    SheddingBudgetMs: float = Field(default=20.0, gt=0)
+    # Power readings within this many W reuse a memoized decision
+    DecisionMemoPowerStepW: int = Field(default=1, ge=1)
+    # Limit power with the appliance power learned from realtime readings
+    UseLearnedPower: bool = False
+    # Limit on the power forecast this many seconds ahead, 0 to disable
+    ForecastHorizonSeconds: float = Field(default=0.0, ge=0)
+    # Rank each slot within the next hours across today and tomorrow, 0 ranks per day
+    RankingHorizonHours: int = Field(default=0, ge=0, le=48)
+    # Limit the power to stay under the next capacity tariff step
+    UseCapacityTariff: bool = False
+    CapacitySteps: list[float] = Field(
+        default=[2.0, 5.0, 10.0, 15.0, 20.0, 25.0, 50.0, 75.0, 100.0], min_length=1
+    )
 
 
 class TomlStructure(BaseModel):
@@ -206,17 +227,81 @@ debounce_timer = None
 file_lock = threading.Lock()
 
 
-def load_settings_file(path: str = PATH_SETTINGS) -> dict:
-    with file_lock, open(path, encoding="utf-8") as toml_file:
-        settings = toml.load(toml_file)
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Validated, read-only contents of a settings file at one point in time."""
+
+    version: int
+    signature: tuple[int, int, int] | None
+    data: Mapping[str, Any]
+
+
+# Process-wide version counter, bumped whenever any settings file is re-read
+_settings_versions = itertools.count(1)
+_settings_snapshots: dict[str, SettingsSnapshot] = {}
+
+
+def file_signature(path: str) -> tuple[int, int, int] | None:
+    """Identify a file version by inode, mtime and size, None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def settings_snapshot(path: str = PATH_SETTINGS) -> SettingsSnapshot:
+    """Return the cached settings snapshot, re-reading the file only if it changed.
+
+    A change is detected through the file's inode, mtime and size, which also
+    catches the atomic replace done by save_settings and writes from the other
+    process. Parsing and validation run once per snapshot version.
+    """
+    path = str(path)
+    snapshot = _settings_snapshots.get(path)
+    if snapshot is not None and snapshot.signature == file_signature(path):
+        return snapshot
+
+    with file_lock:
+        signature = file_signature(path)
+        with open(path, encoding="utf-8") as toml_file:
+            settings = toml.load(toml_file)
         # Ensure grid rent settings are present
         settings = ensure_grid_rent_settings(settings)
         validate_settings(settings)
-        return settings
+        snapshot = SettingsSnapshot(
+            version=next(_settings_versions),
+            signature=signature,
+            data=_freeze(settings),
+        )
+        _settings_snapshots[path] = snapshot
+        logger.debug(f"Loaded settings from {path} as version {snapshot.version}")
+    return snapshot
+
+
+def load_settings_file(path: str = PATH_SETTINGS) -> dict:
+    """Return a mutable copy of the current settings, safe for editing."""
+    return _thaw(settings_snapshot(path).data)
 
 
-def load_global_settings() -> dict:
-    return load_settings_file().get("Settings", {})
+def load_global_settings() -> Mapping[str, Any]:
+    return settings_snapshot().data.get("Settings", {})
 
 
 def update_max_power(data_dict: dict[str, Any], new_max_power: float) -> dict[str, Any]:
@@ -0,0 +1,85 @@
+"""
+Events produced by the switch decision core.
+
+The decision functions in switch_logic never log. They return the new states
+together with a list of these events, and callers decide what to do with
+them: logging_utils.log_decision_events() writes the usual log lines, a
+backtest or fuzzer can simply ignore them.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+
+
+@dataclass(frozen=True)
+class PowerLimitBypassed:
+    """No power limit or no power reading, the price-only states are used."""
+
+
+@dataclass(frozen=True)
+class PowerChecked:
+    """Power compared with the limit; ``action`` is OK, OVER or RESERVE."""
+
+    power_now: int
+    power_limit: float
+    action: str
+    details: str | None = None
+
+
+@dataclass(frozen=True, eq=False)
+class AppliancesSwitched:
+    """The limiter switched the ``rows`` of ``table`` ON or OFF.
+
+    One event for all rows, so large tables do not allocate per appliance.
+    """
+
+    table: ApplianceTable
+    rows: np.ndarray
+    on: bool
+
+    def __iter__(self) -> Iterator[tuple[str, float, int]]:
+        """Name, power and priority of every switched appliance."""
+        rows = self.rows.tolist()
+        return zip(
+            [self.table.names[row] for row in rows],
+            self.table.power[rows].tolist(),
+            self.table.priority[rows].tolist(),
+            strict=True,
+        )
+
+
+@dataclass(frozen=True)
+class SheddingBudgetExceeded:
+    """The knapsack strategy ran out of time and greedy shedding was used."""
+
+    budget_ms: float
+
+
+@dataclass(frozen=True)
+class DecisionSummary:
+    """Final states next to the price-only states they were limited from."""
+
+    price_states: ApplianceTable
+    final_states: ApplianceTable
+    power_now: int
+    power_limit: float
+    price_offset: float
+
+
+@dataclass(frozen=True)
+class UnexpectedState:
+    message: str
+
+
+DecisionEvent = (
+    PowerLimitBypassed
+    | PowerChecked
+    | AppliancesSwitched
+    | SheddingBudgetExceeded
+    | DecisionSummary
+    | UnexpectedState
+)
@@ -0,0 +1,125 @@
+"""
+Single-writer decision loop.
+
+Every realtime power reading and every price slot boundary triggers exactly one
+recomputation of the switch states. The result is published as a versioned,
+read-only snapshot that the HTTP endpoints serve without recomputing.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, replace
+
+from loguru import logger
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+
+
+@dataclass(frozen=True)
+class Decision:
+    """One recomputation of the switch states. Must not be modified.
+
+    ``version`` only changes when the price-only or final on/off states do,
+    ``sequence`` is the sequence number of the switch state record the
+    decision produced.
+    """
+
+    version: int
+    sequence: int
+    price_states: ApplianceTable
+    states: ApplianceTable
+    power_now: int
+    power_limit: float
+    offset: float
+
+
+class DecisionLoop:
+    """Owns the switch decisions; only recompute() publishes a new snapshot.
+
+    While run() is active the endpoints read the latest snapshot. Without a
+    running loop, e.g. before the lifespan started it, latest() recomputes on
+    demand, still one decision at a time.
+    """
+
+    def __init__(
+        self,
+        decide: Callable[[], Awaitable[Decision]],
+        seconds_until_boundary: Callable[[], float],
+    ) -> None:
+        self._decide = decide
+        self._seconds_until_boundary = seconds_until_boundary
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._version = 0
+        self._changed = asyncio.Event()
+        self.snapshot: Decision | None = None
+        self.running = False
+
+    def trigger(self) -> None:
+        """Request a recomputation, e.g. for a new power reading."""
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        self.running = True
+        try:
+            while True:
+                try:
+                    await self.recompute()
+                except Exception as error:
+                    # Keep serving the last snapshot until the next trigger
+                    logger.warning(f"Switch decision failed: {error}")
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=self._seconds_until_boundary()
+                    )
+                except TimeoutError:
+                    pass  # slot boundary reached
+                self._wakeup.clear()
+        finally:
+            self.running = False
+
+    async def recompute(self) -> Decision:
+        async with self._lock:
+            decision = await self._decide()
+            changed = self.snapshot is None or _states_changed(self.snapshot, decision)
+            if changed:
+                self._version += 1
+            self.snapshot = replace(decision, version=self._version)
+            if changed:
+                # Wake everyone waiting for a newer version
+                self._changed.set()
+                self._changed = asyncio.Event()
+            return self.snapshot
+
+    async def latest(self) -> Decision:
+        if self.running and self.snapshot is not None:
+            return self.snapshot
+        return await self.recompute()
+
+    async def wait_for_version(self, since: int, timeout: float) -> Decision:
+        """Return the first snapshot newer than ``since``.
+
+        Gives up after ``timeout`` seconds and returns the current snapshot.
+        Without a running loop nothing changes by itself, so the current
+        snapshot is returned at once. A ``since`` ahead of the current version
+        was seen before a restart reset the versions, so it is answered at
+        once as well.
+        """
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            changed = self._changed
+            decision = await self.latest()
+            remaining = deadline - asyncio.get_running_loop().time()
+            if decision.version != since or not self.running or remaining <= 0:
+                return decision
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=remaining)
+            except TimeoutError:
+                return await self.latest()
+
+
+def _states_changed(previous: Decision, decision: Decision) -> bool:
+    return not (
+        previous.states.states_equal(decision.states)
+        and previous.price_states.states_equal(decision.price_states)
+    )
@@ -0,0 +1,86 @@
+"""
+Memoization of power limiting decisions.
+
+Realtime power readings arrive every few seconds, but the limiter's result
+only depends on the settings, the price slot, the states it starts from and
+the power reading. Readings are grouped into buckets of a configurable width,
+so a reading in the same bucket as an earlier one reuses that decision.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+import numpy as np
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+
+DECISION_MEMO_SIZE = 256
+# Width of a power bucket in W; 1 W keeps decisions exact for integer readings
+DECISION_MEMO_POWER_STEP_W = 1
+
+T = TypeVar("T")
+
+
+def states_fingerprint(states: ApplianceTable) -> tuple:
+    """Hashable identity of the appliances and their on/off states."""
+    return states.names, np.packbits(states.on).tobytes()
+
+
+def power_bucket(power_now: float, step_w: int = DECISION_MEMO_POWER_STEP_W) -> int:
+    """Bucket of a power reading; 0 W bypasses the limiter and is kept apart."""
+    if power_now == 0:
+        return -1
+    return int(power_now // step_w)
+
+
+def limit_side(power_now: float, power_limit: float) -> int:
+    """-1, 0 or 1 as the reading is under, at or over the limit in kW.
+
+    A bucket wider than 1 W can span the limit, and the limiter sheds on one
+    side of it and restores on the other, so this is part of the memo key.
+    """
+    limit_w = power_limit * 1000
+    return (power_now > limit_w) - (power_now < limit_w)
+
+
+class DecisionMemo(Generic[T]):  # noqa: UP046 (Python 3.11 support)
+    """Least recently used cache of decisions, with hit and miss counters."""
+
+    def __init__(self, maxsize: int = DECISION_MEMO_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, T] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
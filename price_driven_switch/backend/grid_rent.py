@@ -1,4 +1,8 @@
-from datetime import datetime, timedelta
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from price_driven_switch.backend.price_slots import slot_starts
 
 
 def calculate_easter_sunday(year: int) -> datetime:
@@ -70,6 +74,12 @@ def get_easter_holidays(year: int) -> list[datetime]:
     ]
 
 
+@lru_cache(maxsize=8)
+def _easter_holiday_dates(year: int) -> frozenset[date]:
+    """Easter holidays of ``year``, cached since every slot of a day asks."""
+    return frozenset(holiday.date() for holiday in get_easter_holidays(year))
+
+
 def is_weekend_or_holiday(date: datetime) -> bool:
     """Check if the given date is a weekend or holiday."""
     # Weekend check (Saturday = 5, Sunday = 6)
@@ -90,8 +100,7 @@ def is_weekend_or_holiday(date: datetime) -> bool:
         return True
 
     # Check Easter-related holidays (movable feasts)
-    easter_holidays = get_easter_holidays(date.year)
-    return any(date.date() == holiday.date() for holiday in easter_holidays)
+    return date.date() in _easter_holiday_dates(date.year)
 
 
 def is_night_time(hour: int) -> bool:
@@ -123,15 +132,20 @@ def get_grid_rent_rate(date: datetime, grid_rent_config: dict) -> float:
 
 
 def add_grid_rent_to_prices(
-    prices: list[float], date: datetime, grid_rent_config: dict
+    prices: list[float],
+    date: datetime,
+    grid_rent_config: dict,
+    starts: Sequence[datetime] | None = None,
 ) -> list[float]:
     """
-    Add grid rent to a list of hourly prices.
+    Add grid rent to a list of prices, one per slot of the day.
 
     Args:
-        prices: List of hourly prices in NOK/kWh (kroner)
-        date: The date for the price list (assumes 24 hours starting from this date)
+        prices: List of slot prices in NOK/kWh (kroner)
+        date: The date for the price list
         grid_rent_config: Grid rent configuration from settings (in øre/kWh)
+        starts: Start time of every slot; when left out the day is split into
+            ``len(prices)`` equal slots, so 23, 25 and 96 slot days work too
 
     Returns:
         List of prices with grid rent added (in NOK/kWh)
@@ -139,17 +153,17 @@ def add_grid_rent_to_prices(
     if not prices:
         return prices
 
+    if starts is None:
+        starts = slot_starts(date.date(), len(prices))
+
     result = []
-    for hour in range(24):
-        # Create datetime for this hour
-        hour_datetime = date.replace(hour=hour, minute=0, second=0, microsecond=0)
-        grid_rent_rate_ore = get_grid_rent_rate(hour_datetime, grid_rent_config)
+    for price, slot_start in zip(prices, starts, strict=True):
+        grid_rent_rate_ore = get_grid_rent_rate(slot_start, grid_rent_config)
 
         # Convert øre to kroner (divide by 100)
         grid_rent_rate_kroner = grid_rent_rate_ore / 100
 
         # Add grid rent to the price
-        price_with_grid_rent = prices[hour] + grid_rent_rate_kroner
-        result.append(price_with_grid_rent)
+        result.append(price + grid_rent_rate_kroner)
 
     return result
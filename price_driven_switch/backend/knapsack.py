@@ -0,0 +1,65 @@
+"""
+Optimal choice of appliances under a power limit.
+
+The greedy limiter switches appliances off in priority order until the power is
+under the limit, which can shed far more than needed. This module solves the
+0/1 knapsack instead: keep the set of appliances with the largest value whose
+power stays below a capacity. Power is rounded up to 10 W buckets so the
+dynamic program stays small; rounding up keeps the real total below the
+capacity too.
+"""
+
+import math
+import time
+
+import numpy as np
+
+BUCKET_WATTS = 10
+
+
+def best_subset(
+    power_w: np.ndarray,
+    value: np.ndarray,
+    capacity_w: float,
+    budget_s: float,
+) -> np.ndarray | None:
+    """Mask of the most valuable items with a total power below ``capacity_w``.
+
+    Returns None if the solution takes longer than ``budget_s`` seconds, so
+    the caller can fall back to a faster heuristic.
+    """
+    deadline = time.perf_counter() + budget_s
+    count = len(power_w)
+    keep = np.zeros(count, dtype=bool)
+    if capacity_w <= 0:
+        return keep
+
+    weights = np.ceil(np.asarray(power_w, dtype=float) / BUCKET_WATTS).astype(np.int64)
+    # Largest bucket count whose power is still strictly below the capacity
+    capacity = min(math.ceil(capacity_w / BUCKET_WATTS) - 1, int(weights.sum()))
+    if weights.sum() <= capacity:
+        keep[:] = True
+        return keep
+
+    best = np.full(capacity + 1, -np.inf)
+    best[0] = 0.0
+    taken = np.zeros((count, capacity + 1), dtype=bool)
+    for item, (weight, item_value) in enumerate(
+        zip(weights.tolist(), np.asarray(value, dtype=float).tolist(), strict=True)
+    ):
+        if time.perf_counter() > deadline:
+            return None
+        if weight > capacity:
+            continue
+        with_item = best[: capacity + 1 - weight] + item_value
+        # Take ties too, more kept load for the same value
+        take = with_item >= best[weight:]
+        best[weight:] = np.where(take, with_item, best[weight:])
+        taken[item, weight:] = take
+
+    bucket = int(best.argmax())
+    for item in range(count - 1, -1, -1):
+        if taken[item, bucket]:
+            keep[item] = True
+            bucket -= int(weights[item])
+    return keep
@@ -4,13 +4,29 @@ Provides clear, concise, and non-duplicate logging for user-facing status displa
 """
 
 import json
+from collections.abc import Iterable
 from datetime import datetime
 from enum import Enum
 from typing import Any
 
+import numpy as np
 import pandas as pd
 from loguru import logger
 
+from price_driven_switch.backend.appliance_table import ApplianceTable, as_table
+from price_driven_switch.backend.decision_events import (
+    AppliancesSwitched,
+    DecisionEvent,
+    DecisionSummary,
+    PowerChecked,
+    PowerLimitBypassed,
+    SheddingBudgetExceeded,
+    UnexpectedState,
+)
+
+# Switch states are logged from either representation
+SwitchStates = ApplianceTable | pd.DataFrame
+
 
 class LogLevel(Enum):
     """Log levels for switch logic events."""
@@ -46,7 +62,7 @@ class SwitchLogger:
         self._session_start = datetime.now()
 
     def log_price_based_decision(
-        self, appliance_states: pd.DataFrame, price_offset: float
+        self, appliance_states: SwitchStates, price_offset: float
     ) -> None:
         """Log price-based switching decisions."""
         # Only log if price offset changed significantly or first time
@@ -54,8 +70,9 @@ class SwitchLogger:
             self._last_price_offset is None
             or abs(price_offset - self._last_price_offset) > 0.01
         ):
-            on_count = sum(appliance_states["on"])
-            total_count = len(appliance_states)
+            states = as_table(appliance_states)
+            on_count = int(states.on.sum())
+            total_count = len(states)
 
             if on_count == 0:
                 message = f"Price too high ({price_offset:.3f}) - all appliances OFF"
@@ -64,7 +81,7 @@ class SwitchLogger:
                     f"Price favorable ({price_offset:.3f}) - all appliances allowed ON"
                 )
             else:
-                on_appliances = appliance_states[appliance_states["on"]].index.tolist()
+                on_appliances = states.on_names()
                 message = f"Price moderate ({price_offset:.3f}) - {on_count}/{total_count} appliances allowed: {', '.join(str(app) for app in on_appliances)}"
 
             logger.info(f"[PRICE] {message}")
@@ -131,14 +148,15 @@ class SwitchLogger:
 
     def log_system_summary(
         self,
-        final_states: pd.DataFrame,
+        final_states: SwitchStates,
         total_power_kw: float,
         power_limit_kw: float,
         price_offset: float,
     ) -> None:
         """Log concise system summary."""
-        on_appliances = final_states[final_states["on"]].index.tolist()
-        off_appliances = final_states[~final_states["on"]].index.tolist()
+        states = as_table(final_states)
+        on_appliances = states.on_names()
+        off_appliances = states.off_names()
 
         summary_parts = []
 
@@ -195,13 +213,13 @@ class StructuredSwitchLogger:
         pass
 
     def log_price_logic_result(
-        self, appliance_states: pd.DataFrame, price_offset: float
+        self, appliance_states: SwitchStates, price_offset: float
     ) -> None:
         """Log the result of price-based logic."""
         self.logger.log_price_based_decision(appliance_states, price_offset)
 
     def log_power_limit_start(
-        self, current_power: int, power_limit: float, prev_states: pd.DataFrame
+        self, current_power: int, power_limit: float, prev_states: SwitchStates
     ) -> None:
         """Log start of power limiting logic."""
         # Determine what type of power limiting scenario this is
@@ -215,7 +233,7 @@ class StructuredSwitchLogger:
                 )
             elif current_power < power_limit_w:
                 reserve = power_limit_w - current_power
-                if any(prev_states["on"] != True):  # noqa: E712
+                if not as_table(prev_states).on.all():
                     self.logger.log_power_limiting_decision(
                         current_power,
                         power_limit,
@@ -253,7 +271,7 @@ class StructuredSwitchLogger:
 
     def log_power_limit_complete(
         self,
-        final_states: pd.DataFrame,
+        final_states: SwitchStates,
         estimated_power: float,
         power_limit: float,
         price_offset: float,
@@ -288,8 +306,8 @@ structured_logger = StructuredSwitchLogger()
 
 
 def log_switch_decision_summary(
-    price_states: pd.DataFrame,
-    final_states: pd.DataFrame,
+    price_states: SwitchStates,
+    final_states: SwitchStates,
     current_power: int,
     power_limit: float,
     price_offset: float,
@@ -298,35 +316,42 @@ def log_switch_decision_summary(
     Log a comprehensive but concise summary of switching decisions.
     This replaces multiple scattered log statements with one clear summary.
     """
-    changes = []
-
-    # Find what changed between price-only and final states
-    for appliance in price_states.index:
-        price_want = price_states.loc[appliance, "on"]
-        final_state = final_states.loc[appliance, "on"]
+    price_table = as_table(price_states)
+    final_table = as_table(final_states)
+    price_want = price_table.on
+    if final_table.names == price_table.names:
+        final_on = final_table.on
+    else:
+        final_lookup = final_table.on_dict()
+        final_on = np.array([final_lookup[name] for name in price_table.names])
 
-        if price_want and not final_state:
+    # Find what changed between price-only and final states,
+    # appliances that stay OFF are not logged
+    changed = np.flatnonzero(price_want | final_on)
+    changes = []
+    for index in changed[:3].tolist():  # Only the first 3 changes are shown
+        appliance = price_table.names[index]
+        if price_want[index] and not final_on[index]:
             changes.append(f"{appliance} blocked by power limit")
-        elif not price_want and final_state:
+        elif not price_want[index] and final_on[index]:
             changes.append(f"{appliance} unexpected ON state")  # Should not happen
-        elif price_want and final_state:
+        else:
             changes.append(f"{appliance} allowed ON")
-        # Don't log appliances that stay OFF
 
     # Create summary message
-    total_power = sum(final_states.loc[final_states["on"], "Power"])
-    on_count = sum(final_states["on"])
+    total_power = final_table.power_on()
+    on_count = int(final_table.on.sum())
 
     summary_parts = [
         f"Power: {current_power}W → {total_power:.1f}kW used / {power_limit:.1f}kW limit",
         f"Price: {price_offset:.3f}",
-        f"Active: {on_count}/{len(final_states)} appliances",
+        f"Active: {on_count}/{len(final_table)} appliances",
     ]
 
     if changes:
-        summary_parts.append(f"Changes: {'; '.join(changes[:3])}")  # Limit to 3 changes
-        if len(changes) > 3:
-            summary_parts.append(f"and {len(changes) - 3} more")
+        summary_parts.append(f"Changes: {'; '.join(changes)}")
+        if len(changed) > 3:
+            summary_parts.append(f"and {len(changed) - 3} more")
 
     logger.info(f"[DECISION] {' | '.join(summary_parts)}")
 
@@ -367,3 +392,35 @@ def log_if_changed(message: str, min_interval_seconds: int = 30) -> None:
         logger.info(message)
         _last_logged_summary = message
         _last_summary_time = now
+
+
+def log_decision_events(events: Iterable[DecisionEvent]) -> None:
+    """Write the events of a switch decision to the log."""
+    for event in events:
+        if isinstance(event, PowerLimitBypassed):
+            log_if_changed("[POWER] Power limiting bypassed (zero power or limit)", 60)
+        elif isinstance(event, PowerChecked):
+            structured_logger.logger.log_power_limiting_decision(
+                event.power_now, event.power_limit, event.action, event.details
+            )
+        elif isinstance(event, AppliancesSwitched):
+            for name, power, priority in event:
+                if event.on:
+                    structured_logger.log_appliance_turned_on(name, power, priority)
+                else:
+                    structured_logger.log_appliance_turned_off(name, power, priority)
+        elif isinstance(event, SheddingBudgetExceeded):
+            log_if_changed(
+                f"[POWER] Knapsack shedding exceeded {event.budget_ms} ms, using greedy",
+                60,
+            )
+        elif isinstance(event, DecisionSummary):
+            log_switch_decision_summary(
+                event.price_states,
+                event.final_states,
+                event.power_now,
+                event.power_limit,
+                event.price_offset,
+            )
+        elif isinstance(event, UnexpectedState):
+            structured_logger.log_error_state(event.message)
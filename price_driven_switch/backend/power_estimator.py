@@ -0,0 +1,134 @@
+"""
+Learned power draw of the appliances.
+
+The configured Power of an appliance is often a guess. Whenever a decision
+switches exactly one appliance, the step in the realtime power reading that
+follows is attributed to it. The steps are kept as a streaming median per
+appliance, which ignores the odd step caused by something else switching at
+the same time.
+"""
+
+import bisect
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+
+# Time the relays and the meter need before the step shows in the readings
+SETTLE_SECONDS = 30.0
+# Steps kept per appliance
+MEDIAN_WINDOW = 31
+# Steps needed before an estimate replaces the configured power
+MIN_SAMPLES = 3
+
+
+class StreamingMedian:
+    """Median of the last ``window`` values, O(window) per update."""
+
+    def __init__(self, window: int = MEDIAN_WINDOW) -> None:
+        self._values: deque[float] = deque(maxlen=window)
+        self._sorted: list[float] = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, value: float) -> None:
+        if len(self._values) == self._values.maxlen:
+            oldest = self._values[0]
+            del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+        self._values.append(value)
+        bisect.insort(self._sorted, value)
+
+    @property
+    def median(self) -> float:
+        count = len(self._sorted)
+        if count == 0:
+            raise ValueError("No values")
+        middle = count // 2
+        if count % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+
+@dataclass(frozen=True)
+class _Transition:
+    name: str
+    on: bool
+    power_before: float
+    settles_at: float
+
+
+class PowerEstimator:
+    """Per-appliance power in kW, learned from single-appliance switches."""
+
+    def __init__(
+        self,
+        settle_seconds: float = SETTLE_SECONDS,
+        window: int = MEDIAN_WINDOW,
+        min_samples: int = MIN_SAMPLES,
+    ) -> None:
+        self.settle_seconds = settle_seconds
+        self.window = window
+        self.min_samples = min_samples
+        self.medians: dict[str, StreamingMedian] = {}
+        # Bumped with every accepted step, e.g. to invalidate cached decisions
+        self.version = 0
+        self._states: ApplianceTable | None = None
+        self._pending: _Transition | None = None
+        self._power: float | None = None
+
+    def observe_states(self, states: ApplianceTable, now: float) -> None:
+        """Record published switch states; a single switched appliance is tracked."""
+        previous = self._states
+        self._states = states
+        if previous is None or previous.names != states.names:
+            self._pending = None
+            return
+        switched = np.flatnonzero(previous.on != states.on)
+        if len(switched) == 0:
+            return
+        if len(switched) > 1 or self._power is None:
+            # The step could not be attributed to one appliance
+            self._pending = None
+            return
+        row = int(switched[0])
+        self._pending = _Transition(
+            name=states.names[row],
+            on=bool(states.on[row]),
+            power_before=self._power,
+            settles_at=now + self.settle_seconds,
+        )
+
+    def observe_power(self, power: float, now: float) -> None:
+        """Record a realtime reading in W, completing a settled transition."""
+        self._power = power
+        pending = self._pending
+        if pending is None or now < pending.settles_at:
+            return
+        self._pending = None
+        step = power - pending.power_before
+        if not pending.on:
+            step = -step
+        if step <= 0:
+            return  # the appliance did not draw power, e.g. its thermostat is off
+        median = self.medians.setdefault(pending.name, StreamingMedian(self.window))
+        median.add(step / 1000)
+        self.version += 1
+
+    def estimate(self, name: str) -> float | None:
+        """Learned power in kW, None until enough steps were seen."""
+        median = self.medians.get(name)
+        if median is None or len(median) < self.min_samples:
+            return None
+        return median.median
+
+    def apply(self, table: ApplianceTable) -> ApplianceTable:
+        """``table`` with the configured power replaced by learned estimates."""
+        power = table.power.copy()
+        for row, name in enumerate(table.names):
+            estimate = self.estimate(name)
+            if estimate is not None:
+                power[row] = estimate
+        return table.with_power(power)
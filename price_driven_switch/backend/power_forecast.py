@@ -0,0 +1,49 @@
+"""
+Short-horizon forecast of the realtime power.
+
+Holt's linear trend method, a level and a trend smoothed exponentially, adapted
+to the irregular interval of the realtime readings. Each reading updates the
+forecaster in O(1), so it runs inside the websocket callback. The limiter can
+then shed before the limit is crossed instead of after.
+"""
+
+# Weight of the newest reading in the level, and of the newest slope in the trend
+FORECAST_ALPHA = 0.5
+FORECAST_BETA = 0.2
+
+
+class HoltForecaster:
+    def __init__(
+        self, alpha: float = FORECAST_ALPHA, beta: float = FORECAST_BETA
+    ) -> None:
+        if not (0 < alpha <= 1 and 0 < beta <= 1):
+            raise ValueError("alpha and beta must be in (0, 1]")
+        self.alpha = alpha
+        self.beta = beta
+        self.level: float | None = None
+        self.trend = 0.0  # W per second
+        self._last_time = 0.0
+
+    def update(self, power: float, now: float) -> None:
+        """Add a reading in W taken at ``now`` seconds."""
+        if self.level is None:
+            self.level = power
+            self._last_time = now
+            return
+        elapsed = now - self._last_time
+        if elapsed <= 0:
+            # Same instant, e.g. a repeated message: only move the level
+            self.level = self.alpha * power + (1 - self.alpha) * self.level
+            return
+        predicted = self.level + self.trend * elapsed
+        level = self.alpha * power + (1 - self.alpha) * predicted
+        slope = (level - self.level) / elapsed
+        self.trend = self.beta * slope + (1 - self.beta) * self.trend
+        self.level = level
+        self._last_time = now
+
+    def forecast(self, horizon: float) -> float | None:
+        """Expected power in W ``horizon`` seconds after the last reading."""
+        if self.level is None:
+            return None
+        return self.level + self.trend * horizon
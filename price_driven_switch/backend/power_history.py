@@ -0,0 +1,98 @@
+"""
+In-memory history of the realtime measurements.
+
+A fixed-size, preallocated NumPy ring buffer keeps the last readings of the
+Tibber realtime subscription. Appending is O(1) and never allocates, and
+history queries are answered with vectorized reductions, so the Status page
+can chart the last day without a database.
+"""
+
+from collections.abc import Mapping
+from typing import Any
+
+import numpy as np
+
+# liveMeasurement fields kept per reading, missing ones are stored as NaN
+MEASUREMENT_FIELDS = (
+    "power",
+    "powerProduction",
+    "accumulatedConsumption",
+    "averagePower",
+    "voltagePhase1",
+    "voltagePhase2",
+    "voltagePhase3",
+    "currentL1",
+    "currentL2",
+    "currentL3",
+)
+# A bit more than a day of readings at Tibber Pulse's 2 s interval
+HISTORY_CAPACITY = 65_536
+
+
+class PowerHistory:
+    """Ring buffer of (timestamp, measurement fields) rows."""
+
+    def __init__(
+        self,
+        capacity: int = HISTORY_CAPACITY,
+        fields: tuple[str, ...] = MEASUREMENT_FIELDS,
+    ) -> None:
+        self.fields = fields
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity)
+        self.values = np.full((capacity, len(fields)), np.nan)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, measurement: Mapping[str, Any]) -> None:
+        """Store one reading, overwriting the oldest once the buffer is full."""
+        row = self._next
+        self.timestamps[row] = timestamp
+        values = self.values[row]
+        for column, field in enumerate(self.fields):
+            value = measurement.get(field)
+            values[column] = np.nan if value is None else value
+        self._next = (row + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def ordered(self) -> tuple[np.ndarray, np.ndarray]:
+        """Timestamps and values of all stored readings, oldest first."""
+        if self._count < self.capacity:
+            return self.timestamps[: self._count], self.values[: self._count]
+        order = np.roll(np.arange(self.capacity), -self._next)
+        return self.timestamps[order], self.values[order]
+
+    def downsample(
+        self, window: float, resolution: float, now: float, field: str = "power"
+    ) -> dict[str, list[float]]:
+        """Min, mean and max of ``field`` per ``resolution`` seconds.
+
+        Covers the ``window`` seconds up to ``now``; buckets without readings
+        are left out. ``start`` is the Unix time each bucket starts at.
+        """
+        column = self.fields.index(field)
+        timestamps, values = self.ordered()
+        start = now - window
+        first = int(np.searchsorted(timestamps, start, side="left"))
+        last = int(np.searchsorted(timestamps, now, side="right"))
+        times = timestamps[first:last]
+        samples = values[first:last, column]
+        present = ~np.isnan(samples)
+        times, samples = times[present], samples[present]
+        if len(samples) == 0:
+            return {"start": [], "min": [], "mean": [], "max": []}
+
+        buckets = ((times - start) // resolution).astype(np.int64)
+        # Readings are in time order, so every bucket is one contiguous run
+        bucket_ids, offsets, counts = np.unique(
+            buckets, return_index=True, return_counts=True
+        )
+        return {
+            "start": (start + bucket_ids * resolution).tolist(),
+            "min": np.minimum.reduceat(samples, offsets).tolist(),
+            "mean": (np.add.reduceat(samples, offsets) / counts).tolist(),
+            "max": np.maximum.reduceat(samples, offsets).tolist(),
+        }
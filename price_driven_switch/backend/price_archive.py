@@ -0,0 +1,159 @@
+"""
+Append-only archive of past prices.
+
+The price file only holds today and tomorrow, so every refresh also appends
+the days it has not archived yet to three flat binary files:
+
+- ``starts.i8``: start of every slot, int64 Unix seconds
+- ``prices.f4``: price of every slot, float32 NOK/kWh
+- ``days.i8``: one (day ordinal, first row, slot count) int64 record per day
+
+The files are memory-mapped for reading, so a date range is a slice of the
+slot arrays and nothing is parsed. Days are only appended after the last
+archived one, which keeps the rows in time order.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from loguru import logger
+
+from price_driven_switch.backend.price_slots import parse_starts, slot_starts
+
+PATH_PRICE_ARCHIVE = "price_driven_switch/config/price_archive"
+START_DTYPE = np.dtype("<i8")
+PRICE_DTYPE = np.dtype("<f4")
+DAY_DTYPE = np.dtype([("day", "<i8"), ("first", "<i8"), ("count", "<i8")])
+
+
+@dataclass(frozen=True)
+class ArchivedPrices:
+    """Slots of a date range; the arrays are read-only views of the archive."""
+
+    starts: np.ndarray  # int64 Unix seconds
+    prices: np.ndarray  # float32 NOK/kWh
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+def _append(path: str, data: np.ndarray) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, data.tobytes())
+    finally:
+        os.close(fd)
+
+
+class PriceArchive:
+    def __init__(self, directory: str = PATH_PRICE_ARCHIVE) -> None:
+        self.directory = directory
+        self._maps: dict[str, tuple[int, np.ndarray]] = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _map(self, name: str, dtype: np.dtype) -> np.ndarray:
+        """Read-only memory map of a file, mapped again only when it grew."""
+        path = self._path(name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        rows = size // dtype.itemsize
+        cached = self._maps.get(name)
+        if cached is not None and cached[0] == rows:
+            return cached[1]
+        if rows == 0:
+            array = np.zeros(0, dtype=dtype)
+        else:
+            array = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+        self._maps[name] = (rows, array)
+        return array
+
+    def index(self) -> np.ndarray:
+        """The per-day records, oldest first."""
+        return self._map("days.i8", DAY_DTYPE)
+
+    def days(self) -> list[date]:
+        return [date.fromordinal(int(day)) for day in self.index()["day"]]
+
+    def append_day(self, day: date, starts: np.ndarray, prices: np.ndarray) -> bool:
+        """Archive the slots of ``day``; days up to the last archived one are skipped."""
+        if len(starts) != len(prices) or len(prices) == 0:
+            raise ValueError("A day needs as many slot starts as prices")
+        index = self.index()
+        if len(index) and day.toordinal() <= index["day"][-1]:
+            return False
+        first = int(index["first"][-1] + index["count"][-1]) if len(index) else 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Rows left behind by an append interrupted before its index record
+        for name, dtype in (("starts.i8", START_DTYPE), ("prices.f4", PRICE_DTYPE)):
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > first * dtype.itemsize:
+                os.truncate(path, first * dtype.itemsize)
+        _append(self._path("starts.i8"), np.asarray(starts, dtype=START_DTYPE))
+        _append(self._path("prices.f4"), np.asarray(prices, dtype=PRICE_DTYPE))
+        # The index record goes last, so readers never see a partial day
+        record = np.array([(day.toordinal(), first, len(prices))], dtype=DAY_DTYPE)
+        _append(self._path("days.i8"), record)
+        return True
+
+    def append_response(self, api_response: dict, fetched_on: date) -> int:
+        """Archive today's and tomorrow's prices of a Tibber response.
+
+        Returns the number of days added.
+        """
+        price_info = (
+            api_response.get("data", {})
+            .get("viewer", {})
+            .get("homes", [{}])[0]
+            .get("currentSubscription", {})
+            .get("priceInfo", {})
+        )
+        added = 0
+        tomorrow = fetched_on + timedelta(days=1)
+        for key, day in (("today", fetched_on), ("tomorrow", tomorrow)):
+            items = price_info.get(key) or []
+            prices = [item.get("total") for item in items]
+            if not prices or any(price is None for price in prices):
+                continue
+            starts = parse_starts([item.get("startsAt") for item in items])
+            if starts is None:
+                starts = slot_starts(day, len(prices))
+            timestamps = np.array([start.timestamp() for start in starts])
+            added += self.append_day(day, timestamps.astype(np.int64), np.array(prices))
+        return added
+
+    def read(self, start: date, end: date) -> ArchivedPrices:
+        """Slots of the archived days from ``start`` to ``end``, both included."""
+        index = self.index()
+        days = index["day"]
+        low = int(np.searchsorted(days, start.toordinal(), side="left"))
+        high = int(np.searchsorted(days, end.toordinal(), side="right"))
+        if low >= high:
+            return ArchivedPrices(
+                np.zeros(0, dtype=START_DTYPE), np.zeros(0, dtype=PRICE_DTYPE)
+            )
+        first = int(index["first"][low])
+        stop = int(index["first"][high - 1] + index["count"][high - 1])
+        return ArchivedPrices(
+            self._map("starts.i8", START_DTYPE)[first:stop],
+            self._map("prices.f4", PRICE_DTYPE)[first:stop],
+        )
+
+    def read_day(self, day: date) -> ArchivedPrices:
+        return self.read(day, day)
+
+
+def archive_prices(archive: PriceArchive, api_response: dict, fetched_on: date) -> None:
+    """Feed a refresh into the archive; a failure never fails the refresh."""
+    if not isinstance(api_response, dict):
+        return
+    try:
+        added = archive.append_response(api_response, fetched_on)
+    except (OSError, ValueError, LookupError) as error:
+        logger.warning(f"Could not archive prices: {error}")
+        return
+    if added:
+        logger.info(f"Archived prices of {added} day(s) fetched {fetched_on}")
@@ -1,39 +1,181 @@
+import asyncio
 import datetime as dt
 import json
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from tempfile import NamedTemporaryFile
+from typing import ClassVar
 
+from loguru import logger
+
+from price_driven_switch.backend.configuration import file_signature
+from price_driven_switch.backend.price_archive import PriceArchive, archive_prices
 from price_driven_switch.backend.tibber_connection import TibberConnection
 
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only coalesced within the process
+    fcntl = None  # type: ignore
+
+# Tomorrow's prices are published around 13:00, the file is refreshed after 13:20
+PRICE_PUBLISH_TIME = (13, 0)
+PRICE_REFRESH_TIME = (13, 20)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+REFRESH_LOCK_POLL_INTERVAL = 0.1  # seconds
+
+
+def tomorrow_prices(api_dict: dict) -> list:
+    """Tomorrow's entries of a Tibber price response, empty until published."""
+    tomorrow = (
+        api_dict.get("data", {})
+        .get("viewer", {})
+        .get("homes", [{}])[0]
+        .get("currentSubscription", {})
+        .get("priceInfo", {})
+        .get("tomorrow")
+    )
+    return tomorrow or []
+
 
 class PriceFile:
+    # Parsed price files shared by all instances: path -> (signature, date, response)
+    _cache: ClassVar[dict[str, tuple[tuple[int, int, int], str, dict]]] = {}
+    # In-flight refreshes: (event loop, path, refresh window) -> task
+    _refreshes: ClassVar[dict[tuple, asyncio.Task]] = {}
+
     def __init__(
         self,
         tibber_connection: TibberConnection = TibberConnection(),  # noqa: B008
         path: str = "price_driven_switch/config/prices.json",
+        archive: PriceArchive | None = None,
     ) -> None:
         self.tibber_connection = tibber_connection
         self.path = path
+        # Past days are kept next to the price file unless told otherwise
+        self.archive = archive or PriceArchive(
+            os.path.join(os.path.dirname(path), "price_archive")
+        )
 
     async def load_prices(self) -> dict:
+        """Return the Tibber price response, refreshing the file when out of date.
+
+        The returned dict is shared between callers and must not be modified.
+        """
         await self._check_file()
-        _, api_dict = self._load_price_file()
+        _, api_dict = self._cached_price_file()
         return api_dict
 
+    def stored_prices(self) -> tuple[dt.date, dict] | None:
+        """Return the fetch day and response of the file on disk, never refreshing.
+
+        Returns None when there is no price file yet.
+        """
+        if not os.path.exists(self.path):
+            return None
+        file_date, api_dict = self._cached_price_file()
+        return dt.datetime.strptime(file_date, TIMESTAMP_FORMAT).date(), api_dict
+
+    def is_out_of_date(self) -> bool:
+        if not os.path.exists(self.path):
+            return True
+        return self._is_stale(*self._cached_price_file())
+
+    def has_tomorrow_prices(self) -> bool:
+        """Whether the file was fetched today and already holds tomorrow's prices."""
+        if not os.path.exists(self.path):
+            return False
+        file_date, api_dict = self._cached_price_file()
+        return self._fetched_today(file_date) and bool(tomorrow_prices(api_dict))
+
+    async def prefetch_tomorrow(self) -> bool:
+        """Download the prices unless tomorrow's are already in the file.
+
+        Unlike load_prices() this also fetches before the refresh window, so
+        tomorrow's prices are picked up as soon as Tibber publishes them.
+        Returns whether tomorrow's prices are available afterwards.
+        """
+        if not self.has_tomorrow_prices():
+            async with self._refresh_lock():
+                # The other process may have fetched them while we waited
+                if not self.has_tomorrow_prices():
+                    await self._update_price_file()
+        return self.has_tomorrow_prices()
+
     async def _check_file(self) -> None:
         if not os.path.exists(self.path):
+            await self._refresh_price_file()
+        elif self._is_stale(*self._cached_price_file()):
+            await self._refresh_price_file()
+
+    async def _refresh_price_file(self) -> None:
+        """Refresh the price file once for all concurrent callers.
+
+        Callers in the same event loop and refresh window await the same task,
+        so only one request goes to Tibber when the file goes out of date.
+        """
+        loop = asyncio.get_running_loop()
+        key = (loop, self.path, self.refresh_window())
+        refresh = self._refreshes.get(key)
+        if refresh is None:
+            refresh = loop.create_task(self._locked_update())
+            self._refreshes[key] = refresh
+            refresh.add_done_callback(lambda _: self._refreshes.pop(key, None))
+        # A cancelled caller must not cancel the refresh the others wait for
+        await asyncio.shield(refresh)
+
+    async def _locked_update(self) -> None:
+        async with self._refresh_lock():
+            # The other process may have refreshed the file while we waited
+            if os.path.exists(self.path):
+                if not self._is_stale(*self._cached_price_file()):
+                    logger.debug("Price file already refreshed by another process")
+                    return
             await self._update_price_file()
-        else:
-            file_date, _ = self._load_price_file()
-            if self._check_out_of_date(file_date):
-                self._write_prices_file(await self._load_prices_from_server())
+
+    @asynccontextmanager
+    async def _refresh_lock(self) -> AsyncIterator[None]:
+        """Cross-process lock so FastAPI and Streamlit never refresh together."""
+        if fcntl is None:
+            yield
+            return
+
+        with open(f"{self.path}.lock", "a", encoding="utf-8") as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(REFRESH_LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh_window(self) -> tuple[dt.date, bool]:
+        """The current refresh period: the day and whether 13:20 has passed."""
+        time_now = dt.datetime.now()
+        return time_now.date(), (time_now.hour, time_now.minute) >= PRICE_REFRESH_TIME
+
+    def _is_stale(self, file_date: str, api_dict: dict) -> bool:
+        """Out of date, unless tomorrow's prices were already fetched early today."""
+        if not self._check_out_of_date(file_date):
+            return False
+        return not (self._fetched_today(file_date) and tomorrow_prices(api_dict))
+
+    def _fetched_today(self, file_date: str) -> bool:
+        fetched_on = dt.datetime.strptime(file_date, TIMESTAMP_FORMAT).date()
+        return fetched_on == dt.date.today()
 
     def _check_out_of_date(self, date: str) -> bool:
-        file_date = dt.datetime.strptime(date, "%Y-%m-%d %H:%M")
+        file_date = dt.datetime.strptime(date, TIMESTAMP_FORMAT)
         time_now = dt.datetime.now()
 
         # Create datetime objects for today's midnight and 1:20 PM based on time_now
         today_midnight = dt.datetime(time_now.year, time_now.month, time_now.day, 0, 0)
-        today_1_20_pm = dt.datetime(time_now.year, time_now.month, time_now.day, 13, 20)
+        today_1_20_pm = dt.datetime(
+            time_now.year, time_now.month, time_now.day, *PRICE_REFRESH_TIME
+        )
 
         # Check if file_date is before today's midnight
         if file_date < today_midnight:
@@ -42,6 +184,18 @@ class PriceFile:
         # Check if file_date is before today's 1:20 PM and time_now is past 1:20 PM
         return bool(file_date < today_1_20_pm and time_now >= today_1_20_pm)
 
+    def _cached_price_file(self) -> tuple[str, dict]:
+        """Return the parsed price file, parsing it again only if it changed."""
+        signature = file_signature(self.path)
+        cached = self._cache.get(self.path)
+        if signature is not None and cached is not None and cached[0] == signature:
+            return cached[1], cached[2]
+
+        file_date, api_response = self._load_price_file()
+        if signature is not None:
+            self._cache[self.path] = (signature, file_date, api_response)
+        return file_date, api_response
+
     def _load_price_file(self) -> tuple[str, dict]:
         with open(self.path, encoding="utf-8") as json_file:
             json_data = json.load(json_file)
@@ -50,16 +204,23 @@ class PriceFile:
             return file_date, api_response
 
     async def _update_price_file(self) -> None:
-        self._write_prices_file(await self._load_prices_from_server())
+        file_data = await self._load_prices_from_server()
+        self._write_prices_file(file_data)
+        archive_prices(self.archive, file_data["api_response"], dt.date.today())
 
     async def _load_prices_from_server(self) -> dict:
         api_response = await self.tibber_connection.get_prices()
         file_data = {
-            "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "timestamp": dt.datetime.now().strftime(TIMESTAMP_FORMAT),
             "api_response": api_response,
         }
         return file_data
 
     def _write_prices_file(self, api_response: dict) -> None:
-        with open(self.path, mode="w", encoding="utf-8") as json_file:
+        """Replace the file atomically, so a reader never sees a partial file."""
+        directory = os.path.dirname(self.path) or "."
+        with NamedTemporaryFile(
+            mode="w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False
+        ) as json_file:
             json.dump(api_response, json_file)
+        os.replace(json_file.name, self.path)
@@ -0,0 +1,84 @@
+"""
+Background price prefetching.
+
+Runs next to the realtime subscription in the FastAPI lifespan. It downloads
+tomorrow's prices as soon as Tibber publishes them, retrying with backoff until
+they appear, and recompiles the schedule right away. Requests then only read
+the compiled schedule and never wait for Tibber.
+"""
+
+import asyncio
+import datetime as dt
+
+from loguru import logger
+
+from price_driven_switch.backend.price_file import PRICE_PUBLISH_TIME
+from price_driven_switch.backend.schedule import ScheduleCache
+
+PREFETCH_RETRY_INITIAL_SECONDS = 30
+PREFETCH_RETRY_MAX_SECONDS = 15 * 60
+# Wake a little after midnight so the new day has started everywhere
+MIDNIGHT_MARGIN_SECONDS = 5
+
+
+class PricePrefetcher:
+    def __init__(
+        self,
+        schedule_cache: ScheduleCache,
+        retry_initial: float = PREFETCH_RETRY_INITIAL_SECONDS,
+        retry_max: float = PREFETCH_RETRY_MAX_SECONDS,
+    ) -> None:
+        self.schedule_cache = schedule_cache
+        self.price_file = schedule_cache.price_file
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+
+    async def run(self) -> None:
+        """Keep the prices current until cancelled."""
+        self.schedule_cache.refresh_on_demand = False
+        try:
+            while True:
+                await self.prefetch()
+                await asyncio.sleep(self.seconds_until_next_run(dt.datetime.now()))
+        finally:
+            self.schedule_cache.refresh_on_demand = True
+
+    async def prefetch(self) -> None:
+        """Fetch until the prices are complete, backing off between failures."""
+        delay = self.retry_initial
+        while True:
+            try:
+                if await self._fetch_once():
+                    break
+                logger.info("Tomorrow's prices are not published yet")
+            except Exception as error:
+                logger.warning(f"Price prefetch failed: {error}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_max)
+        self.schedule_cache.warm()
+
+    async def _fetch_once(self) -> bool:
+        if _is_published(dt.datetime.now()):
+            return await self.price_file.prefetch_tomorrow()
+        await self.price_file.load_prices()
+        return True
+
+    @staticmethod
+    def seconds_until_next_run(now: dt.datetime) -> float:
+        """Time until the publish time today, or else until the next midnight."""
+        if not _is_published(now):
+            next_run = now.replace(
+                hour=PRICE_PUBLISH_TIME[0],
+                minute=PRICE_PUBLISH_TIME[1],
+                second=0,
+                microsecond=0,
+            )
+        else:
+            next_run = dt.datetime.combine(
+                now.date() + dt.timedelta(days=1), dt.time()
+            ) + dt.timedelta(seconds=MIDNIGHT_MARGIN_SECONDS)
+        return (next_run - now).total_seconds()
+
+
+def _is_published(now: dt.datetime) -> bool:
+    return (now.hour, now.minute) >= PRICE_PUBLISH_TIME
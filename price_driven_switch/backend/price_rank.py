@@ -0,0 +1,92 @@
+"""
+Price ranking of the slots of a day.
+
+Slots are ranked by price with a stable sort, and equally priced slots are
+interleaved so the cheapest tier is spread over the day rather than bunched
+together. The ranking is built once per price vector and cached, after which
+the offset of a slot and the threshold price of a setpoint are array lookups.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+# Price vectors kept: today and tomorrow, for a few settings
+RANK_CACHE_SIZE = 16
+
+
+@lru_cache(maxsize=128)
+def interleave_order(count: int) -> tuple[int, ...]:
+    """Order to take ``count`` slots in to maximize spacing when taken in turn.
+
+    Uses binary tree traversal to distribute the slots evenly.
+    Example: 8 -> (3, 1, 5, 0, 2, 4, 6, 7)
+    So taking the first 3 gives slots 3, 1 and 5 instead of 0, 1 and 2
+    """
+    result = []
+    queue = [(0, count - 1)]  # (start, end) pairs
+    while queue:
+        start, end = queue.pop(0)
+        if start > end:
+            continue
+        # Take the middle element, then the left and right halves
+        mid = (start + end) // 2
+        result.append(mid)
+        queue.append((start, mid - 1))
+        queue.append((mid + 1, end))
+    return tuple(result)
+
+
+@dataclass(frozen=True)
+class PriceRank:
+    """Rank of every slot, and the price at every rank."""
+
+    slot_rank: np.ndarray
+    rank_price: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.slot_rank)
+
+    @property
+    def _last_rank(self) -> int:
+        return max(len(self) - 1, 1)
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Offset between 0 and 1 of every slot, indexed by slot."""
+        return self.slot_rank / self._last_rank
+
+    def offset(self, slot: int) -> float:
+        return float(self.slot_rank[slot] / self._last_rank)
+
+    def price_at_offset(self, offset: float) -> float:
+        """Price at the rank an appliance with this setpoint cuts off at."""
+        position = min(int(round(offset * self._last_rank)), len(self) - 1)
+        return float(self.rank_price[position])
+
+
+@lru_cache(maxsize=RANK_CACHE_SIZE)
+def _rank_index(prices: tuple[float, ...]) -> PriceRank:
+    values = np.asarray(prices, dtype=float)
+    order = np.argsort(values, kind="stable")
+    # Equal prices are contiguous in the stable order, slots ascending
+    sorted_values = values[order]
+    tier_starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+    tier_ends = np.r_[tier_starts[1:], len(order)]
+    for start, end in zip(tier_starts, tier_ends, strict=True):
+        if end - start > 2:
+            order[start:end] = order[start:end][list(interleave_order(end - start))]
+
+    slot_rank = np.empty(len(order), dtype=np.int64)
+    slot_rank[order] = np.arange(len(order))
+    rank_price = values[order]
+    slot_rank.flags.writeable = False
+    rank_price.flags.writeable = False
+    return PriceRank(slot_rank, rank_price)
+
+
+def rank_index(prices: Sequence[float]) -> PriceRank:
+    """Cached ranking of ``prices``; equal price vectors share one index."""
+    return _rank_index(tuple(prices))
@@ -0,0 +1,96 @@
+"""
+Price slots of a day at any resolution.
+
+Tibber returns one price per hour or per quarter hour, each with the time it
+starts at, and a day has 23 or 25 hours when daylight saving time changes.
+The slots are kept as an array of their boundaries in Unix seconds, so the
+current slot is found with one division instead of by assuming 24 hours.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+
+def local_midnight(day: date) -> datetime:
+    return datetime.combine(day, time())
+
+
+def day_bounds(day: date) -> tuple[float, float]:
+    """Unix seconds of the local midnights that start and end ``day``."""
+    start = local_midnight(day)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+def hours_in_day(day: date) -> int:
+    """Number of hours in ``day``: 23 or 25 on the daylight saving changes."""
+    start, end = day_bounds(day)
+    return round((end - start) / 3600)
+
+
+def slot_starts(day: date, slots: int) -> list[datetime]:
+    """Local start time of each of ``slots`` equal slots of ``day``."""
+    start, end = day_bounds(day)
+    width = (end - start) / max(slots, 1)
+    return [datetime.fromtimestamp(start + slot * width) for slot in range(slots)]
+
+
+def parse_starts(starts_at: Sequence[str | None]) -> list[datetime] | None:
+    """Parsed ``startsAt`` values, None unless every slot has one."""
+    if not starts_at or not all(starts_at):
+        return None
+    try:
+        return [datetime.fromisoformat(value) for value in starts_at]  # type: ignore[arg-type]
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class SlotBoundaries:
+    """Start of every slot and the end of the last one, in Unix seconds."""
+
+    edges: np.ndarray  # shape (slots + 1,)
+
+    @classmethod
+    def from_starts(cls, starts: Sequence[datetime]) -> "SlotBoundaries":
+        """Boundaries of slots starting at ``starts``, the last as long as the one before."""
+        if not starts:
+            return cls(np.zeros(1))
+        edges = np.array([start.timestamp() for start in starts], dtype=float)
+        width = edges[-1] - edges[-2] if len(edges) > 1 else 3600.0
+        return cls(np.append(edges, edges[-1] + width))
+
+    @classmethod
+    def uniform(cls, day: date, slots: int) -> "SlotBoundaries":
+        """``slots`` equal slots from midnight to midnight of ``day``."""
+        start, end = day_bounds(day)
+        return cls(np.linspace(start, end, max(slots, 1) + 1))
+
+    @property
+    def slots(self) -> int:
+        return len(self.edges) - 1
+
+    def slot_at(self, timestamp: float) -> int:
+        """Slot containing ``timestamp``, clamped to the first and last slot."""
+        edges = self.edges
+        slots = len(edges) - 1
+        if slots <= 0:
+            return 0
+        width = (edges[-1] - edges[0]) / slots
+        slot = min(max(int((timestamp - edges[0]) // width), 0), slots - 1)
+        inside = edges[0] <= timestamp < edges[-1]
+        if inside and not edges[slot] <= timestamp < edges[slot + 1]:
+            # Slots of unequal length: search the boundaries instead
+            slot = int(np.searchsorted(edges, timestamp, side="right")) - 1
+        return slot
+
+    def seconds_until_next(self, timestamp: float) -> float:
+        """Seconds from ``timestamp`` until the next slot starts."""
+        if self.slots <= 0:
+            return 0.0
+        if timestamp >= self.edges[-1]:
+            # Past the last slot: check again one slot length later
+            return float(self.edges[-1] - self.edges[-2])
+        return max(float(self.edges[self.slot_at(timestamp) + 1]) - timestamp, 0.0)
@@ -1,71 +1,101 @@
-from datetime import datetime
+import time
+from collections.abc import Mapping
+from datetime import date, datetime, timedelta
+from typing import Any
 
-from price_driven_switch.backend.configuration import load_settings_file
+from price_driven_switch.backend.configuration import settings_snapshot
 from price_driven_switch.backend.grid_rent import add_grid_rent_to_prices
+from price_driven_switch.backend.price_rank import rank_index
+from price_driven_switch.backend.price_slots import (
+    SlotBoundaries,
+    hours_in_day,
+    local_midnight,
+    parse_starts,
+    slot_starts,
+)
+from price_driven_switch.backend.rolling_rank import rolling_offsets
 
 
-class Prices:
-    def __init__(self, price_dict: dict) -> None:
-        self.price_dict = price_dict
-        self.settings = load_settings_file()
+def _day_progress(now: datetime) -> tuple[float, float]:
+    """Real seconds elapsed since local midnight and the length of the day."""
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_start = midnight.timestamp()
+    day_seconds = (midnight + timedelta(days=1)).timestamp() - day_start
+    return now.timestamp() - day_start, day_seconds
 
-    def _interleave_hours(self, hours: list[int]) -> list[int]:
-        """Reorder hours to maximize spacing when selected sequentially.
 
-        Uses binary tree traversal to distribute hours evenly.
-        Example: [0,1,2,3,4,5,6,7] -> [3,1,5,0,2,4,6,7]
-        So selecting first 3 gives [3,1,5] instead of [0,1,2]
-        """
-        if len(hours) <= 1:
-            return hours
+def slot_index(now: datetime, slots: int) -> int:
+    """Index of the slot containing ``now`` when the day has ``slots`` equal slots.
 
-        result = []
-        queue = [(0, len(hours) - 1)]  # (start, end) pairs
+    Elapsed time is measured in real seconds since local midnight, so the 23
+    and 25 hour days at DST changes map onto their 23 and 25 hourly prices.
+    """
+    elapsed, day_seconds = _day_progress(now)
+    return min(int(elapsed * slots // day_seconds), slots - 1)
 
-        while queue:
-            start, end = queue.pop(0)
-            if start > end:
-                continue
 
-            # Take the middle element
-            mid = (start + end) // 2
-            result.append(hours[mid])
+def seconds_until_next_slot(now: datetime, slots: int) -> float:
+    """Seconds from ``now`` until the next slot of the day starts."""
+    elapsed, day_seconds = _day_progress(now)
+    slot_seconds = day_seconds / slots
+    next_start = (min(int(elapsed // slot_seconds), slots - 1) + 1) * slot_seconds
+    return max(next_start - elapsed, 0.0)
 
-            # Add left and right halves to queue
-            queue.append((start, mid - 1))
-            queue.append((mid + 1, end))
 
-        return result
+class Prices:
+    def __init__(
+        self, price_dict: dict, settings: Mapping[str, Any] | None = None
+    ) -> None:
+        self.price_dict = price_dict
+        self.settings = settings if settings is not None else settings_snapshot().data
 
     @property
     def offset_now(self) -> float:
-        hour_now = self._hour_now()
-        today_prices = self.today_prices
+        return rank_index(self.today_prices).offset(self._hour_now())
 
-        # Group hours by price
-        from collections import defaultdict
+    def hour_offsets(self, prices: list[float]) -> list[float]:
+        """Return the offset of every hour in ``prices``, indexed by hour.
 
-        price_groups: dict[float, list[int]] = defaultdict(list)
-        for hour, price in enumerate(today_prices):
-            price_groups[price].append(hour)
+        Hours are ranked by price, with equally priced hours interleaved so that
+        the cheapest tier is spread over the day rather than bunched together.
+        """
+        return rank_index(prices).offsets.tolist()
 
-        # Build sorted list with interleaved hours within each price tier
-        sorted_pairs = []
-        for price in sorted(price_groups.keys()):
-            hours = price_groups[price]
-            interleaved = self._interleave_hours(hours)
-            for hour in interleaved:
-                sorted_pairs.append((hour, price))
+    def rolling_offset_now(self, horizon_hours: float) -> float:
+        """Offset of the current slot among the slots of the next ``horizon_hours``.
 
-        # Find the position of current hour in the sorted list
-        position = next(
-            i for i, (hour, _) in enumerate(sorted_pairs) if hour == hour_now
+        An alternative to offset_now that looks past midnight into tomorrow.
+        """
+        today = self._today()
+        today_offsets, _ = self.slot_offsets(
+            self.day_prices("today", today),
+            self.day_prices("tomorrow", today + timedelta(days=1)),
+            horizon_hours,
+            today,
         )
-
-        # Determine the offset based on the position
-        offset = position / 23
-
-        return offset
+        return today_offsets[self._hour_now()]
+
+    def slot_offsets(
+        self,
+        today_prices: list[float],
+        tomo_prices: list[float],
+        horizon_hours: float,
+        today: date,
+    ) -> tuple[list[float], list[float]]:
+        """Offsets of every slot of today and tomorrow.
+
+        With ``horizon_hours`` at 0 each day is ranked on its own, otherwise
+        every slot is ranked within the next ``horizon_hours`` of both days.
+        """
+        if horizon_hours <= 0 or not today_prices:
+            return (
+                self.hour_offsets(today_prices),
+                self.hour_offsets(tomo_prices) if tomo_prices else [],
+            )
+        slots_per_hour = len(today_prices) / hours_in_day(today)
+        window = round(horizon_hours * slots_per_hour)
+        offsets = rolling_offsets(today_prices + tomo_prices, window)
+        return offsets[: len(today_prices)], offsets[len(today_prices) :]
 
     def get_price_at_offset_today(self, offset: float) -> float:
         return self.get_price_of_the_offset(self.today_prices, offset)
@@ -86,30 +116,8 @@ class Prices:
         if offset < 0 or offset > 1:
             raise ValueError("Offset must be between 0 and 1.")
 
-        # Group hours by price and interleave to match offset_now logic
-        from collections import defaultdict
-
-        price_groups: dict[float, list[int]] = defaultdict(list)
-        for hour, price in enumerate(prices):
-            price_groups[price].append(hour)
-
-        # Build sorted list with interleaved hours within each price tier
-        sorted_pairs = []
-        for price in sorted(price_groups.keys()):
-            hours = price_groups[price]
-            interleaved = self._interleave_hours(hours)
-            for hour in interleaved:
-                sorted_pairs.append((hour, price))
-
-        # Calculate the position corresponding to the given offset
-        position = int(round(offset * 23))
-
-        # Return the price at this position
         # This represents the threshold: hours with offset < setpoint will be ON
-        if position >= len(sorted_pairs):
-            position = len(sorted_pairs) - 1
-
-        return sorted_pairs[position][1]
+        return rank_index(prices).price_at_offset(offset)
 
     @property
     def price_now(self) -> float:
@@ -120,62 +128,61 @@ class Prices:
 
     @property
     def today_prices(self) -> list[float]:
-        settings = self.settings.get("Settings", {})
-
-        # If Norgespris is enabled, use fixed prices
-        if settings.get("UseNorgespris", False):
-            norgespris_rate = settings.get("NorgesprisRate", 50.0)
-            # Convert from øre to NOK to match Tibber API format
-            base_prices = [norgespris_rate / 100.0] * 24
-        else:
-            base_prices = self._load_prices("today")
-
-        # Add grid rent if enabled
-        if settings.get("IncludeGridRent", True):
-            grid_rent_config = settings.get("GridRent", {})
-            today_date = datetime.now().replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
-            return add_grid_rent_to_prices(base_prices, today_date, grid_rent_config)
-        return base_prices
+        return self.day_prices("today", self._today())
 
     @property
     def tomo_prices(self) -> list[float]:
+        return self.day_prices("tomorrow", self._today() + timedelta(days=1))
+
+    def day_prices(self, today_tomo: str, day: date) -> list[float]:
+        """Prices of every slot of ``day``, grid rent included when enabled."""
         settings = self.settings.get("Settings", {})
 
         # If Norgespris is enabled, use fixed prices
         if settings.get("UseNorgespris", False):
             norgespris_rate = settings.get("NorgesprisRate", 50.0)
             # Convert from øre to NOK to match Tibber API format
-            base_prices = [norgespris_rate / 100.0] * 24
+            base_prices = [norgespris_rate / 100.0] * hours_in_day(day)
         else:
-            base_prices = self._load_prices("tomorrow")
+            base_prices = self._load_prices(today_tomo)
 
         # Add grid rent if enabled
         if settings.get("IncludeGridRent", True):
             grid_rent_config = settings.get("GridRent", {})
-            tomorrow_date = datetime.now().replace(
-                hour=0, minute=0, second=0, microsecond=0
+            starts = self.slot_starts(today_tomo, day, len(base_prices))
+            return add_grid_rent_to_prices(
+                base_prices, local_midnight(day), grid_rent_config, starts
             )
-            # Add one day to get tomorrow
-            from datetime import timedelta
-
-            tomorrow_date += timedelta(days=1)
-            return add_grid_rent_to_prices(base_prices, tomorrow_date, grid_rent_config)
         return base_prices
 
-    def _load_prices(self, today_tomo: str) -> list[float]:
-        api_dict = self.price_dict
-        today_energy = (
-            api_dict.get("data", {})
+    def slot_starts(self, today_tomo: str, day: date, slots: int) -> list[datetime]:
+        """Start of every price slot: Tibber's startsAt, or ``slots`` equal slots."""
+        starts = parse_starts(
+            [item.get("startsAt") for item in self._price_items(today_tomo)]
+        )
+        if starts is not None and len(starts) == slots:
+            return starts
+        return slot_starts(day, slots)
+
+    def _price_items(self, today_tomo: str) -> list[dict]:
+        return (
+            self.price_dict.get("data", {})
             .get("viewer", {})
             .get("homes", [{}])[0]
             .get("currentSubscription", {})
             .get("priceInfo", {})
             .get(today_tomo, [])
         )
-        energy_values = [item.get("total") for item in today_energy]
-        return energy_values
+
+    def _load_prices(self, today_tomo: str) -> list[float]:
+        return [item.get("total") for item in self._price_items(today_tomo)]
+
+    def _today(self) -> date:
+        return datetime.now().date()
 
     def _hour_now(self) -> int:
-        return datetime.now().hour
+        prices = self.today_prices
+        if not prices:
+            return slot_index(datetime.now(), 24)
+        starts = self.slot_starts("today", self._today(), len(prices))
+        return SlotBoundaries.from_starts(starts).slot_at(time.time())
@@ -0,0 +1,66 @@
+"""
+Price ranking over a rolling window of slots.
+
+Ranking within the calendar day hides that 01:00 tomorrow is far cheaper than
+23:00 today. Here every slot is ranked among the slots of the next hours,
+across today and tomorrow. The window slides one slot at a time, so the
+prices in it are kept in a Fenwick tree over the price ranks: each slide is
+one removal and one insertion, and the rank of a price is a prefix sum.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class FenwickTree:
+    """Counts per position with O(log n) updates and prefix sums."""
+
+    def __init__(self, size: int) -> None:
+        self._tree = [0] * (size + 1)
+
+    def add(self, position: int, delta: int) -> None:
+        index = position + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, end: int) -> int:
+        """Sum of the counts at positions before ``end``."""
+        total = 0
+        index = end
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+
+def rolling_offsets(prices: Sequence[float], window: int) -> list[float]:
+    """Offset of every slot among the ``window`` slots starting at it.
+
+    The offset is the share of the window that is strictly cheaper, so equal
+    prices favour the earlier slot. Near the end of the known prices the
+    window keeps its length by starting earlier instead of shrinking.
+    """
+    count = len(prices)
+    if count == 0:
+        return []
+    window = min(max(window, 1), count)
+    last_position = max(window - 1, 1)
+    values = np.asarray(prices, dtype=float)
+    # Equal prices share a rank, so they count as neither cheaper nor dearer
+    ranks = np.unique(values, return_inverse=True)[1].tolist()
+
+    tree = FenwickTree(len(ranks))
+    for slot in range(window):
+        tree.add(ranks[slot], 1)
+    start = 0
+    offsets = []
+    for slot in range(count):
+        wanted = min(slot, count - window)
+        if wanted > start:
+            tree.add(ranks[start], -1)
+            tree.add(ranks[start + window], 1)
+            start = wanted
+        offsets.append(tree.prefix_sum(ranks[slot]) / last_position)
+    return offsets
@@ -0,0 +1,232 @@
+"""
+Precompiled price-only switch schedules.
+
+The price-only on/off state of every appliance depends solely on the price file
+and the settings, so it is compiled into a slot x appliance matrix whenever one
+of them changes. The request path then only indexes the current slot.
+"""
+
+import asyncio
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import numpy as np
+from loguru import logger
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.configuration import (
+    file_signature,
+    settings_snapshot,
+)
+from price_driven_switch.backend.price_file import PriceFile
+from price_driven_switch.backend.price_slots import SlotBoundaries
+from price_driven_switch.backend.prices import Prices
+from price_driven_switch.backend.switch_logic import load_appliance_table
+
+# Wait between background refresh attempts after a failed one
+BACKGROUND_REFRESH_RETRY_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class DaySchedule:
+    """Offsets and price-only on/off states for every slot of one day."""
+
+    day: date
+    offsets: np.ndarray  # shape (slots,)
+    on: np.ndarray  # shape (slots, appliances), bool
+    boundaries: SlotBoundaries
+
+    @property
+    def slots(self) -> int:
+        return len(self.offsets)
+
+
+@dataclass(frozen=True)
+class SwitchSchedule:
+    """Price-only switch schedule for today and tomorrow."""
+
+    appliances: ApplianceTable
+    today: DaySchedule
+    tomorrow: DaySchedule
+
+    def slot_now(self) -> int:
+        return self.today.boundaries.slot_at(time.time())
+
+    def seconds_until_next_slot(self) -> float:
+        return self.today.boundaries.seconds_until_next(time.time())
+
+    def offset_at(self, slot: int) -> float:
+        return float(self.today.offsets[slot])
+
+    def states_at(self, slot: int) -> ApplianceTable:
+        """Return the price-only states for a slot of today."""
+        return self.appliances.with_on(self.today.on[slot])
+
+    def for_day(self, day: date) -> "SwitchSchedule | None":
+        """Return the schedule with ``day`` as today, promoting tomorrow if needed.
+
+        Returns None when no compiled prices cover ``day``.
+        """
+        if self.today.day == day:
+            return self
+        if self.tomorrow.day == day and self.tomorrow.slots:
+            empty = build_day_schedule(self.appliances, day + timedelta(days=1), [])
+            return SwitchSchedule(self.appliances, today=self.tomorrow, tomorrow=empty)
+        return None
+
+
+def build_day_schedule(
+    appliances: ApplianceTable,
+    day: date,
+    offsets: list[float],
+    starts: Sequence[datetime] | None = None,
+) -> DaySchedule:
+    """Schedule of one day; without ``starts`` the slots split the day evenly."""
+    offsets_array = np.asarray(offsets, dtype=float)
+    setpoints = appliances.setpoint
+    # Same rule as get_price_based_states: ON when setpoint >= offset
+    on = setpoints[np.newaxis, :] >= offsets_array[:, np.newaxis]
+    if starts is not None and len(starts) == len(offsets):
+        boundaries = SlotBoundaries.from_starts(starts)
+    else:
+        boundaries = SlotBoundaries.uniform(day, len(offsets))
+    return DaySchedule(day=day, offsets=offsets_array, on=on, boundaries=boundaries)
+
+
+def build_schedule(
+    settings: Mapping[str, Any],
+    today_offsets: list[float],
+    tomorrow_offsets: list[float],
+    today: date | None = None,
+    today_starts: Sequence[datetime] | None = None,
+    tomorrow_starts: Sequence[datetime] | None = None,
+) -> SwitchSchedule:
+    """Build a schedule from already computed per-slot offsets."""
+    today = today or date.today()
+    appliances = load_appliance_table(settings)
+    return SwitchSchedule(
+        appliances=appliances,
+        today=build_day_schedule(appliances, today, today_offsets, today_starts),
+        tomorrow=build_day_schedule(
+            appliances, today + timedelta(days=1), tomorrow_offsets, tomorrow_starts
+        ),
+    )
+
+
+def compile_schedule(
+    price_dict: dict, settings: Mapping[str, Any], fetched_on: date | None = None
+) -> SwitchSchedule:
+    """Compile the schedule for the fetch day and the day after it.
+
+    Tibber's "today" and "tomorrow" are relative to when the prices were
+    fetched, so ``fetched_on`` is the day the schedule's today refers to.
+    """
+    today = fetched_on or date.today()
+    tomorrow = today + timedelta(days=1)
+    prices = Prices(price_dict, settings)
+    today_prices = prices.day_prices("today", today)
+    tomo_prices = prices.day_prices("tomorrow", tomorrow)
+    horizon_hours = settings.get("Settings", {}).get("RankingHorizonHours", 0)
+    today_offsets, tomo_offsets = prices.slot_offsets(
+        today_prices, tomo_prices, horizon_hours, today
+    )
+    return build_schedule(
+        settings,
+        today_offsets,
+        tomo_offsets,
+        today=today,
+        today_starts=prices.slot_starts("today", today, len(today_prices)),
+        tomorrow_starts=prices.slot_starts("tomorrow", tomorrow, len(tomo_prices)),
+    )
+
+
+class ScheduleCache:
+    """Keeps the compiled schedule and serves it without waiting on Tibber.
+
+    The schedule is recompiled from the price file on disk when the settings
+    snapshot version or the file changes. At midnight the already compiled
+    tomorrow schedule is promoted, and an out-of-date price file is refreshed
+    in the background. Only a call without any schedule for today waits for
+    the download.
+
+    When a PricePrefetcher keeps the file current, ``refresh_on_demand`` is
+    off and get() never touches the network: it raises LookupError until the
+    first prices are in.
+    """
+
+    def __init__(self, settings_path: str, price_file: PriceFile | None = None) -> None:
+        self.settings_path = settings_path
+        self.price_file = price_file or PriceFile()
+        self._schedule: SwitchSchedule | None = None
+        self._key: tuple | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self._last_failed_refresh: float | None = None
+        self.refresh_on_demand = True
+
+    def _inputs_key(self) -> tuple:
+        return (
+            settings_snapshot(self.settings_path).version,
+            file_signature(self.price_file.path),
+        )
+
+    def _compiled_for_today(self) -> SwitchSchedule | None:
+        key = self._inputs_key()
+        if key != self._key:
+            stored = self.price_file.stored_prices()
+            if stored is None:
+                return None
+            fetched_on, price_dict = stored
+            settings = settings_snapshot(self.settings_path).data
+            self._schedule = compile_schedule(price_dict, settings, fetched_on)
+            self._key = key
+        if self._schedule is None:
+            return None
+        schedule = self._schedule.for_day(date.today())
+        if schedule is not None:
+            self._schedule = schedule
+        return schedule
+
+    def warm(self) -> SwitchSchedule | None:
+        """Compile the schedule now, so the next request only reads it."""
+        return self._compiled_for_today()
+
+    async def get(self) -> SwitchSchedule:
+        schedule = self._compiled_for_today()
+        if not self.refresh_on_demand:
+            if schedule is None:
+                raise LookupError("No prices available for today")
+            return schedule
+        if schedule is None:
+            await self.refresh()
+            schedule = self._compiled_for_today()
+            if schedule is None:
+                raise LookupError("No prices available for today")
+        elif self.price_file.is_out_of_date():
+            self._refresh_in_background()
+        return schedule
+
+    async def refresh(self) -> None:
+        """Bring the price file up to date, the schedule follows on next access."""
+        await self.price_file.load_prices()
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if (
+            self._last_failed_refresh is not None
+            and time.monotonic() - self._last_failed_refresh
+            < BACKGROUND_REFRESH_RETRY_SECONDS
+        ):
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self.refresh()
+            self._last_failed_refresh = None
+        except Exception as error:
+            self._last_failed_refresh = time.monotonic()
+            logger.warning(f"Background price refresh failed: {error}")
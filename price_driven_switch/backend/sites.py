@@ -0,0 +1,448 @@
+"""
+Switch decisions for many sites in one process.
+
+Every site has its own directory with a settings.toml, a .env holding its
+TIBBER_TOKEN and its own prices.json. The appliances of all sites are padded
+into one site x appliance matrix, so the price rule and the greedy power
+limiter run as batched NumPy operations instead of once per site.
+
+Like the DecisionLoop of the default site, the engine publishes one snapshot
+per site. A site is recomputed on its own realtime readings and every site at
+the price slot boundaries; the endpoints only read the snapshots. A site
+whose prices or settings fail is left out of the batch and reported as
+unavailable, without holding back the others.
+"""
+
+import asyncio
+import os
+from collections.abc import Collection, Mapping
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+import numpy as np
+from dotenv import dotenv_values
+from loguru import logger
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.configuration import settings_snapshot
+from price_driven_switch.backend.price_file import PriceFile
+from price_driven_switch.backend.prices import seconds_until_next_slot
+from price_driven_switch.backend.schedule import ScheduleCache, SwitchSchedule
+from price_driven_switch.backend.tibber_connection import (
+    TibberConnection,
+    TibberRealtimeConnection,
+)
+
+PATH_SITES = "price_driven_switch/config/sites"
+# Settings the batched greedy limiter does not implement, with their defaults
+UNSUPPORTED_SITE_SETTINGS: dict[str, Any] = {
+    "SheddingStrategy": "greedy",
+    "UseLearnedPower": False,
+    "ForecastHorizonSeconds": 0,
+    "UseCapacityTariff": False,
+}
+
+# Table of a site not decided yet; one instance, so the matrix is kept
+NO_APPLIANCES = ApplianceTable.empty()
+
+
+@dataclass(frozen=True, eq=False)
+class SiteMatrix:
+    """Appliances of all sites, padded to the largest site.
+
+    Padding columns have priority -1 and a setpoint of -inf, so they are never
+    switched on and never touched by the limiter.
+    """
+
+    tables: tuple[ApplianceTable, ...]
+    power: np.ndarray  # shape (sites, appliances), kW
+    priority: np.ndarray
+    setpoint: np.ndarray
+
+    @classmethod
+    def from_tables(cls, tables: tuple[ApplianceTable, ...]) -> "SiteMatrix":
+        width = max((len(table) for table in tables), default=0)
+        power = np.zeros((len(tables), width))
+        priority = np.full((len(tables), width), -1, dtype=np.int64)
+        setpoint = np.full((len(tables), width), -np.inf)
+        for row, table in enumerate(tables):
+            count = len(table)
+            power[row, :count] = table.power
+            priority[row, :count] = table.priority
+            setpoint[row, :count] = table.setpoint
+        return cls(tables=tables, power=power, priority=priority, setpoint=setpoint)
+
+    def price_states(self, offsets: np.ndarray) -> np.ndarray:
+        """get_price_based_states for every site: ON when setpoint >= offset."""
+        return self.setpoint >= np.asarray(offsets, dtype=float)[:, np.newaxis]
+
+    def select(self, rows: np.ndarray) -> "SiteMatrix":
+        """The sites at ``rows``, keeping the padded width."""
+        return SiteMatrix(
+            tables=tuple(self.tables[row] for row in rows),
+            power=self.power[rows],
+            priority=self.priority[rows],
+            setpoint=self.setpoint[rows],
+        )
+
+    def rows(self, on: np.ndarray) -> list[ApplianceTable]:
+        """Split a state matrix back into one table per site."""
+        return [
+            table.with_on(on[row, : len(table)])
+            for row, table in enumerate(self.tables)
+        ]
+
+    def _priority_order(self, candidates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Columns by priority number per site, candidates first.
+
+        Returns the column order and which of the ordered columns are
+        candidates, the batched form of switch_logic._priority_order().
+        """
+        candidates = candidates & (self.priority >= 0)
+        key = np.where(candidates, self.priority, np.iinfo(np.int64).max)
+        order = np.argsort(key, axis=1, kind="stable")
+        return order, np.take_along_axis(candidates, order, axis=1)
+
+    def shed(
+        self, on: np.ndarray, power_now: np.ndarray, power_limit: np.ndarray
+    ) -> np.ndarray:
+        """Greedy shedding of every site, lowest priority number first."""
+        order, candidate = self._priority_order(on)
+        power_w = np.take_along_axis(self.power, order, axis=1) * 1000
+        # Same running subtraction as the single-site limiter
+        remaining = np.subtract.accumulate(
+            np.concatenate([power_now[:, np.newaxis], power_w], axis=1), axis=1
+        )[:, 1:]
+        under_limit = (remaining < power_limit[:, np.newaxis] * 1000) & candidate
+        cut = np.where(
+            under_limit.any(axis=1), under_limit.argmax(axis=1) + 1, on.shape[1]
+        )
+        shed_sorted = candidate & (np.arange(on.shape[1]) < cut[:, np.newaxis])
+        shed = np.zeros_like(on)
+        np.put_along_axis(shed, order, shed_sorted, axis=1)
+        return on & ~shed
+
+    def restore(
+        self,
+        on: np.ndarray,
+        wanted: np.ndarray,
+        power_now: np.ndarray,
+        power_limit: np.ndarray,
+    ) -> np.ndarray:
+        """First-fit restoring of every site, one priority rank at a time."""
+        order, candidate = self._priority_order(wanted & ~on)
+        reserve = power_limit * 1000 - power_now
+        restored = on.copy()
+        sites = np.arange(on.shape[0])
+        for rank in range(on.shape[1]):
+            column = order[:, rank]
+            power = self.power[sites, column]
+            fits = candidate[:, rank] & (power < reserve / 1000)
+            reserve = np.where(fits, reserve - power * 1000, reserve)
+            restored[sites, column] |= fits
+        return restored & wanted
+
+    def limit_power(
+        self,
+        switch_states: np.ndarray,
+        power_limit: np.ndarray,
+        power_now: np.ndarray,
+        prev_states: np.ndarray,
+        prev_valid: np.ndarray,
+    ) -> np.ndarray:
+        """switch_logic.limit_power_table() with the greedy strategy, per site.
+
+        ``prev_valid`` marks the sites whose previous states belong to the
+        same appliances.
+        """
+        power_now = np.asarray(power_now, dtype=float)
+        power_limit = np.asarray(power_limit, dtype=float)
+        limit_w = power_limit * 1000
+        bypass = (power_limit == 0) | (power_now == 0)
+        from_price = ~prev_valid | (switch_states == prev_states).all(axis=1)
+
+        result = switch_states.copy()
+        shed_price = ~bypass & from_price & (power_now > limit_w)
+        restore_prev = ~bypass & ~from_price & (power_now < limit_w)
+        shed_prev = ~bypass & ~from_price & (power_now >= limit_w)
+        if shed_price.any():
+            result[shed_price] = self.shed(switch_states, power_now, power_limit)[
+                shed_price
+            ]
+        if restore_prev.any():
+            result[restore_prev] = self.restore(
+                prev_states, switch_states, power_now, power_limit
+            )[restore_prev]
+        if shed_prev.any():
+            result[shed_prev] = self.shed(prev_states, power_now, power_limit)[
+                shed_prev
+            ]
+        return result
+
+
+def check_site_settings(name: str, settings: Mapping[str, Any]) -> None:
+    """Reject settings a site would silently ignore."""
+    options = settings.get("Settings", {})
+    unsupported = [
+        key
+        for key, default in UNSUPPORTED_SITE_SETTINGS.items()
+        if options.get(key, default) != default
+    ]
+    if unsupported:
+        raise ValueError(
+            f"Site '{name}' sets {', '.join(unsupported)}, which only the "
+            "default site supports"
+        )
+
+
+@dataclass
+class Site:
+    name: str
+    settings_path: str
+    schedule_cache: ScheduleCache
+    realtime: TibberRealtimeConnection
+
+    @classmethod
+    def from_directory(cls, path: str) -> "Site":
+        """Load a site, raising ValueError when it is not fully configured."""
+        name = os.path.basename(path)
+        env_path = os.path.join(path, ".env")
+        token = dotenv_values(env_path).get("TIBBER_TOKEN")
+        if not token:
+            raise ValueError(f"Site '{name}' has no TIBBER_TOKEN in {env_path}")
+        settings_path = os.path.join(path, "settings.toml")
+        price_file = PriceFile(
+            TibberConnection(token), os.path.join(path, "prices.json")
+        )
+        site = cls(
+            name=name,
+            settings_path=settings_path,
+            schedule_cache=ScheduleCache(settings_path, price_file),
+            realtime=TibberRealtimeConnection(token),
+        )
+        site.settings()
+        return site
+
+    def settings(self) -> Mapping[str, Any]:
+        settings = settings_snapshot(self.settings_path).data
+        check_site_settings(self.name, settings)
+        return settings
+
+    def warm_schedule(self) -> SwitchSchedule | None:
+        try:
+            return self.schedule_cache.warm()
+        except Exception:
+            # Reported by the next decision of the site
+            return None
+
+
+@dataclass(frozen=True)
+class SiteDecision:
+    price_states: ApplianceTable
+    states: ApplianceTable
+    power_now: int
+    power_limit: float
+    offset: float
+
+
+class MultiSiteEngine:
+    """Decides the switch states of all sites in batches.
+
+    While run() is active the endpoints read the latest snapshot of a site.
+    Without a running engine, latest() decides the requested site on demand.
+    """
+
+    def __init__(self, sites: list[Site]) -> None:
+        self.sites = {site.name: site for site in sites}
+        self.snapshots: dict[str, SiteDecision] = {}
+        self.errors: dict[str, str] = {}
+        self.running = False
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._pending: set[str] = set()
+        self._matrix: SiteMatrix | None = None
+        self._previous: np.ndarray | None = None
+
+    @classmethod
+    def from_directory(cls, path: str = PATH_SITES) -> "MultiSiteEngine":
+        """One site per subdirectory holding a settings.toml, none if missing."""
+        if not os.path.isdir(path):
+            return cls([])
+        return cls(
+            [
+                Site.from_directory(os.path.join(path, name))
+                for name in sorted(os.listdir(path))
+                if os.path.isfile(os.path.join(path, name, "settings.toml"))
+            ]
+        )
+
+    def trigger(self, name: str) -> None:
+        """Request a recomputation of site ``name``, e.g. for a new reading."""
+        self._pending.add(name)
+        self._wakeup.set()
+
+    def seconds_until_next_slot(self) -> float:
+        """Time until the next price slot of any site starts."""
+        seconds = [
+            schedule.seconds_until_next_slot()
+            for schedule in (site.warm_schedule() for site in self.sites.values())
+            if schedule is not None and schedule.today.slots
+        ]
+        return min(seconds, default=seconds_until_next_slot(datetime.now(), 24))
+
+    async def run(self) -> None:
+        self.running = True
+        self._pending.update(self.sites)
+        try:
+            while True:
+                self._wakeup.clear()
+                pending, self._pending = self._pending, set()
+                try:
+                    await self.decide(pending)
+                except Exception as error:
+                    # Keep serving the last snapshots until the next trigger
+                    logger.warning(f"Site decisions failed: {error}")
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=self.seconds_until_next_slot()
+                    )
+                except TimeoutError:
+                    self._pending.update(self.sites)  # slot boundary reached
+        finally:
+            self.running = False
+
+    async def latest(self, name: str) -> SiteDecision:
+        """The published decision of site ``name``.
+
+        Raises LookupError while the site's last decision failed.
+        """
+        if not self.running:
+            await self.decide([name])
+        if name in self.errors:
+            raise LookupError(f"Site '{name}' is unavailable: {self.errors[name]}")
+        if name not in self.snapshots:
+            raise LookupError(f"Site '{name}' has no decision yet")
+        return self.snapshots[name]
+
+    def _failed(self, name: str, error: Exception) -> None:
+        logger.warning(f"Switch decision of site {name} failed: {error}")
+        self.errors[name] = str(error)
+
+    async def _site_inputs(
+        self, names: list[str]
+    ) -> dict[str, tuple[ApplianceTable, float, float]]:
+        """Appliances, offset and power limit of every site that has them."""
+        sites = [self.sites[name] for name in names]
+        schedules = await asyncio.gather(
+            *(site.schedule_cache.get() for site in sites), return_exceptions=True
+        )
+        inputs = {}
+        for site, schedule in zip(sites, schedules, strict=True):
+            try:
+                if isinstance(schedule, BaseException):
+                    raise schedule
+                offset = schedule.offset_at(schedule.slot_now())
+                power_limit = float(site.settings()["Settings"]["MaxPower"])
+            except Exception as error:
+                self._failed(site.name, error)
+                continue
+            inputs[site.name] = (schedule.appliances, offset, power_limit)
+        return inputs
+
+    def _tables_with(
+        self, tables: Mapping[str, ApplianceTable]
+    ) -> tuple[ApplianceTable, ...]:
+        """Tables of all sites; sites outside the batch keep their current one."""
+        current = (
+            dict(zip(self.sites, self._matrix.tables, strict=True))
+            if self._matrix is not None
+            else {}
+        )
+        return tuple(
+            tables[name] if name in tables else current.get(name, NO_APPLIANCES)
+            for name in self.sites
+        )
+
+    def _matrix_for(self, tables: tuple[ApplianceTable, ...]) -> np.ndarray:
+        """Update the matrix, returning which sites kept their appliances."""
+        matrix = self._matrix
+        if matrix is not None and all(
+            new is old for new, old in zip(tables, matrix.tables, strict=True)
+        ):
+            return np.ones(len(tables), dtype=bool)
+        self._matrix = SiteMatrix.from_tables(tables)
+        if matrix is None or self._previous is None:
+            return np.zeros(len(tables), dtype=bool)
+        kept = np.array(
+            [
+                new.same_appliances(old)
+                for new, old in zip(tables, matrix.tables, strict=True)
+            ]
+        )
+        # Carry the previous states of unchanged sites over to the new width
+        previous = np.zeros((len(tables), self._matrix.power.shape[1]), dtype=bool)
+        for row, table in enumerate(tables):
+            if kept[row]:
+                previous[row, : len(table)] = self._previous[row, : len(table)]
+        self._previous = previous
+        return kept
+
+    async def decide(
+        self, names: Collection[str] | None = None
+    ) -> dict[str, SiteDecision]:
+        """Recompute the named sites, all by default, in one batch.
+
+        Returns the new decisions; sites that failed are left out and keep
+        their error until they are decided again.
+        """
+        async with self._lock:
+            wanted = [name for name in self.sites if names is None or name in names]
+            inputs = await self._site_inputs(wanted)
+            if not inputs:
+                return {}
+            tables = self._tables_with(
+                {name: appliances for name, (appliances, _, _) in inputs.items()}
+            )
+            prev_valid = self._matrix_for(tables)
+            matrix = self._matrix
+            assert matrix is not None
+            if self._previous is None:
+                self._previous = np.zeros(matrix.power.shape, dtype=bool)
+
+            names_in_batch = list(inputs)
+            order = list(self.sites)
+            rows = np.array([order.index(name) for name in names_in_batch])
+            batch = matrix.select(rows)
+            offsets = np.array([inputs[name][1] for name in names_in_batch])
+            power_limit = np.array([inputs[name][2] for name in names_in_batch])
+            power_now = np.array(
+                [self.sites[name].realtime.power_reading for name in names_in_batch]
+            )
+            price_on = batch.price_states(offsets)
+            on = batch.limit_power(
+                price_on, power_limit, power_now, self._previous[rows], prev_valid[rows]
+            )
+            self._previous[rows] = on
+
+            decisions = {
+                name: SiteDecision(
+                    price_states=price_states,
+                    states=states,
+                    power_now=int(power_now[row]),
+                    power_limit=float(power_limit[row]),
+                    offset=float(offsets[row]),
+                )
+                for row, (name, price_states, states) in enumerate(
+                    zip(
+                        names_in_batch,
+                        batch.rows(price_on),
+                        batch.rows(on),
+                        strict=True,
+                    )
+                )
+            }
+            self.snapshots.update(decisions)
+            for name in decisions:
+                self.errors.pop(name, None)
+            return decisions
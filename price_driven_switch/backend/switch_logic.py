@@ -1,17 +1,34 @@
 # mypy: disable-error-code="index,operator"
 # pyright: reportGeneralTypeIssues=false, reportArgumentType=false, reportOperatorIssue=false
+from collections.abc import Mapping
+from dataclasses import dataclass
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.decision_events import (
+    AppliancesSwitched,
+    DecisionEvent,
+    DecisionSummary,
+    PowerChecked,
+    PowerLimitBypassed,
+    SheddingBudgetExceeded,
+    UnexpectedState,
+)
+from price_driven_switch.backend.knapsack import best_subset
 from price_driven_switch.backend.logging_utils import (
-    log_if_changed,
-    log_switch_decision_summary,
+    log_decision_events,
     structured_logger,
 )
 
+SHEDDING_STRATEGIES = ("greedy", "knapsack")
+# Time the knapsack strategy may take before greedy shedding takes over
+SHEDDING_BUDGET_MS = 20.0
+
 
-def load_appliances_df(settings: dict[str, Any]) -> pd.DataFrame:
+def load_appliances_df(settings: Mapping[str, Any]) -> pd.DataFrame:
     """Load appliances from settings.toml into a pandas DataFrame."""
     appliances = settings["Appliances"]
     df = pd.DataFrame.from_dict(appliances, orient="index")  # type: ignore
@@ -26,139 +43,260 @@ def get_price_based_states(
     appliance_df: pd.DataFrame,
     offset_now: float,
 ) -> pd.DataFrame:
-    appliance_df["on"] = appliance_df["Setpoint"] >= offset_now
-    structured_logger.log_price_logic_result(appliance_df, offset_now)
-    return appliance_df
+    """A copy of ``appliance_df`` with the price-only ``on`` column added.
+
+    For DataFrame callers; decisions read the compiled schedule instead.
+    """
+    return appliance_df.assign(on=appliance_df["Setpoint"] >= offset_now)
 
 
 def set_price_only_based_states(
-    settings: dict[str, Any], offset_now: float
+    settings: Mapping[str, Any], offset_now: float
 ) -> pd.DataFrame:
     output = get_price_based_states(load_appliances_df(settings), offset_now)
+    structured_logger.log_price_logic_result(output, offset_now)
     return output
 
 
-def check_frames(df1: pd.DataFrame, df2: pd.DataFrame, ignore_column: str) -> bool:
-    # Selecting all columns except the one to ignore
-    df1_filtered = df1[df1.columns.difference([ignore_column])]  # type: ignore
-    df2_filtered = df2[df2.columns.difference([ignore_column])]  # type: ignore
+def load_appliance_table(settings: Mapping[str, Any]) -> ApplianceTable:
+    """Load appliances from settings.toml into a compact table, all OFF."""
+    return ApplianceTable.from_settings(settings)
 
-    # Comparing the filtered DataFrames
-    return df1_filtered.equals(df2_filtered)
 
+def price_based_table(table: ApplianceTable, offset_now: float) -> ApplianceTable:
+    """Price-only states: ON when the setpoint is at or above the offset."""
+    return table.with_on(table.setpoint >= offset_now)
 
-def limit_power(
-    switch_states: pd.DataFrame,
+
+def _priority_order(table: ApplianceTable, candidates: np.ndarray) -> np.ndarray:
+    """Rows of ``candidates`` by priority number, in table order within a tier.
+
+    Negative priorities are never switched, like priorities outside the
+    0..max range the limiter has always walked.
+    """
+    rows = np.flatnonzero(candidates & (table.priority >= 0))
+    return rows[np.argsort(table.priority[rows], kind="stable")]
+
+
+def _shed(
+    table: ApplianceTable,
+    on: np.ndarray,
+    power_now: float,
+    power_limit: float,
+    strategy: str,
+    budget_ms: float,
+    events: list[DecisionEvent],
+) -> np.ndarray:
+    """Turn appliances OFF until the power is under the limit.
+
+    The greedy strategy goes by lowest priority number first. The knapsack
+    strategy keeps the most valuable appliances that fit, see _most_valuable().
+    """
+    order = _priority_order(table, on)
+    shed = None
+    if strategy == "knapsack":
+        power_w = table.power[order] * 1000
+        # Load that stays on whatever is switched, e.g. appliances not managed here
+        base_load = power_now - power_w.sum()
+        keep = _most_valuable(
+            table, order, power_limit * 1000 - base_load, budget_ms, events
+        )
+        if keep is not None:
+            shed = order[~keep]
+    if shed is None:
+        # Power left after switching off each appliance in turn, subtracted in order
+        remaining = np.subtract.accumulate(
+            np.concatenate(([power_now], table.power[order] * 1000))
+        )[1:]
+        under_limit = remaining < power_limit * 1000
+        cut = int(under_limit.argmax()) + 1 if under_limit.any() else len(order)
+        shed = order[:cut]
+    on[shed] = False
+    if len(shed):
+        events.append(AppliancesSwitched(table, shed, on=False))
+    return on
+
+
+def _most_valuable(
+    table: ApplianceTable,
+    order: np.ndarray,
+    capacity_w: float,
+    budget_ms: float,
+    events: list[DecisionEvent],
+) -> np.ndarray | None:
+    """Which of the ``order`` rows to keep ON with less than ``capacity_w``.
+
+    An appliance is worth its power times its priority number, so important
+    and large loads are kept first. None when the time budget ran out.
+    """
+    power_w = table.power[order] * 1000
+    keep = best_subset(
+        power_w, power_w * table.priority[order], capacity_w, budget_ms / 1000
+    )
+    if keep is None:
+        events.append(SheddingBudgetExceeded(budget_ms))
+    return keep
+
+
+@dataclass(frozen=True)
+class PowerLimitResult:
+    states: ApplianceTable
+    events: list[DecisionEvent]
+
+
+def decide_power_limit(
+    switch_states: ApplianceTable,
     power_limit: float,
     power_now: int,
-    prev_states: pd.DataFrame,
-) -> pd.DataFrame:
-    switch_df = switch_states
-    prev_states_df = prev_states
+    prev_states: ApplianceTable,
+    strategy: str = "greedy",
+    budget_ms: float = SHEDDING_BUDGET_MS,
+) -> PowerLimitResult:
+    """Limit the price-only states to the power limit, starting from prev_states.
+
+    Side-effect free: the inputs are not modified and nothing is logged.
+    What happened is described by the returned events instead.
+
+    ``strategy`` is one of SHEDDING_STRATEGIES, the knapsack strategy falls
+    back to greedy when it takes longer than ``budget_ms``.
+    """
+    events: list[DecisionEvent] = []
 
     # fallback case
     if power_limit == 0 or power_now == 0:
-        log_if_changed("[POWER] Power limiting bypassed (zero power or limit)", 60)
-        return switch_df
+        events.append(PowerLimitBypassed())
+        return PowerLimitResult(switch_states, events)
 
-    elif switch_df.equals(prev_states_df) or not check_frames(
-        switch_df, prev_states_df, "on"
-    ):
+    same_appliances = switch_states.same_appliances(prev_states)
+    if not same_appliances or switch_states.states_equal(prev_states):
         if power_now < power_limit * 1000:
-            structured_logger.logger.log_power_limiting_decision(
-                power_now, power_limit, "OK"
-            )
-            return switch_df
+            events.append(PowerChecked(power_now, power_limit, "OK"))
+            return PowerLimitResult(switch_states, events)
         if power_now > power_limit * 1000:
-            total_power = power_now
             excess_w = power_now - power_limit * 1000
-            structured_logger.logger.log_power_limiting_decision(
-                power_now, power_limit, "OVER", f"Reducing power by {excess_w}W"
+            events.append(
+                PowerChecked(
+                    power_now, power_limit, "OVER", f"Reducing power by {excess_w}W"
+                )
             )
-
-            for priority in range(0, switch_df["Priority"].max() + 1):
-                for index, prev_row in switch_df.iterrows():
-                    if prev_row["Priority"] == priority and prev_row["on"] is True:
-                        total_power = total_power - prev_row["Power"] * 1000
-                        switch_df.at[index, "on"] = False
-                        structured_logger.log_appliance_turned_off(
-                            str(index),
-                            float(prev_row["Power"]),
-                            int(prev_row["Priority"]),
-                        )
-                        if total_power < power_limit * 1000:
-                            break
-                if total_power < power_limit * 1000:
-                    break
-            return switch_df
+            on = _shed(
+                switch_states,
+                switch_states.on.copy(),
+                power_now,
+                power_limit,
+                strategy,
+                budget_ms,
+                events,
+            )
+            return PowerLimitResult(switch_states.with_on(on), events)
 
     # case of valid pervious state persent
-    elif check_frames(switch_df, prev_states_df, "on") and not switch_df.equals(
-        prev_states_df
-    ):
-        if power_now < power_limit * 1000:
-            power_reserve = power_limit * 1000 - power_now
-            structured_logger.logger.log_power_limiting_decision(
+    elif power_now < power_limit * 1000:
+        power_reserve = power_limit * 1000 - power_now
+        events.append(
+            PowerChecked(
                 power_now,
                 power_limit,
                 "RESERVE",
                 f"Checking if appliances can be turned ON with {power_reserve}W available",
             )
-            for priority in range(0, prev_states_df["Priority"].max() + 1):
-                for index, prev_row in prev_states_df.iterrows():
-                    # check if appliance was on in swtich_df but is off in prev_states_df
-                    if (
-                        (prev_row["Priority"] == priority)
-                        and (prev_row["on"] == False)  # noqa: E712
-                        and (switch_df.at[index, "on"] == True)  # noqa: E712
-                    ):
-                        total_power = power_now + prev_row["Power"] * 1000
-                        if prev_row["Power"] < power_reserve / 1000:
-                            prev_states_df.at[index, "on"] = True
-                            power_reserve = power_reserve - prev_row["Power"] * 1000
-                            structured_logger.log_appliance_turned_on(
-                                str(index),
-                                float(prev_row["Power"]),
-                                int(prev_row["Priority"]),
-                            )
-                    if switch_df.at[index, "on"] == False:  # noqa: E712
-                        prev_states_df.at[index, "on"] = False
-
-            # Log final summary for this case
-            log_switch_decision_summary(
-                switch_df,
-                prev_states_df,
+        )
+        wanted = switch_states.on
+        on = prev_states.on.copy()
+        # check if appliance was on in switch_states but is off in prev_states
+        order = _priority_order(prev_states, wanted & ~on)
+        keep = None
+        if strategy == "knapsack":
+            keep = _most_valuable(prev_states, order, power_reserve, budget_ms, events)
+        if keep is not None:
+            restored = order[keep].tolist()
+        else:
+            restored = []
+            for index, power in zip(
+                order.tolist(), prev_states.power[order].tolist(), strict=True
+            ):
+                if power < power_reserve / 1000:
+                    restored.append(index)
+                    power_reserve = power_reserve - power * 1000
+        on[restored] = True
+        if restored:
+            events.append(
+                AppliancesSwitched(prev_states, np.asarray(restored), on=True)
+            )
+        on &= wanted
+        final_states = prev_states.with_on(on)
+
+        events.append(
+            DecisionSummary(
+                switch_states,
+                final_states,
                 power_now,
                 power_limit,
                 0.5,  # Default price offset for logging
             )
-            return prev_states_df
+        )
+        return PowerLimitResult(final_states, events)
 
-        else:
-            total_power = power_now
-            excess_w = total_power - power_limit * 1000
-            structured_logger.logger.log_power_limiting_decision(
+    else:
+        excess_w = power_now - power_limit * 1000
+        events.append(
+            PowerChecked(
                 power_now,
                 power_limit,
                 "OVER",
                 f"Reducing power by {excess_w}W from existing state",
             )
+        )
+        on = _shed(
+            prev_states,
+            prev_states.on.copy(),
+            power_now,
+            power_limit,
+            strategy,
+            budget_ms,
+            events,
+        )
+        return PowerLimitResult(prev_states.with_on(on), events)
+
+    events.append(UnexpectedState("Unexpected code path in limit_power function"))
+    return PowerLimitResult(switch_states, events)
+
 
-            for priority in range(0, switch_df["Priority"].max() + 1):
-                for index, prev_row in prev_states_df.iterrows():
-                    if prev_row["Priority"] == priority and prev_row["on"] is True:
-                        total_power = total_power - prev_row["Power"] * 1000
-                        prev_states_df.at[index, "on"] = False
-                        structured_logger.log_appliance_turned_off(
-                            str(index),
-                            float(prev_row["Power"]),
-                            int(prev_row["Priority"]),
-                        )
-                        if total_power < power_limit * 1000:
-                            break
-                if total_power < power_limit * 1000:
-                    break
-            return prev_states_df
-
-    structured_logger.log_error_state("Unexpected code path in limit_power function")
-    return switch_df
+def limit_power_table(
+    switch_states: ApplianceTable,
+    power_limit: float,
+    power_now: int,
+    prev_states: ApplianceTable,
+    strategy: str = "greedy",
+    budget_ms: float = SHEDDING_BUDGET_MS,
+) -> ApplianceTable:
+    """decide_power_limit() with its events written to the log."""
+    result = decide_power_limit(
+        switch_states, power_limit, power_now, prev_states, strategy, budget_ms
+    )
+    log_decision_events(result.events)
+    return result.states
+
+
+def limit_power(
+    switch_states: pd.DataFrame,
+    power_limit: float,
+    power_now: int,
+    prev_states: pd.DataFrame,
+    strategy: str = "greedy",
+    budget_ms: float = SHEDDING_BUDGET_MS,
+) -> pd.DataFrame:
+    """DataFrame front end of limit_power_table; the inputs are not modified."""
+    result = limit_power_table(
+        ApplianceTable.from_frame(switch_states),
+        power_limit,
+        power_now,
+        ApplianceTable.from_frame(prev_states),
+        strategy,
+        budget_ms,
+    )
+    # Both inputs describe the same appliances whenever the result is not
+    # based on switch_states, so only the on/off column differs
+    output = switch_states.copy()
+    output["on"] = result.on
+    return output
@@ -0,0 +1,65 @@
+"""
+Ownership of the previous switch states.
+
+The states the power limiter starts from are kept as immutable records. A new
+record only replaces the current one through a compare-and-swap on its
+sequence number, so concurrent decisions can never interleave.
+"""
+
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+
+
+@dataclass(frozen=True)
+class SwitchStateRecord:
+    """Switch states published as decision ``sequence``."""
+
+    sequence: int
+    states: ApplianceTable
+
+
+class StateConflictError(RuntimeError):
+    """Raised when a state update keeps losing the compare-and-swap."""
+
+
+class SwitchStateStore:
+    def __init__(self, initial: ApplianceTable) -> None:
+        self._lock = threading.Lock()
+        self._current = SwitchStateRecord(sequence=0, states=initial)
+
+    @property
+    def current(self) -> SwitchStateRecord:
+        return self._current
+
+    def compare_and_swap(
+        self, expected_sequence: int, states: ApplianceTable
+    ) -> SwitchStateRecord | None:
+        """Publish ``states`` if no other decision was published since.
+
+        Returns the new record, or None when ``expected_sequence`` is stale.
+        """
+        with self._lock:
+            if self._current.sequence != expected_sequence:
+                return None
+            self._current = SwitchStateRecord(
+                sequence=expected_sequence + 1, states=states
+            )
+            return self._current
+
+    def update(
+        self,
+        decide: Callable[[SwitchStateRecord], ApplianceTable],
+        max_attempts: int = 5,
+    ) -> SwitchStateRecord:
+        """Run ``decide`` on the current record until its result is published."""
+        for _ in range(max_attempts):
+            previous = self._current
+            record = self.compare_and_swap(previous.sequence, decide(previous))
+            if record is not None:
+                return record
+        raise StateConflictError(
+            f"Switch states changed during {max_attempts} decision attempts"
+        )
@@ -1,4 +1,6 @@
 import os
+import time
+from collections.abc import Callable
 
 import aiohttp
 import tibber
@@ -7,6 +9,8 @@ from loguru import logger
 from python_graphql_client import GraphqlClient  # type: ignore
 from tibber.home import TibberHome
 
+from price_driven_switch.backend.power_history import PowerHistory
+
 TIBBER_API_ENDPOINT = "https://api.tibber.com/v1-beta/gql"
 
 PRICE_NO_TAX_QUERY = """
@@ -17,9 +21,11 @@ PRICE_NO_TAX_QUERY = """
             priceInfo{
             today {
                 total
+                startsAt
             }
             tomorrow {
                 total
+                startsAt
             }
             }
         }
@@ -78,6 +84,12 @@ class TibberRealtimeConnection:
         self.tibber_connection: tibber.Tibber | None = None
         self.home: TibberHome | None = None
         self.session: aiohttp.ClientSession | None = None
+        self.listeners: list[Callable[[int], None]] = []
+        self.history = PowerHistory()
+
+    def add_listener(self, listener: Callable[[int], None]) -> None:
+        """Call ``listener`` with every new power reading."""
+        self.listeners.append(listener)
 
     async def initialize_tibber(self) -> None:
         if not self.tibber_connection:
@@ -98,7 +110,14 @@ class TibberRealtimeConnection:
         if live_measurement:
             self.power_reading = live_measurement.get("power")
             self.subscription_status = True
+            self.history.append(time.time(), live_measurement)
             logger.debug(f"Power reading: {self.power_reading}")
+            for listener in self.listeners:
+                # A failing listener must not keep the reading from the others
+                try:
+                    listener(self.power_reading)
+                except Exception:
+                    logger.exception(f"Realtime listener {listener!r} failed")
         else:
             self.subscription_status = False
 
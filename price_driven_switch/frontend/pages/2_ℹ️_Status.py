@@ -6,6 +6,7 @@ import streamlit as st
 from price_driven_switch.backend.configuration import load_settings_file
 from price_driven_switch.frontend.st_functions import (
     format_switch_states,
+    get_power_history,
     get_power_reading,
     get_prev_setpoints_json,
     get_setpoints_json,
@@ -53,6 +54,11 @@ if power_limit > 0:
             value=round(power_limit, 2),
         )
 
+    power_history = get_power_history()
+    if not power_history.empty:
+        st.markdown("**Power, last 24 h (kW, 5 min min/mean/max)**")
+        st.line_chart(power_history)
+
     if st.button("Refresh"):
         st.rerun()
 else:
@@ -14,6 +14,8 @@ from price_driven_switch.backend.configuration import (
     save_settings,
     update_max_power,
 )
+from price_driven_switch.backend.price_rank import rank_index
+from price_driven_switch.backend.prices import slot_index
 from price_driven_switch.backend.switch_logic import load_appliances_df
 from price_driven_switch.backend.tibber_connection import TibberConnection
 
@@ -99,48 +101,9 @@ def plot_prices(
 
     fig = go.Figure()
 
-    # Calculate hour offsets using the same logic as offset_now with interleaving
-    def _interleave_hours_chart(hours: list[int]) -> list[int]:
-        """Match the interleaving logic from Prices class."""
-        if len(hours) <= 1:
-            return hours
-
-        result = []
-        queue = [(0, len(hours) - 1)]
-
-        while queue:
-            start, end = queue.pop(0)
-            if start > end:
-                continue
-
-            mid = (start + end) // 2
-            result.append(hours[mid])
-
-            queue.append((start, mid - 1))
-            queue.append((mid + 1, end))
-
-        return result
-
-    # Group hours by price and interleave
-    from collections import defaultdict
-
-    price_groups: dict[float, list[int]] = defaultdict(list)
-    for hour, price in enumerate(prices_list):
-        price_groups[price].append(hour)
-
-    # Build sorted list with interleaved hours within each price tier
-    sorted_pairs = []
-    for price in sorted(price_groups.keys()):
-        hours = price_groups[price]
-        interleaved = _interleave_hours_chart(hours)
-        for hour in interleaved:
-            sorted_pairs.append((hour, price))
-
-    # Calculate offsets for each hour
-    hour_offsets = {}
-    for hour in range(len(prices_list)):
-        position = next(i for i, (h, _) in enumerate(sorted_pairs) if h == hour)
-        hour_offsets[hour] = position / 23
+    # Same ranking as offset_now, shared through the cached index
+    ranking = rank_index(prices_list)
+    hour_offsets = ranking.offsets
 
     # Add bars to the plot
     for i, (key, setpoint) in enumerate(sorted_setpoints):
@@ -163,11 +126,7 @@ def plot_prices(
         )
 
         # Calculate threshold price for the horizontal line
-        # Get the price at position corresponding to this setpoint
-        threshold_position = int(round(setpoint * 23))
-        if threshold_position >= len(sorted_pairs):
-            threshold_position = len(sorted_pairs) - 1
-        threshold_price = sorted_pairs[threshold_position][1] * 100  # Convert to øre
+        threshold_price = ranking.price_at_offset(setpoint) * 100  # Convert to øre
 
         # Add horizontal line for the threshold price
         fig.add_shape(
@@ -211,7 +170,7 @@ def plot_prices(
         )
 
     if show_time:
-        current_hour = datetime.now().hour
+        current_hour = slot_index(datetime.now(), len(prices_list))
         shape_part(-0.5, -0.12, 1.05, "rgba(255, 0, 0, 1)", 1)  # left border
         shape_part(0.5, -0.12, 1.05, "rgba(255, 0, 0, 1)", 1)  # right border
         shape_part(0, -0.12, 1.05, "rgba(255, 0, 0, 0.1)", 22)  # fill
@@ -266,7 +225,11 @@ def change_df_state(df: pd.DataFrame) -> None:
 
 
 def save_appliances(df: pd.DataFrame) -> None:
-    edited_appliances_dict = df.to_dict(orient="index")
+    # Optional columns such as Group are left out where they are empty
+    edited_appliances_dict = {
+        name: {key: value for key, value in row.items() if not pd.isna(value)}
+        for name, row in df.to_dict(orient="index").items()
+    }
 
     new_settings = load_settings_file().copy()
     new_settings["Appliances"] = edited_appliances_dict
@@ -302,6 +265,7 @@ def appliances_editor() -> None:
                 step=1,
                 default=1,
             ),
+            "Group": st.column_config.TextColumn(required=False),
         },
     )
     st.session_state["appliance_editor"] = appliances_editor_frame
@@ -405,6 +369,25 @@ def get_subscription_status() -> str:
         return str(e)
 
 
+def get_power_history(window: int = 24 * 3600, resolution: int = 300) -> pd.DataFrame:
+    """Min, mean and max power in kW per bucket, indexed by bucket start."""
+    url = f"http://{fast_api_address()}/power/history"
+    try:
+        response = requests.get(
+            url, params={"window": window, "resolution": resolution}
+        )
+        response.raise_for_status()
+        data: dict = response.json()
+    except requests.RequestException as e:
+        print(f"An error occurred: {e}")
+        return pd.DataFrame(columns=["min", "mean", "max"])
+    history = pd.DataFrame(
+        {column: data[column] for column in ("min", "mean", "max")},
+        index=pd.to_datetime(data["start"], unit="s", utc=True),
+    )
+    return history / 1000
+
+
 def update_grid_rent_settings(
     original_dict: dict[str, Any],
     include_grid_rent: bool,
@@ -1,12 +1,21 @@
+import time
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
 import pytest
 from fastapi.testclient import TestClient
 
+import price_driven_switch.__main__ as main
 from price_driven_switch.__main__ import (
     TibberRealtimeConnection,
     app,
 )
+from price_driven_switch.backend.capacity_tariff import CapacityTracker
+from price_driven_switch.backend.power_estimator import (
+    PowerEstimator,
+    StreamingMedian,
+)
+from price_driven_switch.backend.power_forecast import HoltForecaster
 
 client = TestClient(app)
 
@@ -27,7 +36,9 @@ test_cases = [
 @pytest.mark.parametrize("test_case", test_cases)
 @pytest.mark.asyncio
 @pytest.mark.integration
-async def test_switch_states(test_case, settings_dict_fixture, tibber_test_token):
+async def test_switch_states(
+    test_case, settings_dict_fixture, tibber_test_token, patch_offset_now
+):
     test_tibber_instance = TibberRealtimeConnection(tibber_test_token)
     test_tibber_instance.power_reading = test_case["power_reading"]
 
@@ -37,21 +48,21 @@ async def test_switch_states(test_case, settings_dict_fixture, tibber_test_token
             test_tibber_instance,
         ),
         patch(
-            "price_driven_switch.__main__.load_settings_file",
+            "price_driven_switch.__main__.current_settings",
             return_value=settings_dict_fixture,
         ),
-        patch("price_driven_switch.__main__.Prices"),
         patch(
             "price_driven_switch.__main__.power_limit",
             return_value=test_case["power_limit"],
         ),
-        patch("price_driven_switch.__main__.offset_now", return_value=0.4),
+        patch_offset_now(0.4),
     ):
         response = client.get("/api/")
 
     # Assertions
     assert response.status_code == 200
     assert response.json() == test_case["expected"]
+    assert int(response.headers["X-Decision-Sequence"]) > 0
 
 
 @pytest.mark.asyncio
@@ -69,17 +80,16 @@ async def test_appliance_list_endpoint():
 
 
 @pytest.mark.asyncio
-async def test_individual_appliance_endpoint():
+async def test_individual_appliance_endpoint(patch_offset_now):
     """Test individual appliance endpoint with underscore format."""
     test_tibber_instance = TibberRealtimeConnection()
     test_tibber_instance.power_reading = 1000
 
     with (
         patch("price_driven_switch.__main__.tibber_instance", test_tibber_instance),
-        patch("price_driven_switch.__main__.load_settings_file") as mock_settings,
-        patch("price_driven_switch.__main__.Prices"),
+        patch("price_driven_switch.__main__.current_settings") as mock_settings,
         patch("price_driven_switch.__main__.power_limit", return_value=5.0),
-        patch("price_driven_switch.__main__.offset_now", return_value=0.4),
+        patch_offset_now(0.4),
     ):
         # Mock settings with "Boiler 1" appliance
         mock_settings.return_value = {
@@ -94,16 +104,16 @@ async def test_individual_appliance_endpoint():
 
 
 @pytest.mark.asyncio
-async def test_individual_appliance_previous_endpoint():
+async def test_individual_appliance_previous_endpoint(patch_offset_now):
     """Test individual appliance previous state endpoint with underscore format."""
     with (
-        patch("price_driven_switch.__main__.load_settings_file") as mock_settings,
-        patch("price_driven_switch.__main__.Prices"),
-        patch("price_driven_switch.__main__.offset_now", return_value=0.4),
+        patch("price_driven_switch.__main__.current_settings") as mock_settings,
+        patch_offset_now(0.4),
     ):
         # Mock settings with "Boiler 1" appliance
         mock_settings.return_value = {
-            "Appliances": {"Boiler 1": {"Power": 1.5, "Priority": 1, "Setpoint": 0.3}}
+            "Appliances": {"Boiler 1": {"Power": 1.5, "Priority": 1, "Setpoint": 0.3}},
+            "Settings": {"MaxPower": 5.0},
         }
 
         # Test underscore format endpoint for previous state
@@ -114,12 +124,11 @@ async def test_individual_appliance_previous_endpoint():
 
 
 @pytest.mark.asyncio
-async def test_nonexistent_appliance_error():
+async def test_nonexistent_appliance_error(patch_offset_now):
     """Test 404 error for non-existent appliance."""
     with (
-        patch("price_driven_switch.__main__.load_settings_file") as mock_settings,
-        patch("price_driven_switch.__main__.Prices"),
-        patch("price_driven_switch.__main__.offset_now", return_value=0.4),
+        patch("price_driven_switch.__main__.current_settings") as mock_settings,
+        patch_offset_now(0.4),
     ):
         # Mock settings with only "Boiler 1"
         mock_settings.return_value = {
@@ -144,3 +153,314 @@ async def test_root_endpoint():
     assert "endpoints" in data
     assert data["endpoints"]["all_states"] == "/api/"
     assert data["endpoints"]["appliances"] == "/appliances"
+
+
+BATCH_SETTINGS = {
+    "Appliances": {
+        "Boiler 1": {"Power": 1.5, "Priority": 1, "Setpoint": 0.3, "Group": "water"},
+        "Boiler 2": {"Power": 1.0, "Priority": 2, "Setpoint": 0.6, "Group": "water"},
+        "Floor": {"Power": 0.8, "Priority": 3, "Setpoint": 0.5},
+    },
+    "Settings": {"MaxPower": 5.0},
+}
+
+
+@pytest.mark.asyncio
+async def test_batch_states_endpoint(patch_offset_now):
+    """Test that the batch endpoint answers several appliances from one decision."""
+    test_tibber_instance = TibberRealtimeConnection()
+    test_tibber_instance.power_reading = 1000
+
+    with (
+        patch("price_driven_switch.__main__.tibber_instance", test_tibber_instance),
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=BATCH_SETTINGS,
+        ),
+        patch_offset_now(0.4),
+    ):
+        sequence_before = main.switch_state_store.current.sequence
+        response = client.get(
+            "/appliances/states",
+            params={
+                "names": ["Boiler_1", "Floor"],
+                "fields": ["final", "price", "setpoint"],
+            },
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["appliances"] == {
+        "Boiler_1": {"final": 0, "price": 0, "setpoint": 0.3},
+        "Floor": {"final": 1, "price": 1, "setpoint": 0.5},
+    }
+    assert data["offset"] == 0.4
+    assert data["sequence"] == int(response.headers["X-Decision-Sequence"])
+    # One decision answered all appliances
+    assert data["sequence"] == sequence_before + 1
+
+
+@pytest.mark.asyncio
+async def test_batch_states_by_group(patch_offset_now):
+    """Test that the batch endpoint selects appliances by group."""
+    with (
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=BATCH_SETTINGS,
+        ),
+        patch_offset_now(0.4),
+    ):
+        response = client.get("/appliances/states", params={"group": "water"})
+        unknown = client.get("/appliances/states", params={"group": "garage"})
+        bad_field = client.get("/appliances/states", params={"fields": "colour"})
+
+    assert response.status_code == 200
+    assert response.json()["appliances"] == {
+        "Boiler_1": {"final": 0},
+        "Boiler_2": {"final": 1},
+    }
+    assert unknown.status_code == 404
+    assert bad_field.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_long_poll_endpoint(patch_offset_now):
+    """Test that the long-poll endpoint returns the versioned switch states."""
+    with (
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=BATCH_SETTINGS,
+        ),
+        patch_offset_now(0.4),
+    ):
+        response = client.get("/api/poll", params={"since": 0, "timeout": 1})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] >= 1
+    assert data["states"] == {"Boiler 1": 0, "Boiler 2": 1, "Floor": 1}
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint(patch_offset_now):
+    """Test that the stream endpoint sends the states as a server-sent event."""
+    with (
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=BATCH_SETTINGS,
+        ),
+        patch_offset_now(0.4),
+        client.stream("GET", "/api/stream") as response,
+    ):
+        body = response.read().decode()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: states" in body
+    assert 'data: {"Boiler 1": 0, "Boiler 2": 1, "Floor": 1}' in body
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_returns_not_modified(patch_offset_now):
+    """Test that unchanged state endpoints answer If-None-Match with 304."""
+    with (
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=BATCH_SETTINGS,
+        ),
+        patch_offset_now(0.4),
+    ):
+        for endpoint in ("/api/", "/previous_setpoints", "/appliances"):
+            first = client.get(endpoint)
+            etag = first.headers["ETag"]
+            second = client.get(endpoint, headers={"If-None-Match": etag})
+            other = client.get(endpoint, headers={"If-None-Match": '"0-0"'})
+
+            assert first.status_code == 200
+            assert second.status_code == 304
+            assert second.headers["ETag"] == etag
+            assert second.content == b""
+            assert other.status_code == 200
+
+            # A tag from before a restart, when the versions were the same
+            with patch("price_driven_switch.__main__.BOOT_ID", "restarted"):
+                assert (
+                    client.get(endpoint, headers={"If-None-Match": etag}).status_code
+                    == 200
+                )
+
+
+@pytest.mark.asyncio
+async def test_site_routes(sites_directory):
+    engine = main.MultiSiteEngine.from_directory(str(sites_directory))
+    engine.sites["cabin"].realtime.power_reading = 2100
+
+    with patch("price_driven_switch.__main__.site_engine", engine):
+        sites = client.get("/sites")
+        states = client.get("/sites/cabin/api/")
+        price_states = client.get("/sites/cabin/previous_setpoints")
+        floor = client.get("/sites/cabin/appliance/Floor")
+        info = client.get("/sites/cabin/subscription_info")
+        unknown = client.get("/sites/garage/api/")
+
+    assert sites.json() == {"sites": ["cabin", "house"]}
+    assert states.json() == {"Boiler 1": 1, "Floor": 0}
+    assert price_states.json() == {"Boiler 1": 1, "Floor": 1}
+    assert floor.json() == 0
+    assert info.json()["power_reading"] == 2100
+    assert unknown.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_failing_site_answers_503_alone(sites_directory):
+    engine = main.MultiSiteEngine.from_directory(str(sites_directory))
+    (sites_directory / "house" / "settings.toml").write_text("not toml [")
+
+    with patch("price_driven_switch.__main__.site_engine", engine):
+        cabin = client.get("/sites/cabin/api/")
+        house = client.get("/sites/house/api/")
+
+    assert cabin.status_code == 200
+    assert house.status_code == 503
+    assert "house" in house.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_repeated_decisions_hit_the_memo(
+    settings_dict_fixture, tibber_test_token, patch_offset_now
+):
+    test_tibber_instance = TibberRealtimeConnection(tibber_test_token)
+    test_tibber_instance.power_reading = 1000
+
+    with (
+        patch("price_driven_switch.__main__.tibber_instance", test_tibber_instance),
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=settings_dict_fixture,
+        ),
+        patch("price_driven_switch.__main__.power_limit", return_value=2),
+        patch_offset_now(0.4),
+    ):
+        for _ in range(3):
+            client.get("/api/")
+        before = client.get("/decision_cache").json()
+        client.get("/api/")
+        after = client.get("/decision_cache").json()
+
+    # Same slot, power and previous states as the decision before
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+
+
+@pytest.mark.asyncio
+async def test_limiter_uses_learned_power(
+    settings_dict_fixture, tibber_test_token, patch_offset_now
+):
+    settings_dict_fixture["Settings"]["UseLearnedPower"] = True
+    estimator = PowerEstimator(min_samples=1)
+    # The Floor turned out to draw 50 W instead of the configured 800 W
+    estimator.medians["Floor"] = StreamingMedian()
+    estimator.medians["Floor"].add(0.05)
+    test_tibber_instance = TibberRealtimeConnection(tibber_test_token)
+    test_tibber_instance.power_reading = 2100
+
+    with (
+        patch("price_driven_switch.__main__.tibber_instance", test_tibber_instance),
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=settings_dict_fixture,
+        ),
+        patch("price_driven_switch.__main__.power_limit", return_value=2),
+        patch("price_driven_switch.__main__.power_estimator", estimator),
+        patch_offset_now(0.4),
+    ):
+        response = client.get("/api/")
+        estimates = client.get("/power/estimates")
+
+    # Shedding the Floor alone no longer gets under the limit
+    assert response.json() == {"Boiler 1": 1, "Boiler 2": 0, "Floor": 0}
+    assert estimates.json() == {"Floor": 0.05}
+
+
+@pytest.mark.asyncio
+async def test_power_history_endpoint(tibber_test_token):
+    test_tibber_instance = TibberRealtimeConnection(tibber_test_token)
+    now = time.time()
+    for seconds_ago, power in [(90, 1000), (70, 3000), (10, 500)]:
+        test_tibber_instance.history.append(now - seconds_ago, {"power": power})
+
+    with patch("price_driven_switch.__main__.tibber_instance", test_tibber_instance):
+        response = client.get("/power/history?window=120&resolution=60")
+        too_fine = client.get("/power/history?window=86400&resolution=0.5")
+        unknown = client.get("/power/history?field=frequency")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["field"] == "power"
+    assert data["min"] == [1000, 500]
+    assert data["mean"] == [2000, 500]
+    assert data["max"] == [3000, 500]
+    assert too_fine.status_code == 422
+    assert unknown.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_limiter_acts_on_forecast(
+    settings_dict_fixture, tibber_test_token, patch_offset_now
+):
+    settings_dict_fixture["Settings"]["ForecastHorizonSeconds"] = 30
+    forecaster = HoltForecaster()
+    # Rising 20 W per second, 1900 W now: 2500 W expected in 30 s
+    for second in range(0, 100, 2):
+        forecaster.update(1900 - 20 * (98 - second), float(second))
+    test_tibber_instance = TibberRealtimeConnection(tibber_test_token)
+    test_tibber_instance.power_reading = 1900
+
+    with (
+        patch("price_driven_switch.__main__.tibber_instance", test_tibber_instance),
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=settings_dict_fixture,
+        ),
+        patch("price_driven_switch.__main__.power_limit", return_value=2),
+        patch("price_driven_switch.__main__.power_forecaster", forecaster),
+        patch_offset_now(0.4),
+    ):
+        response = client.get("/api/")
+        forecast = client.get("/power/forecast?horizon=30")
+
+    # 1900 W is under the 2 kW limit, the forecast is not
+    assert response.json() == {"Boiler 1": 1, "Boiler 2": 1, "Floor": 0}
+    assert forecast.json()["power"] == pytest.approx(2500, rel=0.02)
+
+
+@pytest.mark.asyncio
+async def test_limiter_keeps_the_capacity_step(
+    settings_dict_fixture, tibber_test_token, patch_offset_now
+):
+    settings_dict_fixture["Settings"]["UseCapacityTariff"] = True
+    tracker = CapacityTracker(path=None)
+    now = datetime.now().astimezone()
+    tracker.month, tracker.day = now.strftime("%Y-%m"), now.date().isoformat()
+    tracker.peaks = [(4.5, "earlier"), (4.5, "earlier")]
+    # Half an hour left with 0.5 kWh to spare: at most 1 kW
+    tracker.hour = now - timedelta(minutes=30)
+    tracker.hour_energy = 5.5
+    test_tibber_instance = TibberRealtimeConnection(tibber_test_token)
+    test_tibber_instance.power_reading = 1900
+
+    with (
+        patch("price_driven_switch.__main__.tibber_instance", test_tibber_instance),
+        patch(
+            "price_driven_switch.__main__.current_settings",
+            return_value=settings_dict_fixture,
+        ),
+        patch("price_driven_switch.__main__.power_limit", return_value=0),
+        patch("price_driven_switch.__main__.capacity_tracker", tracker),
+        patch_offset_now(0.4),
+    ):
+        response = client.get("/api/")
+        status = client.get("/capacity").json()
+
+    assert response.json() == {"Boiler 1": 1, "Boiler 2": 0, "Floor": 0}
+    assert status["threshold"] == 5.0
+    assert status["power_limit"] == pytest.approx(1.0, rel=0.01)
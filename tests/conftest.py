@@ -1,6 +1,7 @@
 import datetime
 import json
 import logging
+import time
 from typing import Any
 from unittest.mock import patch
 
@@ -8,6 +9,7 @@ import pytest
 
 from price_driven_switch.backend.configuration import load_settings_file
 from price_driven_switch.backend.prices import Prices
+from price_driven_switch.backend.schedule import build_schedule
 from price_driven_switch.backend.tibber_connection import TibberConnection
 
 FIXTURE_PRICE_RATIO = 0.4
@@ -69,6 +71,26 @@ def mock_get_switch_states():
         yield mock_data
 
 
+@pytest.fixture
+def patch_offset_now():
+    """Patch the API's compiled schedule so every hour has the given offset.
+
+    The schedule is built from whatever ``current_settings`` returns in
+    ``__main__`` at request time, so settings patches keep taking effect.
+    """
+    from price_driven_switch import __main__ as main
+
+    def _patch(offset: float):
+        async def schedule():
+            return build_schedule(main.current_settings(), [offset] * 24, [])
+
+        return patch(
+            "price_driven_switch.__main__.current_schedule", side_effect=schedule
+        )
+
+    return _patch
+
+
 # Price file fixtures
 
 
@@ -173,9 +195,9 @@ def price_now_fixture() -> None | float:
 @pytest.fixture
 def prices_instance_fixture(api_response_fixture):
     with patch(
-        "price_driven_switch.backend.prices.load_settings_file"
-    ) as mock_load_settings:
-        mock_load_settings.return_value = {
+        "price_driven_switch.backend.prices.settings_snapshot"
+    ) as mock_settings_snapshot:
+        mock_settings_snapshot.return_value.data = {
             "Settings": {
                 "IncludeGridRent": False,
                 "GridRent": {
@@ -213,10 +235,10 @@ def mock_instance_with_hour(api_response_fixture):
             return_value=mock_hour_data,
         ),
         patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings,
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot,
     ):
-        mock_load_settings.return_value = {
+        mock_settings_snapshot.return_value.data = {
             "Settings": {
                 "IncludeGridRent": False,
                 "GridRent": {
@@ -283,3 +305,44 @@ def settings_without_grid_rent_fixture():
             },
         },
     }
+
+
+@pytest.fixture
+def sites_directory(tmp_path):
+    """Two site directories with their own settings and a current price file."""
+    import toml
+
+    from price_driven_switch.backend.price_file import PriceFile
+
+    prices = load_json_fixture(PATH_TEST_PRICES)
+    prices["timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    for name, max_power, setpoint in (("cabin", 2.0, 1.0), ("house", 0.0, 0.0)):
+        site = tmp_path / name
+        site.mkdir()
+        settings = {
+            "Appliances": {
+                "Boiler 1": {"Power": 1.5, "Priority": 2, "Setpoint": setpoint},
+                "Floor": {"Power": 0.8, "Priority": 1, "Setpoint": setpoint},
+            },
+            "Settings": {
+                "MaxPower": max_power,
+                "Timezone": "Europe/Oslo",
+                "IncludeGridRent": False,
+            },
+        }
+        (site / "settings.toml").write_text(toml.dumps(settings), encoding="utf-8")
+        (site / ".env").write_text(f"TIBBER_TOKEN={name}-token\n", encoding="utf-8")
+        (site / "prices.json").write_text(json.dumps(prices), encoding="utf-8")
+    (tmp_path / "not_a_site").mkdir()
+    PriceFile._cache.clear()
+    yield tmp_path
+    PriceFile._cache.clear()
+
+
+@pytest.fixture
+def oslo_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Oslo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
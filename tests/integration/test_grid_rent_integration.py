@@ -108,9 +108,9 @@ class TestGridRentIntegration:
     def test_prices_class_with_grid_rent_integration(self, api_response_fixture):
         """Test that the Prices class correctly integrates grid rent."""
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "IncludeGridRent": True,
                     "GridRent": {
@@ -146,9 +146,9 @@ class TestGridRentIntegration:
     def test_grid_rent_disabled_integration(self, api_response_fixture):
         """Test that grid rent is not added when disabled."""
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "IncludeGridRent": False,
                     "GridRent": {
@@ -28,15 +28,17 @@ class TestAPIIntegration:
         mock.subscription_status = "Connected"
         return mock
 
-    def test_api_state_persistence_between_calls(self, client, settings_dict_fixture):
+    def test_api_state_persistence_between_calls(
+        self, client, settings_dict_fixture, patch_offset_now
+    ):
         """Test that previous states persist between API calls."""
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
             patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=settings_dict_fixture,
             ),
-            patch("price_driven_switch.__main__.offset_now", return_value=0.5),
+            patch_offset_now(0.5),
         ):
             mock_tibber.power_reading = 1500
 
@@ -55,16 +57,16 @@ class TestAPIIntegration:
             assert state1 != state2 or True  # Allow same states if logic determines so
 
     def test_individual_appliance_endpoints_consistency(
-        self, client, settings_dict_fixture
+        self, client, settings_dict_fixture, patch_offset_now
     ):
         """Test that individual appliance endpoints return consistent states with main API."""
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
             patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=settings_dict_fixture,
             ),
-            patch("price_driven_switch.__main__.offset_now", return_value=0.5),
+            patch_offset_now(0.5),
         ):
             mock_tibber.power_reading = 1500
 
@@ -79,15 +81,17 @@ class TestAPIIntegration:
                 assert individual_response.status_code == 200
                 assert individual_response.json() == expected_state
 
-    def test_price_only_vs_power_limited_states(self, client, settings_dict_fixture):
+    def test_price_only_vs_power_limited_states(
+        self, client, settings_dict_fixture, patch_offset_now
+    ):
         """Test difference between price-only and power-limited states."""
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
             patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=settings_dict_fixture,
             ),
-            patch("price_driven_switch.__main__.offset_now", return_value=0.5),
+            patch_offset_now(0.5),
         ):
             # High power consumption to trigger power limiting
             mock_tibber.power_reading = 4000
@@ -106,15 +110,17 @@ class TestAPIIntegration:
 
             assert power_limited_count <= price_only_count
 
-    def test_power_recovery_through_api(self, client, settings_dict_fixture):
+    def test_power_recovery_through_api(
+        self, client, settings_dict_fixture, patch_offset_now
+    ):
         """Test appliance recovery when power consumption decreases."""
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
             patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=settings_dict_fixture,
             ),
-            patch("price_driven_switch.__main__.offset_now", return_value=0.5),
+            patch_offset_now(0.5),
         ):
             # Start with high power - should limit appliances
             mock_tibber.power_reading = 4000
@@ -143,14 +149,16 @@ class TestAPIIntegration:
             assert data["power_reading"] == 2500
             assert data["subscription_status"] == "Connected"
 
-    def test_appliance_not_found_error(self, client, settings_dict_fixture):
+    def test_appliance_not_found_error(
+        self, client, settings_dict_fixture, patch_offset_now
+    ):
         """Test 404 error for non-existent appliance."""
         with (
             patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=settings_dict_fixture,
             ),
-            patch("price_driven_switch.__main__.offset_now", return_value=0.5),
+            patch_offset_now(0.5),
         ):
             response = client.get("/appliance/NonExistent_Appliance")
             assert response.status_code == 404
@@ -176,19 +184,21 @@ class TestDynamicSettingsIntegration:
             },
         }
 
-    def test_setpoint_change_affects_api_response(self, base_settings):
+    def test_setpoint_change_affects_api_response(
+        self, base_settings, patch_offset_now
+    ):
         """Test that changing setpoints affects API responses."""
         client = TestClient(app)
 
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
-            patch("price_driven_switch.__main__.offset_now", return_value=0.45),
+            patch_offset_now(0.45),
         ):
             mock_tibber.power_reading = 1000
 
             # Initial settings
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=base_settings,
             ):
                 response1 = client.get("/api/")
@@ -202,7 +212,7 @@ class TestDynamicSettingsIntegration:
             modified_settings["Appliances"]["Floor"]["Setpoint"] = 0.4  # Now ON at 0.45
 
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=modified_settings,
             ):
                 response2 = client.get("/api/")
@@ -211,21 +221,21 @@ class TestDynamicSettingsIntegration:
             # States should be different
             assert state1 != state2
 
-    def test_priority_change_affects_power_limiting(self, base_settings):
+    def test_priority_change_affects_power_limiting(
+        self, base_settings, patch_offset_now
+    ):
         """Test that changing priorities affects which appliances stay on under power limits."""
         client = TestClient(app)
 
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
-            patch(
-                "price_driven_switch.__main__.offset_now", return_value=0.2
-            ),  # All should be ON by price
+            patch_offset_now(0.2),  # All should be ON by price
         ):
             mock_tibber.power_reading = 3500  # Over power limit
 
             # Initial priorities: Boiler 1 (1), Boiler 2 (2), Floor (3)
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=base_settings,
             ):
                 response1 = client.get("/api/")
@@ -248,7 +258,7 @@ class TestDynamicSettingsIntegration:
             )
 
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=modified_settings,
             ):
                 response2 = client.get("/api/")
@@ -257,15 +267,13 @@ class TestDynamicSettingsIntegration:
             # Floor should be more likely to stay ON with higher priority
             # This is a behavioral test - exact assertion depends on power calculations
 
-    def test_power_limit_change_immediate_effect(self, base_settings):
+    def test_power_limit_change_immediate_effect(self, base_settings, patch_offset_now):
         """Test that changing power limits has immediate effect on API responses."""
         client = TestClient(app)
 
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
-            patch(
-                "price_driven_switch.__main__.offset_now", return_value=0.2
-            ),  # All ON by price
+            patch_offset_now(0.2),  # All ON by price
         ):
             mock_tibber.power_reading = 2800  # High consumption
 
@@ -274,7 +282,7 @@ class TestDynamicSettingsIntegration:
             restrictive_settings["Settings"]["MaxPower"] = 2.0
 
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=restrictive_settings,
             ):
                 response1 = client.get("/api/")
@@ -286,7 +294,7 @@ class TestDynamicSettingsIntegration:
             generous_settings["Settings"]["MaxPower"] = 5.0
 
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=generous_settings,
             ):
                 response2 = client.get("/api/")
@@ -296,7 +304,7 @@ class TestDynamicSettingsIntegration:
             # Should have more appliances ON with higher power limit
             assert on_count_generous >= on_count_restrictive
 
-    def test_appliance_addition_removal(self):
+    def test_appliance_addition_removal(self, patch_offset_now):
         """Test adding and removing appliances from configuration."""
         client = TestClient(app)
 
@@ -309,13 +317,13 @@ class TestDynamicSettingsIntegration:
 
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
-            patch("price_driven_switch.__main__.offset_now", return_value=0.2),
+            patch_offset_now(0.2),
         ):
             mock_tibber.power_reading = 1000
 
             # Initial configuration with one appliance
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=base_settings,
             ):
                 response1 = client.get("/api/")
@@ -331,7 +339,7 @@ class TestDynamicSettingsIntegration:
             }
 
             with patch(
-                "price_driven_switch.__main__.load_settings_file",
+                "price_driven_switch.__main__.current_settings",
                 return_value=extended_settings,
             ):
                 response2 = client.get("/api/")
@@ -339,13 +347,13 @@ class TestDynamicSettingsIntegration:
                 assert len(state2) == 2
                 assert "Floor" in state2
 
-    def test_rapid_settings_changes(self, base_settings):
+    def test_rapid_settings_changes(self, base_settings, patch_offset_now):
         """Test system stability with rapid settings changes."""
         client = TestClient(app)
 
         with (
             patch("price_driven_switch.__main__.tibber_instance") as mock_tibber,
-            patch("price_driven_switch.__main__.offset_now", return_value=0.5),
+            patch_offset_now(0.5),
         ):
             mock_tibber.power_reading = 2000
 
@@ -360,7 +368,7 @@ class TestDynamicSettingsIntegration:
             responses = []
             for settings in settings_variants:
                 with patch(
-                    "price_driven_switch.__main__.load_settings_file",
+                    "price_driven_switch.__main__.current_settings",
                     return_value=settings,
                 ):
                     response = client.get("/api/")
@@ -377,7 +385,7 @@ class TestDynamicSettingsIntegration:
 class TestComplexIntegrationScenarios:
     """Test complex scenarios combining multiple integration aspects."""
 
-    def test_daily_price_cycle_simulation(self):
+    def test_daily_price_cycle_simulation(self, patch_offset_now):
         """Simulate a daily price cycle with varying power consumption."""
         client = TestClient(app)
 
@@ -431,13 +439,10 @@ class TestComplexIntegrationScenarios:
 
                 with (
                     patch(
-                        "price_driven_switch.__main__.load_settings_file",
+                        "price_driven_switch.__main__.current_settings",
                         return_value=settings,
                     ),
-                    patch(
-                        "price_driven_switch.__main__.offset_now",
-                        return_value=scenario["offset"],
-                    ),
+                    patch_offset_now(scenario["offset"]),
                 ):
                     response = client.get("/api/")
                     results[scenario["time"]] = {
@@ -458,7 +463,7 @@ class TestComplexIntegrationScenarios:
             night_on >= evening_on
         )  # Night should have more appliances on than evening
 
-    def test_grid_overload_recovery_scenario(self):
+    def test_grid_overload_recovery_scenario(self, patch_offset_now):
         """Test scenario where grid is overloaded and then recovers."""
         client = TestClient(app)
 
@@ -489,12 +494,10 @@ class TestComplexIntegrationScenarios:
 
                 with (
                     patch(
-                        "price_driven_switch.__main__.load_settings_file",
+                        "price_driven_switch.__main__.current_settings",
                         return_value=settings,
                     ),
-                    patch(
-                        "price_driven_switch.__main__.offset_now", return_value=0.3
-                    ),  # Cheap electricity
+                    patch_offset_now(0.3),  # Cheap electricity
                 ):
                     response = client.get("/api/")
                     results.append(
@@ -517,7 +520,7 @@ class TestComplexIntegrationScenarios:
         # Final state should be reasonable for the final power reading
         assert on_counts[-1] >= 0  # Basic sanity check
 
-    def test_mixed_price_power_priority_scenario(self):
+    def test_mixed_price_power_priority_scenario(self, patch_offset_now):
         """Test complex scenario with mixed price and power constraints."""
         client = TestClient(app)
 
@@ -553,13 +556,10 @@ class TestComplexIntegrationScenarios:
             for test_case in test_cases:
                 with (
                     patch(
-                        "price_driven_switch.__main__.load_settings_file",
+                        "price_driven_switch.__main__.current_settings",
                         return_value=settings,
                     ),
-                    patch(
-                        "price_driven_switch.__main__.offset_now",
-                        return_value=test_case["offset"],
-                    ),
+                    patch_offset_now(test_case["offset"]),
                 ):
                     response = client.get("/api/")
                     states = response.json()
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.switch_logic import (
+    limit_power_table,
+    load_appliance_table,
+    price_based_table,
+)
+
+SETTINGS = {
+    "Appliances": {
+        "Boiler 1": {"Power": 1.5, "Priority": 3, "Setpoint": 0.5},
+        "Boiler 2": {"Power": 1.0, "Priority": 2, "Setpoint": 0.2, "Group": "water"},
+        "Floor": {"Power": 0.8, "Priority": 1, "Setpoint": 1.0},
+    }
+}
+
+
+class TestApplianceTable:
+    @pytest.mark.unit
+    def test_from_settings(self) -> None:
+        table = load_appliance_table(SETTINGS)
+
+        assert table.names == ("Boiler 1", "Boiler 2", "Floor")
+        assert table.power.tolist() == [1.5, 1.0, 0.8]
+        assert table.priority.tolist() == [3, 2, 1]
+        assert table.group == (None, "water", None)
+        assert not table.on.any()
+
+    @pytest.mark.unit
+    def test_frame_round_trip(self) -> None:
+        table = price_based_table(load_appliance_table(SETTINGS), 0.4)
+
+        frame = table.to_frame()
+        round_trip = ApplianceTable.from_frame(frame)
+
+        assert frame.index.name == "Appliance"
+        assert frame["on"].tolist() == [True, False, True]
+        assert round_trip.same_appliances(table)
+        assert round_trip.states_equal(table)
+
+    @pytest.mark.unit
+    def test_with_on_leaves_table_unchanged(self) -> None:
+        table = load_appliance_table(SETTINGS)
+
+        switched = table.with_on([True, True, False])
+
+        assert switched.on.tolist() == [True, True, False]
+        assert not table.on.any()
+        assert switched.same_appliances(table)
+        assert not switched.states_equal(table)
+
+    @pytest.mark.unit
+    def test_arrays_are_read_only(self) -> None:
+        table = load_appliance_table(SETTINGS)
+
+        with pytest.raises(ValueError):
+            table.power[0] = 3.0
+
+    @pytest.mark.unit
+    def test_from_frame_fills_missing_columns(self) -> None:
+        frame = pd.DataFrame({"Power": [1.0], "Priority": [1], "on": [True]})
+
+        table = ApplianceTable.from_frame(frame)
+
+        assert table.names == ("0",)
+        assert table.on.tolist() == [True]
+        assert table.group == (None,)
+
+
+@pytest.mark.unit
+def test_limit_power_table_sheds_lowest_priority_first() -> None:
+    price_states = load_appliance_table(SETTINGS).with_on([True, True, True])
+
+    result = limit_power_table(
+        price_states,
+        power_limit=2,
+        power_now=2500,
+        prev_states=ApplianceTable.empty(),
+    )
+
+    # Floor (priority 1) alone brings the 2.5 kW under 2 kW
+    assert result.on.tolist() == [True, True, False]
+    assert price_states.on.all()
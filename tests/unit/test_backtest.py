@@ -0,0 +1,135 @@
+import timeit
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.backtest import backtest, price_days, setpoint_grid
+from price_driven_switch.backend.price_archive import PriceArchive
+from price_driven_switch.backend.price_slots import slot_starts
+from price_driven_switch.backend.prices import Prices
+from price_driven_switch.backend.switch_logic import (
+    get_price_based_states,
+    load_appliances_df,
+)
+
+SETTINGS = {
+    "Appliances": {
+        "Boiler": {"Power": 2.0, "Priority": 1, "Setpoint": 0.25},
+        "Floor": {"Power": 0.5, "Priority": 2, "Setpoint": 0.75},
+    },
+    "Settings": {"IncludeGridRent": False},
+}
+
+
+def fill_archive(archive: PriceArchive, first: date, days: int, slots: int) -> None:
+    rng = np.random.default_rng(3)
+    for number in range(days):
+        day = first + timedelta(days=number)
+        starts = [start.timestamp() for start in slot_starts(day, slots)]
+        # Rounded prices, so some slots tie like real ones do
+        prices = rng.uniform(0.1, 2.0, slots).round(1)
+        archive.append_day(day, np.array(starts, dtype=np.int64), prices)
+
+
+@pytest.fixture
+def archive(tmp_path) -> PriceArchive:
+    archive = PriceArchive(str(tmp_path / "price_archive"))
+    fill_archive(archive, date(2024, 1, 1), 5, 24)
+    return archive
+
+
+@pytest.mark.unit
+def test_matches_the_switch_day_by_day(archive) -> None:
+    days = price_days(archive, date(2024, 1, 1), date(2024, 1, 5))
+    result = backtest(days, [0.25, 0.75])
+
+    appliances = load_appliances_df(SETTINGS)
+    on_hours = np.zeros(2)
+    cost = np.zeros(2)
+    for day in days.days:
+        prices = archive.read_day(day).prices.astype(float).tolist()
+        for slot, offset in enumerate(Prices({}, SETTINGS).hour_offsets(prices)):
+            on = get_price_based_states(appliances, offset)["on"].to_numpy()
+            on_hours += on
+            cost += on * prices[slot]
+
+    assert result.days == 5
+    assert result.on_hours == pytest.approx(on_hours)
+    assert result.cost_per_kw == pytest.approx(cost)
+
+
+@pytest.mark.unit
+def test_appliance_costs_scale_with_power(archive) -> None:
+    table = ApplianceTable.from_settings(SETTINGS)
+    result = backtest(price_days(archive, date(2024, 1, 1), date(2024, 1, 5)), [0.5])
+
+    frame = result.for_appliances(table).set_index("appliance")
+
+    assert frame.loc["Boiler", "energy_kwh"] == pytest.approx(2.0 * result.on_hours[0])
+    assert frame.loc["Floor", "cost"] == pytest.approx(0.5 * result.cost_per_kw[0])
+    assert frame.loc["Boiler", "average_price"] == pytest.approx(
+        result.cost_per_kw[0] / result.on_hours[0]
+    )
+
+
+@pytest.mark.unit
+def test_higher_setpoints_run_longer_at_a_higher_average_price(archive) -> None:
+    result = backtest(
+        price_days(archive, date(2024, 1, 1), date(2024, 1, 5)), np.linspace(0, 1, 25)
+    )
+
+    average = result.cost_per_kw / result.on_hours
+    assert (np.diff(result.on_hours) >= 0).all()
+    assert average[0] < average[-1]
+    assert result.on_hours[-1] == 5 * 24
+
+
+@pytest.mark.unit
+def test_setpoint_grid_includes_the_configured_setpoints() -> None:
+    table = ApplianceTable.from_settings(
+        {"Appliances": {"Boiler": {"Power": 1.0, "Priority": 1, "Setpoint": 0.3}}}
+    )
+
+    grid = setpoint_grid(table, 4)
+
+    assert grid.tolist() == [0.0, 0.25, 0.3, 0.5, 0.75, 1.0]
+
+
+@pytest.mark.unit
+def test_cli_subcommand(archive, capsys) -> None:
+    import price_driven_switch.__main__ as main
+
+    with patch("price_driven_switch.__main__.current_settings", return_value=SETTINGS):
+        main.main(
+            [
+                "backtest",
+                "--start=2024-01-02",
+                "--end=2024-01-03",
+                "--steps=4",
+                f"--archive={archive.directory}",
+            ]
+        )
+
+    report = capsys.readouterr().out
+    assert report.startswith("2 days from 2024-01-02 to 2024-01-03")
+    assert "Boiler" in report
+    assert "Floor" in report
+
+
+@pytest.mark.benchmark
+def test_a_year_of_quarter_hours_in_under_a_second(tmp_path) -> None:
+    archive = PriceArchive(str(tmp_path / "price_archive"))
+    fill_archive(archive, date(2024, 1, 1), 366, 96)
+    grid_rent = {
+        "JanMar": {"Day": 50.94, "Night": 38.21},
+        "AprDec": {"Day": 59.86, "Night": 47.13},
+    }
+
+    def run() -> None:
+        days = price_days(archive, date(2024, 1, 1), date(2024, 12, 31), grid_rent)
+        backtest(days, np.linspace(0, 1, 97))
+
+    assert min(timeit.repeat(run, number=1, repeat=3)) < 1.0
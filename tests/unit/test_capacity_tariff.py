@@ -0,0 +1,137 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from price_driven_switch.backend.capacity_tariff import CapacityTracker
+
+
+def feed(tracker: CapacityTracker, start: datetime, power: float, minutes: int):
+    """Readings of constant ``power`` every 2 s for ``minutes``."""
+    for second in range(0, minutes * 60, 2):
+        tracker.add(power, start + timedelta(seconds=second))
+
+
+@pytest.mark.unit
+def test_integrates_the_hour_in_kwh() -> None:
+    tracker = CapacityTracker(path=None)
+    feed(tracker, datetime(2024, 1, 10, 12), 3000, 30)
+
+    assert tracker.hour_energy == pytest.approx(1.5, abs=0.01)
+    assert tracker.today_peak() == pytest.approx(1.5, abs=0.01)
+
+
+@pytest.mark.unit
+def test_splits_readings_at_the_hour_boundary() -> None:
+    tracker = CapacityTracker(path=None)
+    tracker.add(6000, datetime(2024, 1, 10, 12, 59))
+    tracker.add(1000, datetime(2024, 1, 10, 13, 1))
+
+    # One minute of 6 kW in each hour
+    assert tracker.day_peak == pytest.approx(0.1)
+    assert tracker.hour == datetime(2024, 1, 10, 13).astimezone()
+    assert tracker.hour_energy == pytest.approx(0.1)
+
+
+@pytest.mark.unit
+def test_gaps_in_the_readings_are_not_integrated() -> None:
+    tracker = CapacityTracker(path=None)
+    tracker.add(6000, datetime(2024, 1, 10, 12, 0))
+    tracker.add(6000, datetime(2024, 1, 10, 14, 30))
+
+    assert tracker.day_peak == 0
+    assert tracker.hour == datetime(2024, 1, 10, 14).astimezone()
+    assert tracker.hour_energy == 0
+
+
+@pytest.mark.unit
+def test_keeps_the_three_highest_days_of_the_month() -> None:
+    tracker = CapacityTracker(path=None)
+    for day, power in enumerate([4000, 7000, 2000, 6000, 5000], start=1):
+        feed(tracker, datetime(2024, 1, day, 18), power, 60)
+    tracker.add(0, datetime(2024, 1, 6, 0))
+
+    assert sorted(tracker.peaks, reverse=True) == [
+        (pytest.approx(7.0, abs=0.01), "2024-01-02"),
+        (pytest.approx(6.0, abs=0.01), "2024-01-04"),
+        (pytest.approx(5.0, abs=0.01), "2024-01-05"),
+    ]
+    assert tracker.average() == pytest.approx(6.0, abs=0.01)
+    assert tracker.threshold() == 10.0
+
+
+@pytest.mark.unit
+def test_a_new_month_starts_over() -> None:
+    tracker = CapacityTracker(path=None)
+    feed(tracker, datetime(2024, 1, 31, 18), 7000, 60)
+    tracker.add(1000, datetime(2024, 2, 1, 0))
+
+    assert tracker.month == "2024-02"
+    assert tracker.peaks == []
+    assert tracker.top_peaks() == []
+
+
+@pytest.mark.unit
+def test_power_limit_keeps_the_step() -> None:
+    tracker = CapacityTracker(path=None)
+    tracker.month, tracker.day = "2024-01", "2024-01-20"
+    tracker.peaks = [(4.5, "2024-01-03"), (4.0, "2024-01-05"), (3.0, "2024-01-09")]
+    tracker.hour = datetime(2024, 1, 20, 17).astimezone()
+    tracker.hour_energy = 2.0
+
+    # Today may reach 3 * 5 - 4.5 - 4.0 = 6.5 kWh: 4.5 kWh in half an hour
+    assert tracker.threshold() == 5.0
+    assert tracker.power_limit(datetime(2024, 1, 20, 17, 30)) == pytest.approx(9.0)
+
+
+@pytest.mark.unit
+def test_power_limit_none_above_the_last_step() -> None:
+    tracker = CapacityTracker(path=None, steps=(2.0, 5.0))
+    feed(tracker, datetime(2024, 1, 10, 12), 8000, 60)
+
+    assert tracker.threshold() is None
+    assert tracker.power_limit(datetime(2024, 1, 10, 13, 30)) is None
+    # Steps from the settings take precedence over the tracker's own
+    assert tracker.threshold((2.0, 5.0, 10.0)) == 10.0
+    assert tracker.steps == (2.0, 5.0)
+
+
+@pytest.mark.unit
+def test_the_repeated_hour_at_the_end_of_dst_is_an_hour_of_its_own(
+    oslo_timezone,
+) -> None:
+    tracker = CapacityTracker(path=None)
+    # 02:00-03:00 happens twice on 2024-10-27 in Oslo: from 00:00 and 01:00 UTC
+    start = datetime(2024, 10, 27, 0, tzinfo=UTC)
+    feed(tracker, start, 3000, 90)
+
+    assert tracker.hour.hour == 2
+    assert tracker.hour.utcoffset() == timedelta(hours=1)
+    assert tracker.day_peak == pytest.approx(3.0, abs=0.01)
+    assert tracker.hour_energy == pytest.approx(1.5, abs=0.01)
+
+
+@pytest.mark.unit
+def test_peaks_survive_a_restart(tmp_path) -> None:
+    path = str(tmp_path / "capacity_peaks.json")
+    tracker = CapacityTracker(path=path)
+    for day in (1, 2):
+        feed(tracker, datetime(2024, 1, day, 18), 3000 * day, 60)
+    tracker.add(0, datetime(2024, 1, 3, 0))
+    tracker.save()
+
+    restored = CapacityTracker(path=path)
+
+    assert restored.peaks == tracker.peaks
+    assert restored.month == "2024-01"
+    assert restored.hour == datetime(2024, 1, 3, 0).astimezone()
+
+
+@pytest.mark.unit
+def test_unreadable_file_is_ignored(tmp_path) -> None:
+    path = tmp_path / "capacity_peaks.json"
+    path.write_text("{not json")
+
+    tracker = CapacityTracker(path=str(path))
+
+    assert tracker.peaks == []
+    assert tracker.month is None
@@ -7,6 +7,8 @@ from price_driven_switch.backend.configuration import (
     default_settings_toml,
     ensure_grid_rent_settings,
     get_package_version_from_toml,
+    load_settings_file,
+    settings_snapshot,
     update_max_power,
     validate_settings,
 )
@@ -191,6 +193,24 @@ def test_validate_settings_without_grid_rent():
     assert validate_settings(test_data_without_grid_rent) is None
 
 
+@pytest.mark.unit
+def test_validate_settings_shedding_strategy():
+    data = {
+        "Appliances": {"Floor": {"Power": 1.0, "Priority": 1, "Setpoint": 0.5}},
+        "Settings": {
+            "MaxPower": 5.0,
+            "Timezone": "Europe/Oslo",
+            "SheddingStrategy": "knapsack",
+            "SheddingBudgetMs": 10.0,
+        },
+    }
+    assert validate_settings(data) is None
+
+    data["Settings"]["SheddingStrategy"] = "random"
+    with pytest.raises(ValueError):
+        validate_settings(data)
+
+
 @pytest.mark.unit
 def test_ensure_grid_rent_settings_complete():
     """Test that ensure_grid_rent_settings doesn't modify complete settings."""
@@ -431,3 +451,46 @@ def test_create_default_settings_if_none_preserves_existing_grid_rent(tmp_path):
         updated_data = toml.load(file)
 
     assert updated_data == custom_settings
+
+
+@pytest.mark.unit
+def test_settings_snapshot_cached_until_file_changes(tmp_path):
+    file_path = tmp_path / "settings.toml"
+    with open(file_path, "w", encoding="utf-8") as file:
+        toml.dump(default_settings_toml, file)
+
+    first = settings_snapshot(str(file_path))
+    assert settings_snapshot(str(file_path)) is first
+
+    changed = toml.load(file_path)
+    changed["Settings"]["MaxPower"] = 7.5
+    with open(file_path, "w", encoding="utf-8") as file:
+        toml.dump(changed, file)
+
+    second = settings_snapshot(str(file_path))
+    assert second.version > first.version
+    assert second.data["Settings"]["MaxPower"] == 7.5
+
+
+@pytest.mark.unit
+def test_settings_snapshot_is_read_only(tmp_path):
+    file_path = tmp_path / "settings.toml"
+    with open(file_path, "w", encoding="utf-8") as file:
+        toml.dump(default_settings_toml, file)
+
+    snapshot = settings_snapshot(str(file_path))
+    with pytest.raises(TypeError):
+        snapshot.data["Settings"]["MaxPower"] = 1.0  # type: ignore
+
+
+@pytest.mark.unit
+def test_load_settings_file_returns_independent_copy(tmp_path):
+    file_path = tmp_path / "settings.toml"
+    with open(file_path, "w", encoding="utf-8") as file:
+        toml.dump(default_settings_toml, file)
+
+    settings = load_settings_file(str(file_path))
+    update_max_power(settings, 9.0)
+
+    assert load_settings_file(str(file_path)) == default_settings_toml
+    assert settings_snapshot(str(file_path)).data["Settings"]["MaxPower"] == 0.0
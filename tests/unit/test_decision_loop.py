@@ -0,0 +1,141 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.decision_loop import Decision, DecisionLoop
+
+
+def make_decision(on: bool = True) -> Decision:
+    states = ApplianceTable.from_settings(
+        {"Appliances": {"Boiler 1": {"Power": 1.0, "Priority": 1, "Setpoint": 0.5}}}
+    ).with_on([on])
+    return Decision(
+        version=0,
+        sequence=0,
+        price_states=states,
+        states=states,
+        power_now=0,
+        power_limit=5.0,
+        offset=0.5,
+    )
+
+
+class TestDecisionLoop:
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_latest_recomputes_without_running_loop(self) -> None:
+        decide = AsyncMock(side_effect=[make_decision(True), make_decision(False)])
+        loop = DecisionLoop(decide, lambda: 60)
+
+        first = await loop.latest()
+        second = await loop.latest()
+
+        assert (first.version, second.version) == (1, 2)
+        assert decide.await_count == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_running_loop_serves_snapshot_and_recomputes_on_trigger(
+        self,
+    ) -> None:
+        decide = AsyncMock(side_effect=[make_decision(True), make_decision(False)])
+        loop = DecisionLoop(decide, lambda: 60)
+        task = asyncio.create_task(loop.run())
+        await asyncio.sleep(0.01)
+
+        snapshot = await loop.latest()
+        assert await loop.latest() is snapshot
+        assert decide.await_count == 1
+
+        loop.trigger()
+        await asyncio.sleep(0.01)
+        assert (await loop.latest()).version == snapshot.version + 1
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert loop.running is False
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_recomputes_at_slot_boundary(self) -> None:
+        decide = AsyncMock(side_effect=lambda: make_decision())
+        loop = DecisionLoop(decide, lambda: 0.01)
+        task = asyncio.create_task(loop.run())
+
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        assert decide.await_count >= 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_decision_keeps_last_snapshot(self) -> None:
+        decide = AsyncMock(side_effect=[make_decision(), RuntimeError("no prices")])
+        loop = DecisionLoop(decide, lambda: 60)
+        task = asyncio.create_task(loop.run())
+        await asyncio.sleep(0.01)
+        snapshot = loop.snapshot
+
+        loop.trigger()
+        await asyncio.sleep(0.01)
+
+        assert loop.snapshot is snapshot
+        task.cancel()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unchanged_states_keep_version(self) -> None:
+        decide = AsyncMock(side_effect=lambda: make_decision(True))
+        loop = DecisionLoop(decide, lambda: 60)
+
+        first = await loop.recompute()
+        second = await loop.recompute()
+
+        assert first.version == second.version == 1
+        assert loop.snapshot is second
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wait_for_version_returns_on_change(self) -> None:
+        decide = AsyncMock(side_effect=[make_decision(True), make_decision(False)])
+        loop = DecisionLoop(decide, lambda: 60)
+        task = asyncio.create_task(loop.run())
+        await asyncio.sleep(0.01)
+
+        waiter = asyncio.create_task(loop.wait_for_version(1, timeout=5))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        loop.trigger()
+
+        assert (await asyncio.wait_for(waiter, 1)).version == 2
+        task.cancel()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wait_for_version_after_restart_returns_at_once(self) -> None:
+        decide = AsyncMock(side_effect=lambda: make_decision(True))
+        loop = DecisionLoop(decide, lambda: 60)
+        task = asyncio.create_task(loop.run())
+        await asyncio.sleep(0.01)
+
+        # A client that saw version 7 before the server restarted
+        decision = await asyncio.wait_for(loop.wait_for_version(7, timeout=5), 1)
+
+        assert decision.version == 1
+        task.cancel()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wait_for_version_times_out_with_current(self) -> None:
+        decide = AsyncMock(side_effect=lambda: make_decision(True))
+        loop = DecisionLoop(decide, lambda: 60)
+        task = asyncio.create_task(loop.run())
+        await asyncio.sleep(0.01)
+
+        decision = await loop.wait_for_version(1, timeout=0.01)
+
+        assert decision.version == 1
+        task.cancel()
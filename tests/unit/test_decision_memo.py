@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.decision_memo import (
+    DecisionMemo,
+    limit_side,
+    power_bucket,
+    states_fingerprint,
+)
+
+
+@pytest.mark.unit
+def test_counts_hits_and_misses() -> None:
+    memo: DecisionMemo[int] = DecisionMemo()
+    calls = []
+
+    def compute() -> int:
+        calls.append(1)
+        return 42
+
+    assert memo.get_or_compute("key", compute) == 42
+    assert memo.get_or_compute("key", compute) == 42
+
+    assert len(calls) == 1
+    assert memo.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 256}
+
+
+@pytest.mark.unit
+def test_evicts_least_recently_used() -> None:
+    memo: DecisionMemo[str] = DecisionMemo(maxsize=2)
+    memo.get_or_compute("a", lambda: "a")
+    memo.get_or_compute("b", lambda: "b")
+    memo.get_or_compute("a", lambda: "a")  # a is now the most recent
+
+    memo.get_or_compute("c", lambda: "c")
+
+    assert memo.get_or_compute("a", lambda: "new") == "a"
+    assert memo.get_or_compute("b", lambda: "new") == "new"
+
+
+@pytest.mark.unit
+def test_power_bucket() -> None:
+    assert power_bucket(2104, 10) == power_bucket(2109, 10)
+    assert power_bucket(2104, 10) != power_bucket(2110, 10)
+    assert power_bucket(2104) != power_bucket(2105)
+    # No reading bypasses the limiter, it never shares a bucket
+    assert power_bucket(0, 10) != power_bucket(5, 10)
+
+
+@pytest.mark.unit
+def test_limit_side_splits_a_bucket_spanning_the_limit() -> None:
+    # 2040 W and 2060 W share a 100 W bucket around a 2.05 kW limit
+    assert power_bucket(2040, 100) == power_bucket(2060, 100)
+    assert limit_side(2040, 2.05) == -1
+    assert limit_side(2050, 2.05) == 0
+    assert limit_side(2060, 2.05) == 1
+
+
+@pytest.mark.unit
+def test_states_fingerprint() -> None:
+    table = ApplianceTable.from_settings(
+        {"Appliances": {"A": {"Power": 1.0, "Priority": 1}}}
+    )
+
+    assert states_fingerprint(table) == states_fingerprint(table.with_on([False]))
+    assert states_fingerprint(table) != states_fingerprint(table.with_on([True]))
+    assert states_fingerprint(table) != states_fingerprint(
+        ApplianceTable.empty().with_on(np.zeros(0, dtype=bool))
+    )
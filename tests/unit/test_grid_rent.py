@@ -185,6 +185,26 @@ class TestGridRent:
             expected_price = 1.0 + (38.21 / 100)  # Base + night rate in kroner
             assert result[hour] == pytest.approx(expected_price, rel=1e-6)
 
+    @pytest.mark.unit
+    def test_add_grid_rent_to_quarter_hour_prices(self):
+        """Test adding grid rent to 96 quarter-hour prices."""
+        grid_rent_config = {
+            "JanMar": {"Day": 50.94, "Night": 38.21},
+            "AprDec": {"Day": 59.86, "Night": 47.13},
+        }
+
+        base_prices = [1.0] * 96
+        test_date = datetime(2024, 1, 15, 0, 0, 0)  # Monday
+
+        result = add_grid_rent_to_prices(base_prices, test_date, grid_rent_config)
+
+        assert len(result) == 96
+        # 05:45 is the last night slot, 06:00 the first day slot
+        assert result[23] == pytest.approx(1.0 + 38.21 / 100, rel=1e-6)
+        assert result[24] == pytest.approx(1.0 + 50.94 / 100, rel=1e-6)
+        assert result[87] == pytest.approx(1.0 + 50.94 / 100, rel=1e-6)
+        assert result[88] == pytest.approx(1.0 + 38.21 / 100, rel=1e-6)
+
     @pytest.mark.unit
     def test_add_grid_rent_to_prices_realistic_prices(self):
         """Test adding grid rent to realistic electricity prices."""
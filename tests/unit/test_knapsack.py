@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from price_driven_switch.backend.knapsack import best_subset
+
+
+@pytest.mark.unit
+def test_keeps_most_valuable_subset_under_capacity() -> None:
+    power = np.array([3000.0, 500.0, 500.0])
+    value = np.array([3000.0, 1000.0, 1500.0])
+
+    keep = best_subset(power, value, 3600.0, budget_s=1.0)
+
+    assert keep.tolist() == [True, False, True]
+
+
+@pytest.mark.unit
+def test_total_stays_strictly_below_capacity() -> None:
+    power = np.array([1000.0, 1000.0, 1005.0])
+
+    keep = best_subset(power, np.ones(3), 2000.0, budget_s=1.0)
+
+    assert keep.sum() == 1
+    assert power[keep].sum() < 2000.0
+
+
+@pytest.mark.unit
+def test_everything_fits() -> None:
+    keep = best_subset(np.array([100.0, 200.0]), np.ones(2), 1000.0, budget_s=1.0)
+
+    assert keep.all()
+
+
+@pytest.mark.unit
+def test_nothing_fits_without_capacity() -> None:
+    keep = best_subset(np.array([100.0, 200.0]), np.ones(2), -50.0, budget_s=1.0)
+
+    assert not keep.any()
+
+
+@pytest.mark.unit
+def test_returns_none_when_budget_is_exceeded() -> None:
+    power = np.full(50, 1000.0)
+
+    assert best_subset(power, np.ones(50), 10_000.0, budget_s=0.0) is None
@@ -4,13 +4,20 @@ Tests for the improved logging utilities.
 
 from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 import pytest
 
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.decision_events import (
+    AppliancesSwitched,
+    PowerChecked,
+)
 from price_driven_switch.backend.logging_utils import (
     StructuredSwitchLogger,
     SwitchLogger,
     format_appliance_list,
+    log_decision_events,
     log_if_changed,
     log_switch_decision_summary,
     should_log_state_change,
@@ -242,6 +249,28 @@ class TestUtilityFunctions:
             assert "Active: 1/3 appliances" in call_args
             assert "Boiler 2 blocked by power limit" in call_args
 
+    def test_log_decision_events(self):
+        """Test that decision events are written as the usual log lines."""
+        table = ApplianceTable.from_settings(
+            {
+                "Appliances": {
+                    "Heater": {"Power": 2.0, "Priority": 1},
+                    "Pump": {"Power": 0.5, "Priority": 2},
+                }
+            }
+        )
+        events = [
+            PowerChecked(3000, 2.0, "OVER", "Reducing power by 1000W"),
+            AppliancesSwitched(table, np.array([0]), on=False),
+        ]
+
+        with patch("price_driven_switch.backend.logging_utils.logger") as mock_logger:
+            log_decision_events(events)
+
+        messages = [call[0][0] for call in mock_logger.info.call_args_list]
+        assert "[POWER] Action: Reducing power by 1000W" in messages
+        assert any(message.startswith("[SWITCH] Heater → OFF") for message in messages)
+
 
 class TestLoggingIntegration:
     """Test integration of logging components."""
@@ -0,0 +1,79 @@
+import pytest
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.power_estimator import PowerEstimator, StreamingMedian
+
+TABLE = ApplianceTable.from_settings(
+    {
+        "Appliances": {
+            "Boiler": {"Power": 2.0, "Priority": 1},
+            "Floor": {"Power": 1.0, "Priority": 2},
+        }
+    }
+)
+
+
+def switch(estimator: PowerEstimator, on: list[bool], before: float, after: float):
+    """Publish ``on`` at a reading of ``before`` W that settles at ``after`` W."""
+    estimator.observe_power(before, now=0.0)
+    estimator.observe_states(TABLE.with_on(on), now=0.0)
+    estimator.observe_power(after, now=estimator.settle_seconds)
+
+
+class TestStreamingMedian:
+    @pytest.mark.unit
+    def test_median_of_window(self) -> None:
+        median = StreamingMedian(window=3)
+        for value in [5.0, 1.0, 3.0]:
+            median.add(value)
+        assert median.median == 3.0
+
+        median.add(10.0)  # drops 5.0
+        assert median.median == 3.0
+        median.add(11.0)  # drops 1.0
+        assert median.median == 10.0
+
+    @pytest.mark.unit
+    def test_even_count(self) -> None:
+        median = StreamingMedian()
+        median.add(1.0)
+        median.add(2.0)
+        assert median.median == 1.5
+
+
+class TestPowerEstimator:
+    @pytest.mark.unit
+    def test_learns_from_single_switches(self) -> None:
+        estimator = PowerEstimator(min_samples=3)
+        estimator.observe_states(TABLE.with_on([False, False]), now=0.0)
+
+        switch(estimator, [True, False], before=500, after=2100)
+        switch(estimator, [False, False], before=2150, after=600)
+        assert estimator.estimate("Boiler") is None
+        switch(estimator, [True, False], before=600, after=5000)  # outlier
+
+        assert estimator.estimate("Boiler") == pytest.approx(1.6)
+        assert estimator.apply(TABLE).power.tolist() == pytest.approx([1.6, 1.0])
+
+    @pytest.mark.unit
+    def test_ignores_simultaneous_switches(self) -> None:
+        estimator = PowerEstimator(min_samples=1)
+        estimator.observe_states(TABLE.with_on([False, False]), now=0.0)
+
+        switch(estimator, [True, True], before=500, after=3500)
+
+        assert estimator.medians == {}
+
+    @pytest.mark.unit
+    def test_waits_for_the_reading_to_settle(self) -> None:
+        estimator = PowerEstimator(min_samples=1)
+        estimator.observe_states(TABLE.with_on([False, False]), now=0.0)
+        estimator.observe_power(500, now=0.0)
+        estimator.observe_states(TABLE.with_on([False, True]), now=0.0)
+
+        estimator.observe_power(520, now=1.0)
+        assert estimator.estimate("Floor") is None
+        estimator.observe_power(1400, now=estimator.settle_seconds)
+
+        assert estimator.estimate("Floor") == pytest.approx(0.9)
+        assert estimator.version == 1
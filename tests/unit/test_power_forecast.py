@@ -0,0 +1,44 @@
+import pytest
+
+from price_driven_switch.backend.power_forecast import HoltForecaster
+
+
+@pytest.mark.unit
+def test_no_forecast_without_readings() -> None:
+    assert HoltForecaster().forecast(60) is None
+
+
+@pytest.mark.unit
+def test_constant_power_forecasts_itself() -> None:
+    forecaster = HoltForecaster()
+    for second in range(0, 60, 2):
+        forecaster.update(1500, float(second))
+
+    assert forecaster.forecast(30) == pytest.approx(1500)
+
+
+@pytest.mark.unit
+def test_follows_a_linear_ramp() -> None:
+    forecaster = HoltForecaster()
+    # 10 W more every second, readings every 2 s
+    for second in range(0, 600, 2):
+        forecaster.update(1000 + 10 * second, float(second))
+
+    assert forecaster.trend == pytest.approx(10, rel=0.01)
+    assert forecaster.forecast(30) == pytest.approx(1000 + 10 * 628, rel=0.01)
+
+
+@pytest.mark.unit
+def test_repeated_timestamp_does_not_divide_by_zero() -> None:
+    forecaster = HoltForecaster()
+    forecaster.update(1000, 5.0)
+    forecaster.update(2000, 5.0)
+
+    assert forecaster.forecast(0) == pytest.approx(1500)
+    assert forecaster.trend == 0.0
+
+
+@pytest.mark.unit
+def test_rejects_invalid_smoothing() -> None:
+    with pytest.raises(ValueError):
+        HoltForecaster(alpha=0)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from price_driven_switch.backend.power_history import PowerHistory
+
+
+@pytest.mark.unit
+def test_append_wraps_around() -> None:
+    history = PowerHistory(capacity=3)
+    for second in range(5):
+        history.append(float(second), {"power": second * 100})
+
+    timestamps, values = history.ordered()
+
+    assert len(history) == 3
+    assert timestamps.tolist() == [2.0, 3.0, 4.0]
+    assert values[:, history.fields.index("power")].tolist() == [200, 300, 400]
+
+
+@pytest.mark.unit
+def test_missing_fields_are_nan() -> None:
+    history = PowerHistory(capacity=2)
+    history.append(1.0, {"power": 1500, "currentL1": None})
+
+    _, values = history.ordered()
+
+    assert np.isnan(values[0, history.fields.index("currentL1")])
+    assert np.isnan(values[0, history.fields.index("voltagePhase1")])
+
+
+@pytest.mark.unit
+def test_downsample_min_mean_max() -> None:
+    history = PowerHistory(capacity=16)
+    for second, power in [(0, 100), (5, 300), (12, 1000), (31, 50), (35, 70)]:
+        history.append(1000.0 + second, {"power": power})
+
+    buckets = history.downsample(window=40, resolution=10, now=1040.0)
+
+    # The 1020..1030 bucket has no readings and is left out
+    assert buckets == {
+        "start": [1000.0, 1010.0, 1030.0],
+        "min": [100.0, 1000.0, 50.0],
+        "mean": [200.0, 1000.0, 60.0],
+        "max": [300.0, 1000.0, 70.0],
+    }
+
+
+@pytest.mark.unit
+def test_downsample_only_covers_the_window() -> None:
+    history = PowerHistory(capacity=4)
+    for second in range(8):
+        history.append(float(second), {"power": 10 * second})
+
+    buckets = history.downsample(window=2, resolution=1, now=7.0)
+
+    assert buckets["start"] == [5.0, 6.0, 7.0]
+    assert buckets["mean"] == [50.0, 60.0, 70.0]
+    assert PowerHistory(capacity=4).downsample(60, 10, now=7.0)["start"] == []
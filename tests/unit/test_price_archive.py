@@ -0,0 +1,131 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+
+from price_driven_switch.backend.price_archive import PriceArchive
+from price_driven_switch.backend.price_file import PriceFile
+from price_driven_switch.backend.tibber_connection import TibberConnection
+
+CET = timezone(timedelta(hours=1))
+
+
+def response(today: list[dict], tomorrow: list[dict]) -> dict:
+    price_info = {"today": today, "tomorrow": tomorrow}
+    return {
+        "data": {
+            "viewer": {"homes": [{"currentSubscription": {"priceInfo": price_info}}]}
+        }
+    }
+
+
+def quarter_hours(day: date, price: float) -> list[dict]:
+    midnight = datetime(day.year, day.month, day.day, tzinfo=CET)
+    return [
+        {
+            "total": price + slot / 1000,
+            "startsAt": (midnight + timedelta(minutes=15 * slot)).isoformat(),
+        }
+        for slot in range(96)
+    ]
+
+
+@pytest.fixture
+def archive(tmp_path) -> PriceArchive:
+    return PriceArchive(str(tmp_path / "price_archive"))
+
+
+@pytest.mark.unit
+def test_empty_archive(archive) -> None:
+    assert archive.days() == []
+    assert len(archive.read(date(2024, 1, 1), date(2024, 12, 31))) == 0
+
+
+@pytest.mark.unit
+def test_archives_today_and_tomorrow(archive) -> None:
+    added = archive.append_response(
+        response(
+            quarter_hours(date(2024, 1, 3), 0.5), quarter_hours(date(2024, 1, 4), 0.7)
+        ),
+        date(2024, 1, 3),
+    )
+
+    assert added == 2
+    assert archive.days() == [date(2024, 1, 3), date(2024, 1, 4)]
+    day = archive.read_day(date(2024, 1, 4))
+    assert len(day) == 96
+    assert day.starts[0] == datetime(2024, 1, 4, tzinfo=CET).timestamp()
+    assert day.prices[1] == pytest.approx(0.701)
+    assert day.prices.dtype == np.float32
+    assert day.starts.dtype == np.int64
+
+
+@pytest.mark.unit
+def test_days_are_archived_once(archive) -> None:
+    archive.append_response(
+        response(
+            quarter_hours(date(2024, 1, 3), 0.5), quarter_hours(date(2024, 1, 4), 0.7)
+        ),
+        date(2024, 1, 3),
+    )
+    # The next day's today is yesterday's tomorrow
+    added = archive.append_response(
+        response(quarter_hours(date(2024, 1, 4), 9.0), []), date(2024, 1, 4)
+    )
+
+    assert added == 0
+    assert archive.read_day(date(2024, 1, 4)).prices[0] == pytest.approx(0.7)
+
+
+@pytest.mark.unit
+def test_reads_views_of_a_date_range(archive) -> None:
+    for day in range(1, 6):
+        archive.append_day(
+            date(2024, 1, day), np.arange(24) + day * 100, np.full(24, day, np.float32)
+        )
+
+    archived = archive.read(date(2024, 1, 2), date(2024, 1, 4))
+
+    assert len(archived) == 72
+    assert archived.prices.tolist() == [2.0] * 24 + [3.0] * 24 + [4.0] * 24
+    assert isinstance(archived.prices.base, np.memmap)
+    with pytest.raises(ValueError):
+        archived.prices[0] = 0
+
+
+@pytest.mark.unit
+def test_hourly_prices_without_starts_at(archive) -> None:
+    archive.append_response(
+        response([{"total": 0.1 * hour} for hour in range(24)], []), date(2024, 1, 3)
+    )
+
+    starts = archive.read_day(date(2024, 1, 3)).starts
+    assert np.diff(starts).tolist() == [3600] * 23
+
+
+@pytest.mark.unit
+def test_interrupted_append_is_overwritten(archive) -> None:
+    archive.append_day(date(2024, 1, 1), np.arange(24), np.ones(24))
+    # Slot rows written without their index record
+    with open(os.path.join(archive.directory, "prices.f4"), "ab") as file:
+        file.write(np.full(5, 7, np.float32).tobytes())
+
+    archive.append_day(date(2024, 1, 2), np.arange(24), np.full(24, 2.0))
+
+    assert archive.read_day(date(2024, 1, 2)).prices.tolist() == [2.0] * 24
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_every_refresh_feeds_the_archive(tmp_path) -> None:
+    tibber = TibberConnection("test_token")
+    tibber.get_prices = AsyncMock(
+        return_value=response(quarter_hours(date.today(), 0.5), [])
+    )
+    price_file = PriceFile(tibber, str(tmp_path / "prices.json"))
+
+    await price_file._update_price_file()
+
+    assert price_file.archive.days() == [date.today()]
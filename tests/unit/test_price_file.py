@@ -1,5 +1,8 @@
+import asyncio
+import datetime as dt
 import json
-from unittest.mock import mock_open, patch
+import os
+from unittest.mock import AsyncMock, mock_open, patch
 
 import pytest
 from freezegun import freeze_time
@@ -9,6 +12,27 @@ from price_driven_switch.backend.tibber_connection import TibberConnection
 
 
 class TestPriceFile:
+    @pytest.fixture(autouse=True)
+    def clear_price_file_cache(self):
+        PriceFile._cache.clear()
+        yield
+        PriceFile._cache.clear()
+
+    @pytest.fixture
+    def price_path(self, tmp_path):
+        """Keep the price file and its refresh lock out of the source tree."""
+        return str(tmp_path / "prices.json")
+
+    @pytest.fixture
+    def outdated_price_file(self, tmp_path, json_string_fixture):
+        """Price file fetched yesterday, so it is out of date now."""
+        data = json.loads(json_string_fixture)
+        yesterday = dt.datetime.now() - dt.timedelta(days=1)
+        data["timestamp"] = yesterday.strftime("%Y-%m-%d %H:%M")
+        path = tmp_path / "prices.json"
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return str(path)
+
     @pytest.mark.unit
     @freeze_time("2023-05-06 18:25")
     def test_load_price_file(self, json_string_fixture, file_date_fixture):
@@ -32,9 +56,9 @@ class TestPriceFile:
     @pytest.mark.unit
     @pytest.mark.asyncio
     @freeze_time("2023-05-06 18:25")
-    async def test_check_file_no_file(self, mock_tibber_get_prices):
+    async def test_check_file_no_file(self, mock_tibber_get_prices, price_path):
         mock_tibber = TibberConnection("test_token")
-        price_file = PriceFile(mock_tibber)
+        price_file = PriceFile(mock_tibber, price_path)
 
         with (
             patch("os.path.exists", return_value=False),
@@ -49,9 +73,9 @@ class TestPriceFile:
     @pytest.mark.unit
     @pytest.mark.asyncio
     @freeze_time("2023-05-07 18:25")
-    async def test_check_file_out_of_date(self, mock_tibber_get_prices):
+    async def test_check_file_out_of_date(self, mock_tibber_get_prices, price_path):
         mock_tibber = TibberConnection("test_token")
-        price_file = PriceFile(mock_tibber)
+        price_file = PriceFile(mock_tibber, price_path)
 
         with (
             patch("os.path.exists", return_value=True),
@@ -70,9 +94,9 @@ class TestPriceFile:
     @pytest.mark.unit
     @pytest.mark.asyncio
     @freeze_time("2023-05-06 19:25")
-    async def test_check_file_up_to_date(self, mock_tibber_get_prices):
+    async def test_check_file_up_to_date(self, mock_tibber_get_prices, price_path):
         mock_tibber = TibberConnection("test_token")
-        price_file = PriceFile(mock_tibber)
+        price_file = PriceFile(mock_tibber, price_path)
 
         with (
             patch("os.path.exists", return_value=True),
@@ -91,9 +115,9 @@ class TestPriceFile:
     @pytest.mark.unit
     @pytest.mark.asyncio
     @freeze_time("2023-05-06 18:25")
-    async def test_load_prices(self, mock_tibber_get_prices):
+    async def test_load_prices(self, mock_tibber_get_prices, price_path):
         mock_tibber = TibberConnection("test_token")
-        price_file = PriceFile(mock_tibber)
+        price_file = PriceFile(mock_tibber, price_path)
 
         with patch(
             "price_driven_switch.backend.price_file.PriceFile._load_price_file",
@@ -136,18 +160,15 @@ class TestPriceFile:
 
     @pytest.mark.unit
     @pytest.mark.asyncio
-    async def test_update_price_file(self, mock_tibber_get_prices):
+    async def test_update_price_file(self, mock_tibber_get_prices, price_path):
         mock_tibber = TibberConnection("test_token")
-        price_file = PriceFile(mock_tibber)
+        price_file = PriceFile(mock_tibber, price_path)
 
-        with (
-            patch("builtins.open", mock_open()) as mock_file,
-            patch("json.dump") as mock_json_dump,
-        ):
-            await price_file._update_price_file()
+        await price_file._update_price_file()
 
-        mock_json_dump.assert_called_once()
-        mock_file.assert_called_once_with(price_file.path, mode="w", encoding="utf-8")
+        with open(price_path, encoding="utf-8") as json_file:
+            written = json.load(json_file)
+        assert written["api_response"] == mock_tibber_get_prices
 
     @pytest.mark.unit
     @pytest.mark.asyncio
@@ -159,17 +180,158 @@ class TestPriceFile:
         assert result["api_response"] == mock_tibber_get_prices
 
     @pytest.mark.unit
-    def test_write_prices_file(self, mock_tibber_get_prices):
-        mock_tibber = TibberConnection("test_token")
-        price_file = PriceFile(mock_tibber)
-
+    def test_write_prices_file(self, price_path):
+        price_file = PriceFile(TibberConnection("test_token"), price_path)
         api_response = {"some_key": "some_value"}
 
-        with (
-            patch("builtins.open", mock_open()) as mock_file,
-            patch("json.dump") as mock_json_dump,
-        ):
+        with patch("price_driven_switch.backend.price_file.os.replace") as replace:
             price_file._write_prices_file(api_response)
 
-        mock_json_dump.assert_called_once_with(api_response, mock_file())
-        mock_file.assert_any_call(price_file.path, mode="w", encoding="utf-8")
+        # Written to a temporary file in the same directory, then moved in place
+        temporary, target = replace.call_args.args
+        assert target == price_path
+        assert os.path.dirname(temporary) == os.path.dirname(price_path)
+        with open(temporary, encoding="utf-8") as json_file:
+            assert json.load(json_file) == api_response
+        assert not os.path.exists(price_path)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @freeze_time("2023-05-06 18:25")
+    async def test_load_prices_parses_file_once(self, tmp_path, json_string_fixture):
+        path = tmp_path / "prices.json"
+        path.write_text(json_string_fixture, encoding="utf-8")
+        price_file = PriceFile(TibberConnection("test_token"), str(path))
+
+        with patch.object(
+            PriceFile, "_load_price_file", side_effect=price_file._load_price_file
+        ) as mock_load:
+            first = await price_file.load_prices()
+            second = await PriceFile(
+                TibberConnection("test_token"), str(path)
+            ).load_prices()
+
+        assert first == json.loads(json_string_fixture)["api_response"]
+        assert second is first
+        mock_load.assert_called_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    @freeze_time("2023-05-06 18:25")
+    async def test_load_prices_reparses_changed_file(
+        self, tmp_path, json_string_fixture
+    ):
+        path = tmp_path / "prices.json"
+        path.write_text(json_string_fixture, encoding="utf-8")
+        price_file = PriceFile(TibberConnection("test_token"), str(path))
+        await price_file.load_prices()
+
+        changed = {"timestamp": "2023-05-06 18:30", "api_response": {"changed": 1}}
+        path.write_text(json.dumps(changed), encoding="utf-8")
+
+        assert await price_file.load_prices() == {"changed": 1}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_refreshes_share_one_request(
+        self, tmp_path, outdated_price_file
+    ):
+        async def slow_get_prices():
+            await asyncio.sleep(0.05)
+            return {"fresh": True}
+
+        tibber = TibberConnection("test_token")
+        tibber.get_prices = AsyncMock(side_effect=slow_get_prices)
+
+        results = await asyncio.gather(
+            *(PriceFile(tibber, outdated_price_file).load_prices() for _ in range(10))
+        )
+
+        tibber.get_prices.assert_awaited_once()
+        assert all(result == {"fresh": True} for result in results)
+        assert PriceFile._refreshes == {}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_refresh_skipped_when_other_process_refreshed(
+        self, outdated_price_file
+    ):
+        tibber = TibberConnection("test_token")
+        tibber.get_prices = AsyncMock(return_value={"from": "this process"})
+        fcntl = pytest.importorskip("fcntl")
+        price_file = PriceFile(tibber, outdated_price_file)
+
+        # Simulate the other process holding the lock while refreshing
+        with open(f"{outdated_price_file}.lock", "a", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            refresh = asyncio.create_task(price_file.load_prices())
+            await asyncio.sleep(0.05)
+            assert not refresh.done()
+
+            other = {
+                "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "api_response": {"from": "other"},
+            }
+            with open(outdated_price_file, "w", encoding="utf-8") as file:
+                json.dump(other, file)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        assert await refresh == {"from": "other"}
+        tibber.get_prices.assert_not_awaited()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_refresh_is_retried(self, outdated_price_file):
+        tibber = TibberConnection("test_token")
+        tibber.get_prices = AsyncMock(
+            side_effect=[ConnectionError("Tibber down"), {"fresh": True}]
+        )
+        price_file = PriceFile(tibber, outdated_price_file)
+
+        with pytest.raises(ConnectionError):
+            await price_file.load_prices()
+
+        assert await price_file.load_prices() == {"fresh": True}
+
+    @pytest.mark.unit
+    def test_file_with_tomorrow_prices_is_not_out_of_date(
+        self, tmp_path, json_string_fixture
+    ):
+        data = json.loads(json_string_fixture)
+        data["timestamp"] = "2023-05-06 13:05"
+        path = tmp_path / "prices.json"
+        path.write_text(json.dumps(data), encoding="utf-8")
+        price_file = PriceFile(TibberConnection("test_token"), str(path))
+
+        with freeze_time("2023-05-06 13:25"):
+            assert price_file.has_tomorrow_prices() is True
+            assert price_file.is_out_of_date() is False
+        with freeze_time("2023-05-07 00:05"):
+            assert price_file.has_tomorrow_prices() is False
+            assert price_file.is_out_of_date() is True
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_prefetch_tomorrow_skips_download_when_present(
+        self, tmp_path, json_string_fixture
+    ):
+        data = json.loads(json_string_fixture)
+        data["timestamp"] = dt.datetime.now().strftime("%Y-%m-%d %H:%M")
+        path = tmp_path / "prices.json"
+        path.write_text(json.dumps(data), encoding="utf-8")
+        tibber = TibberConnection("test_token")
+        tibber.get_prices = AsyncMock()
+        price_file = PriceFile(tibber, str(path))
+
+        assert await price_file.prefetch_tomorrow() is True
+        tibber.get_prices.assert_not_awaited()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_prefetch_tomorrow_downloads_when_missing(self, outdated_price_file):
+        tibber = TibberConnection("test_token")
+        tibber.get_prices = AsyncMock(return_value={"data": {}})
+        price_file = PriceFile(tibber, outdated_price_file)
+
+        assert await price_file.prefetch_tomorrow() is False
+        tibber.get_prices.assert_awaited_once()
@@ -0,0 +1,80 @@
+import asyncio
+import datetime as dt
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from price_driven_switch.backend.price_prefetch import PricePrefetcher
+
+
+@pytest.fixture
+def schedule_cache():
+    cache = MagicMock()
+    cache.price_file.prefetch_tomorrow = AsyncMock(return_value=True)
+    cache.price_file.load_prices = AsyncMock()
+    cache.refresh_on_demand = True
+    return cache
+
+
+class TestPricePrefetcher:
+    @pytest.mark.unit
+    def test_next_run_is_publish_time_in_the_morning(self) -> None:
+        now = dt.datetime(2024, 1, 3, 12, 0)
+        assert PricePrefetcher.seconds_until_next_run(now) == 60 * 60
+
+    @pytest.mark.unit
+    def test_next_run_is_midnight_after_publish_time(self) -> None:
+        now = dt.datetime(2024, 1, 3, 23, 0)
+        assert PricePrefetcher.seconds_until_next_run(now) == 60 * 60 + 5
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_retries_until_tomorrow_is_published(self, schedule_cache) -> None:
+        schedule_cache.price_file.prefetch_tomorrow.side_effect = [
+            False,
+            RuntimeError("Tibber unavailable"),
+            True,
+        ]
+        prefetcher = PricePrefetcher(schedule_cache, retry_initial=0, retry_max=0)
+
+        with patch(
+            "price_driven_switch.backend.price_prefetch._is_published",
+            return_value=True,
+        ):
+            await prefetcher.prefetch()
+
+        assert schedule_cache.price_file.prefetch_tomorrow.await_count == 3
+        schedule_cache.warm.assert_called_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_loads_todays_prices_before_publish_time(
+        self, schedule_cache
+    ) -> None:
+        prefetcher = PricePrefetcher(schedule_cache)
+
+        with patch(
+            "price_driven_switch.backend.price_prefetch._is_published",
+            return_value=False,
+        ):
+            await prefetcher.prefetch()
+
+        schedule_cache.price_file.load_prices.assert_awaited_once()
+        schedule_cache.price_file.prefetch_tomorrow.assert_not_awaited()
+        schedule_cache.warm.assert_called_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_run_takes_over_refreshes_until_cancelled(
+        self, schedule_cache
+    ) -> None:
+        prefetcher = PricePrefetcher(schedule_cache)
+
+        task = asyncio.create_task(prefetcher.run())
+        await asyncio.sleep(0)
+        assert schedule_cache.refresh_on_demand is False
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert schedule_cache.refresh_on_demand is True
@@ -0,0 +1,51 @@
+import pytest
+
+from price_driven_switch.backend.price_rank import interleave_order, rank_index
+
+
+@pytest.mark.unit
+def test_interleave_order_spreads_the_slots() -> None:
+    assert interleave_order(8) == (3, 1, 5, 0, 2, 4, 6, 7)
+    assert interleave_order(1) == (0,)
+
+
+@pytest.mark.unit
+def test_ranks_by_price() -> None:
+    ranking = rank_index([0.3, 0.1, 0.2, 0.4])
+
+    assert ranking.slot_rank.tolist() == [2, 0, 1, 3]
+    assert ranking.rank_price.tolist() == [0.1, 0.2, 0.3, 0.4]
+    assert ranking.offset(1) == 0.0
+    assert ranking.offset(3) == 1.0
+
+
+@pytest.mark.unit
+def test_equal_prices_are_interleaved() -> None:
+    ranking = rank_index([0.5] * 8)
+
+    # Slot 3 is taken first, then 1 and 5
+    assert ranking.slot_rank[[3, 1, 5]].tolist() == [0, 1, 2]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("offset", "expected"), [(0.0, 0.1), (0.3, 0.2), (0.7, 0.3), (1.0, 0.4)]
+)
+def test_price_at_offset(offset, expected) -> None:
+    assert rank_index([0.3, 0.1, 0.2, 0.4]).price_at_offset(offset) == expected
+
+
+@pytest.mark.unit
+def test_index_is_cached_per_price_vector() -> None:
+    prices = [0.25, 0.5, 0.125] * 32
+
+    assert rank_index(prices) is rank_index(tuple(prices))
+    assert rank_index(prices) is not rank_index(prices[::-1])
+
+
+@pytest.mark.unit
+def test_index_is_read_only() -> None:
+    ranking = rank_index([0.3, 0.1, 0.2])
+
+    with pytest.raises(ValueError):
+        ranking.slot_rank[0] = 5
@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from price_driven_switch.backend.price_slots import (
+    SlotBoundaries,
+    hours_in_day,
+    parse_starts,
+    slot_starts,
+)
+
+CET = timezone(timedelta(hours=1))
+
+
+def quarter_hours(day: datetime) -> list[datetime]:
+    return [day + timedelta(minutes=15 * slot) for slot in range(96)]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    ("day", "hours"),
+    [(date(2024, 1, 3), 24), (date(2024, 3, 31), 23), (date(2024, 10, 27), 25)],
+)
+def test_hours_in_day(oslo_timezone, day, hours) -> None:
+    assert hours_in_day(day) == hours
+
+
+@pytest.mark.unit
+def test_slot_starts_on_a_short_day(oslo_timezone) -> None:
+    starts = slot_starts(date(2024, 3, 31), 23)
+
+    # 02:00 does not exist on the day summer time starts
+    assert [start.hour for start in starts[:3]] == [0, 1, 3]
+    assert starts[-1].hour == 23
+
+
+@pytest.mark.unit
+def test_parse_starts() -> None:
+    starts = parse_starts(
+        ["2024-01-03T00:00:00.000+01:00", "2024-01-03T01:00:00+01:00"]
+    )
+
+    assert starts == [
+        datetime(2024, 1, 3, 0, tzinfo=CET),
+        datetime(2024, 1, 3, 1, tzinfo=CET),
+    ]
+    assert parse_starts(["2024-01-03T00:00:00+01:00", None]) is None
+    assert parse_starts(["yesterday"]) is None
+    assert parse_starts([]) is None
+
+
+@pytest.mark.unit
+def test_quarter_hour_slots() -> None:
+    midnight = datetime(2024, 1, 3, tzinfo=CET)
+    boundaries = SlotBoundaries.from_starts(quarter_hours(midnight))
+    at_1350 = (midnight + timedelta(hours=13, minutes=50)).timestamp()
+
+    assert boundaries.slots == 96
+    assert boundaries.edges[-1] == (midnight + timedelta(days=1)).timestamp()
+    assert boundaries.slot_at(at_1350) == 55
+    assert boundaries.seconds_until_next(at_1350) == 10 * 60
+
+
+@pytest.mark.unit
+def test_slot_at_is_clamped_to_the_day() -> None:
+    midnight = datetime(2024, 1, 3, tzinfo=CET)
+    boundaries = SlotBoundaries.from_starts(quarter_hours(midnight))
+
+    assert boundaries.slot_at(midnight.timestamp() - 60) == 0
+    assert boundaries.slot_at((midnight + timedelta(days=2)).timestamp()) == 95
+
+
+@pytest.mark.unit
+def test_slots_of_unequal_length() -> None:
+    midnight = datetime(2024, 1, 3, tzinfo=CET)
+    starts = [midnight, midnight + timedelta(hours=1), midnight + timedelta(hours=4)]
+    boundaries = SlotBoundaries.from_starts(starts)
+
+    assert boundaries.slot_at((midnight + timedelta(hours=2)).timestamp()) == 1
+    assert boundaries.slot_at((midnight + timedelta(hours=5)).timestamp()) == 2
+
+
+@pytest.mark.unit
+def test_uniform_slots_follow_real_time(oslo_timezone) -> None:
+    # The repeated 02:00 hour of 2024-10-27 is slot 2, 03:00 is slot 4
+    boundaries = SlotBoundaries.uniform(date(2024, 10, 27), 25)
+
+    assert boundaries.slot_at(datetime(2024, 10, 27, 3, 30).timestamp()) == 4
@@ -1,9 +1,48 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from unittest.mock import patch
 
 import pytest
 
-from price_driven_switch.backend.prices import Prices
+from price_driven_switch.backend.price_slots import hours_in_day
+from price_driven_switch.backend.prices import (
+    Prices,
+    seconds_until_next_slot,
+    slot_index,
+)
+
+
+class TestSlotIndex:
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        ("now", "slots", "expected"),
+        [
+            (datetime(2024, 1, 3, 0, 0), 24, 0),
+            (datetime(2024, 1, 3, 13, 59), 24, 13),
+            (datetime(2024, 1, 3, 23, 59, 59), 24, 23),
+            (datetime(2024, 1, 3, 13, 50), 96, 55),
+        ],
+    )
+    def test_regular_day(self, oslo_timezone, now, slots, expected) -> None:
+        assert slot_index(now, slots) == expected
+
+    @pytest.mark.unit
+    def test_short_dst_day(self, oslo_timezone) -> None:
+        # 2024-03-31 has 23 hours, 03:00 is the third price of the day
+        assert slot_index(datetime(2024, 3, 31, 3, 30), 23) == 2
+        assert slot_index(datetime(2024, 3, 31, 23, 30), 23) == 22
+
+    @pytest.mark.unit
+    def test_long_dst_day(self, oslo_timezone) -> None:
+        # 2024-10-27 has 25 hours, the repeated 02:00 hour shifts later slots
+        assert slot_index(datetime(2024, 10, 27, 1, 30), 25) == 1
+        assert slot_index(datetime(2024, 10, 27, 23, 30), 25) == 24
+
+    @pytest.mark.unit
+    def test_seconds_until_next_slot(self, oslo_timezone) -> None:
+        assert seconds_until_next_slot(datetime(2024, 1, 3, 13, 59, 30), 24) == 30
+        assert seconds_until_next_slot(datetime(2024, 1, 3, 13, 10), 96) == 5 * 60
+        # The last slot ends at midnight
+        assert seconds_until_next_slot(datetime(2024, 1, 3, 23, 0), 24) == 60 * 60
 
 
 class TestPrices:
@@ -18,6 +57,36 @@ class TestPrices:
         # Hour 6 should be in the cheapest tier (offset < 0.1)
         assert instance.offset_now < 0.1
 
+    @pytest.mark.unit
+    def test_hour_offsets(self, prices_instance_fixture) -> None:
+        instance = prices_instance_fixture
+        offsets = instance.hour_offsets(instance.today_prices)
+
+        # Every hour gets a unique position in the ranking
+        assert sorted(offsets) == [position / 23 for position in range(24)]
+        # Cheaper hours always get a lower offset
+        prices = instance.today_prices
+        for hour_a in range(24):
+            for hour_b in range(24):
+                if prices[hour_a] < prices[hour_b]:
+                    assert offsets[hour_a] < offsets[hour_b]
+
+    @pytest.mark.unit
+    def test_offset_now_uses_hour_offsets(self, mock_instance_with_hour) -> None:
+        hour, instance = mock_instance_with_hour
+        assert instance.offset_now == instance.hour_offsets(instance.today_prices)[hour]
+
+    @pytest.mark.unit
+    def test_rolling_offset_now(self, mock_instance_with_hour) -> None:
+        hour, instance = mock_instance_with_hour
+        today_prices = instance.today_prices
+        # Ranked among the next 12 hours, across midnight into tomorrow
+        slots = round(12 * len(today_prices) / hours_in_day(date.today()))
+        window = (today_prices + instance.tomo_prices)[hour : hour + slots]
+        cheaper = sum(price < today_prices[hour] for price in window)
+
+        assert instance.rolling_offset_now(12) == pytest.approx(cheaper / (slots - 1))
+
     @pytest.mark.unit
     def test_price_now(
         self, mock_instance_hour_now, prices_instance_fixture, price_now_fixture
@@ -29,9 +98,9 @@ class TestPrices:
     @pytest.mark.unit
     def test_hour_now(self, api_response_fixture) -> None:
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "IncludeGridRent": False,
                     "GridRent": {
@@ -61,9 +130,9 @@ class TestPrices:
     def test_today_prices_with_grid_rent(self, api_response_fixture) -> None:
         """Test that grid rent is added to today's prices when enabled."""
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "IncludeGridRent": True,
                     "GridRent": {
@@ -88,9 +157,9 @@ class TestPrices:
     def test_today_prices_without_grid_rent(self, api_response_fixture) -> None:
         """Test that grid rent is not added when disabled."""
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "IncludeGridRent": False,
                     "GridRent": {
@@ -111,9 +180,9 @@ class TestPrices:
     def test_tomo_prices_with_grid_rent(self, api_response_fixture) -> None:
         """Test that grid rent is added to tomorrow's prices when enabled."""
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "IncludeGridRent": True,
                     "GridRent": {
@@ -181,9 +250,9 @@ class TestPrices:
     def test_today_prices_with_norgespris(self, api_response_fixture) -> None:
         """Test that Norgespris returns fixed prices when enabled."""
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "UseNorgespris": True,
                     "NorgesprisRate": 50.0,
@@ -194,17 +263,17 @@ class TestPrices:
             prices = Prices(api_response_fixture)
             today_prices = prices.today_prices
 
-            # Should return 24 hours of fixed price in NOK (converted from øre)
-            assert len(today_prices) == 24
+            # One fixed price in NOK (converted from øre) per hour of the day
+            assert len(today_prices) == hours_in_day(date.today())
             assert all(price == 0.50 for price in today_prices)
 
     @pytest.mark.unit
     def test_tomo_prices_with_norgespris(self, api_response_fixture) -> None:
         """Test that Norgespris returns fixed prices for tomorrow when enabled."""
         with patch(
-            "price_driven_switch.backend.prices.load_settings_file"
-        ) as mock_load_settings:
-            mock_load_settings.return_value = {
+            "price_driven_switch.backend.prices.settings_snapshot"
+        ) as mock_settings_snapshot:
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "UseNorgespris": True,
                     "NorgesprisRate": 40.0,
@@ -215,8 +284,8 @@ class TestPrices:
             prices = Prices(api_response_fixture)
             tomo_prices = prices.tomo_prices
 
-            # Should return 24 hours of fixed price in NOK (converted from øre)
-            assert len(tomo_prices) == 24
+            # One fixed price in NOK (converted from øre) per hour of the day
+            assert len(tomo_prices) == hours_in_day(date.today() + timedelta(days=1))
             assert all(price == 0.40 for price in tomo_prices)
 
     @pytest.mark.unit
@@ -224,15 +293,15 @@ class TestPrices:
         """Test that grid rent is added to Norgespris when both are enabled."""
         with (
             patch(
-                "price_driven_switch.backend.prices.load_settings_file"
-            ) as mock_load_settings,
+                "price_driven_switch.backend.prices.settings_snapshot"
+            ) as mock_settings_snapshot,
             patch("price_driven_switch.backend.prices.datetime") as mock_datetime,
         ):
             # Mock a Wednesday in January (day rate applies)
             mock_now = datetime(2024, 1, 3, 12, 0, 0)  # Wednesday noon
             mock_datetime.now.return_value = mock_now
 
-            mock_load_settings.return_value = {
+            mock_settings_snapshot.return_value.data = {
                 "Settings": {
                     "UseNorgespris": True,
                     "NorgesprisRate": 50.0,
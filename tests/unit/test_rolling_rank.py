@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from price_driven_switch.backend.rolling_rank import FenwickTree, rolling_offsets
+
+
+def brute_force_offsets(prices: list[float], window: int) -> list[float]:
+    window = min(window, len(prices))
+    offsets = []
+    for slot, price in enumerate(prices):
+        start = min(slot, len(prices) - window)
+        cheaper = sum(other < price for other in prices[start : start + window])
+        offsets.append(cheaper / max(window - 1, 1))
+    return offsets
+
+
+@pytest.mark.unit
+def test_fenwick_prefix_sums() -> None:
+    tree = FenwickTree(8)
+    for position in (0, 3, 3, 7):
+        tree.add(position, 1)
+    tree.add(3, -1)
+
+    assert [tree.prefix_sum(end) for end in range(9)] == [0, 1, 1, 1, 2, 2, 2, 2, 3]
+
+
+@pytest.mark.unit
+def test_sees_the_cheap_night_after_midnight() -> None:
+    # 22:00 and 23:00 today, then a cheap night tomorrow
+    prices = [1.0, 0.9, 0.2, 0.1, 0.3, 0.4]
+
+    offsets = rolling_offsets(prices, 4)
+
+    # 23:00 is the dearest of its next four hours, 00:00 is cheap among them
+    assert offsets[:3] == pytest.approx([1.0, 1.0, 1 / 3])
+    assert offsets[3] == 0.0
+
+
+@pytest.mark.unit
+def test_window_keeps_its_length_at_the_end() -> None:
+    offsets = rolling_offsets([0.5, 0.4, 0.3, 0.2], 3)
+
+    # The last slot is ranked among the last three prices
+    assert offsets[3] == 0.0
+    assert offsets[2] == 0.5
+
+
+@pytest.mark.unit
+def test_matches_a_full_sort_per_slot() -> None:
+    generator = random.Random(7)
+    for _ in range(50):
+        prices = [
+            generator.choice([0.1, 0.2, 0.3]) + generator.random() for _ in range(48)
+        ]
+        prices[5:9] = [0.25] * 4
+        for window in (1, 6, 24, 60):
+            assert rolling_offsets(prices, window) == pytest.approx(
+                brute_force_offsets(prices, window)
+            )
+
+
+@pytest.mark.unit
+def test_no_prices() -> None:
+    assert rolling_offsets([], 24) == []
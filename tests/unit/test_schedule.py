@@ -0,0 +1,203 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+
+from price_driven_switch.backend.price_file import PriceFile
+from price_driven_switch.backend.schedule import (
+    ScheduleCache,
+    build_schedule,
+    compile_schedule,
+)
+from price_driven_switch.backend.switch_logic import set_price_only_based_states
+from price_driven_switch.backend.tibber_connection import TibberConnection
+from tests.conftest import PATH_TEST_PRICES, load_json_fixture
+
+SETTINGS = {
+    "Appliances": {
+        "Boiler 1": {"Power": 1.5, "Priority": 2, "Setpoint": 0.5},
+        "Boiler 2": {"Power": 1.0, "Priority": 1, "Setpoint": 0.2},
+        "Floor": {"Power": 0.8, "Priority": 3, "Setpoint": 1.0},
+    },
+    "Settings": {"MaxPower": 5.0, "Timezone": "Europe/Oslo", "IncludeGridRent": False},
+}
+
+
+class TestSwitchSchedule:
+    @pytest.mark.unit
+    def test_build_schedule_shape(self) -> None:
+        schedule = build_schedule(
+            SETTINGS, [h / 23 for h in range(24)], [], today=date(2024, 1, 3)
+        )
+
+        assert schedule.today.on.shape == (24, 3)
+        assert schedule.tomorrow.on.shape == (0, 3)
+        assert schedule.today.day == date(2024, 1, 3)
+        assert schedule.tomorrow.day == date(2024, 1, 4)
+
+    @pytest.mark.unit
+    def test_states_match_price_only_logic(self) -> None:
+        offsets = [h / 23 for h in range(24)]
+        schedule = build_schedule(SETTINGS, offsets, [])
+
+        for slot, offset in enumerate(offsets):
+            expected = set_price_only_based_states(SETTINGS, offset)
+            states = schedule.states_at(slot)
+            assert states.on.tolist() == expected["on"].tolist()
+            assert schedule.offset_at(slot) == offset
+
+    @pytest.mark.unit
+    def test_states_at_is_read_only(self) -> None:
+        schedule = build_schedule(SETTINGS, [0.0] * 24, [])
+
+        states = schedule.states_at(0)
+        with pytest.raises(ValueError):
+            states.on[states.index_of("Floor")] = False
+
+        assert schedule.states_at(0).on.all()
+
+    @pytest.mark.unit
+    def test_for_day_promotes_tomorrow(self) -> None:
+        schedule = build_schedule(
+            SETTINGS, [0.0] * 24, [1.0] * 24, today=date(2024, 1, 3)
+        )
+
+        promoted = schedule.for_day(date(2024, 1, 4))
+
+        assert promoted is not None
+        assert promoted.today is schedule.tomorrow
+        assert promoted.tomorrow.slots == 0
+        assert schedule.for_day(date(2024, 1, 3)) is schedule
+        assert schedule.for_day(date(2024, 1, 5)) is None
+
+    @pytest.mark.unit
+    def test_compile_schedule(self, api_response_fixture) -> None:
+        schedule = compile_schedule(api_response_fixture, SETTINGS)
+
+        assert schedule.today.slots == 24
+        # The cheapest hour is always ON for every appliance
+        cheapest = int(schedule.today.offsets.argmin())
+        assert schedule.today.on[cheapest].all()
+
+    @pytest.mark.unit
+    def test_compile_schedule_follows_starts_at(self, api_response_fixture) -> None:
+        midnight = datetime(2024, 1, 3, tzinfo=timezone(timedelta(hours=1)))
+        price_info = api_response_fixture["data"]["viewer"]["homes"][0][
+            "currentSubscription"
+        ]["priceInfo"]
+        price_info["today"] = [
+            {"total": 0.5 + slot % 4, "startsAt": start.isoformat()}
+            for slot, start in enumerate(
+                midnight + timedelta(minutes=15 * slot) for slot in range(96)
+            )
+        ]
+
+        schedule = compile_schedule(api_response_fixture, SETTINGS, date(2024, 1, 3))
+
+        assert schedule.today.slots == 96
+        at_1350 = midnight + timedelta(hours=13, minutes=50)
+        assert schedule.today.boundaries.slot_at(at_1350.timestamp()) == 55
+
+    @pytest.mark.unit
+    def test_compile_schedule_with_ranking_horizon(self, api_response_fixture) -> None:
+        settings = {**SETTINGS, "Settings": {**SETTINGS["Settings"]}}
+        settings["Settings"]["RankingHorizonHours"] = 6
+
+        per_day = compile_schedule(api_response_fixture, SETTINGS, date(2024, 1, 3))
+        rolling = compile_schedule(api_response_fixture, settings, date(2024, 1, 3))
+
+        assert rolling.today.slots == per_day.today.slots
+        assert rolling.tomorrow.slots == per_day.tomorrow.slots
+        # Every slot is ranked among six, so offsets are multiples of 1/5
+        offsets = rolling.today.offsets * 5
+        assert offsets == pytest.approx(offsets.round())
+        assert not (rolling.today.offsets == per_day.today.offsets).all()
+
+
+class TestScheduleCache:
+    @pytest.fixture(autouse=True)
+    def clear_price_file_cache(self):
+        PriceFile._cache.clear()
+        yield
+        PriceFile._cache.clear()
+
+    def write_price_file(self, path, fetched_at: datetime) -> None:
+        data = load_json_fixture(PATH_TEST_PRICES)
+        data["timestamp"] = fetched_at.strftime("%Y-%m-%d %H:%M")
+        path.write_text(json.dumps(data), encoding="utf-8")
+
+    def make_cache(self, path) -> ScheduleCache:
+        price_file = PriceFile(TibberConnection("test_token"), str(path))
+        price_file.load_prices = AsyncMock()
+        return ScheduleCache("tests/fixtures/settings_test.toml", price_file)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_compiles_once_while_inputs_unchanged(self, tmp_path) -> None:
+        path = tmp_path / "prices.json"
+        self.write_price_file(path, datetime.now())
+        cache = self.make_cache(path)
+
+        first = await cache.get()
+        second = await cache.get()
+
+        assert first is second
+        assert first.today.day == date.today()
+        cache.price_file.load_prices.assert_not_awaited()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_recompiles_when_price_file_changes(self, tmp_path) -> None:
+        path = tmp_path / "prices.json"
+        self.write_price_file(path, datetime.now())
+        cache = self.make_cache(path)
+
+        first = await cache.get()
+        self.write_price_file(path, datetime.now() + timedelta(minutes=1))
+        second = await cache.get()
+
+        assert first is not second
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_promotes_tomorrow_without_waiting_for_tibber(self, tmp_path) -> None:
+        path = tmp_path / "prices.json"
+        self.write_price_file(path, datetime.now() - timedelta(days=1))
+        cache = self.make_cache(path)
+
+        schedule = await cache.get()
+        await asyncio.sleep(0)  # let the background refresh start
+
+        assert schedule.today.day == date.today()
+        assert schedule.today.slots == 24
+        cache.price_file.load_prices.assert_awaited_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_waits_for_prices_without_price_file(self, tmp_path) -> None:
+        path = tmp_path / "prices.json"
+        cache = self.make_cache(path)
+        cache.price_file.load_prices.side_effect = lambda: self.write_price_file(
+            path, datetime.now()
+        )
+
+        schedule = await cache.get()
+
+        assert schedule.today.day == date.today()
+        cache.price_file.load_prices.assert_awaited_once()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_never_refreshes_when_prefetched(self, tmp_path) -> None:
+        path = tmp_path / "prices.json"
+        self.write_price_file(path, datetime.now() - timedelta(days=2))
+        cache = self.make_cache(path)
+        cache.refresh_on_demand = False
+
+        with pytest.raises(LookupError):
+            await cache.get()
+        await asyncio.sleep(0)
+
+        cache.price_file.load_prices.assert_not_awaited()
@@ -0,0 +1,178 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.sites import MultiSiteEngine, Site, SiteMatrix
+from price_driven_switch.backend.switch_logic import limit_power_table
+
+
+def random_table(rng: np.random.Generator, count: int) -> ApplianceTable:
+    return ApplianceTable(
+        names=tuple(f"Appliance {index}" for index in range(count)),
+        power=rng.choice([0.5, 0.8, 1.0, 1.5, 2.0], size=count),
+        priority=rng.integers(1, 4, size=count),
+        setpoint=rng.random(count),
+        on=np.zeros(count, dtype=bool),
+        group=(None,) * count,
+    )
+
+
+class TestSiteMatrix:
+    @pytest.mark.unit
+    def test_price_states_per_site(self) -> None:
+        tables = (
+            ApplianceTable.from_settings(
+                {"Appliances": {"A": {"Power": 1.0, "Priority": 1, "Setpoint": 0.5}}}
+            ),
+            ApplianceTable.from_settings(
+                {
+                    "Appliances": {
+                        "A": {"Power": 1.0, "Priority": 1, "Setpoint": 0.2},
+                        "B": {"Power": 1.0, "Priority": 1, "Setpoint": 0.9},
+                    }
+                }
+            ),
+        )
+        matrix = SiteMatrix.from_tables(tables)
+
+        on = matrix.price_states(np.array([0.4, 0.4]))
+
+        # The padding column of the first site is never ON
+        assert on.tolist() == [[True, False], [False, True]]
+        assert [table.on_names() for table in matrix.rows(on)] == [["A"], ["B"]]
+
+    @pytest.mark.unit
+    def test_matches_single_site_limiter(self) -> None:
+        rng = np.random.default_rng(7)
+        tables = tuple(random_table(rng, int(rng.integers(1, 6))) for _ in range(200))
+        matrix = SiteMatrix.from_tables(tables)
+        width = matrix.power.shape[1]
+
+        def padded(states: list[np.ndarray]) -> np.ndarray:
+            return np.array(
+                [np.pad(on, (0, width - len(on))) for on in states], dtype=bool
+            )
+
+        price = [rng.random(len(table)) < 0.7 for table in tables]
+        previous = [rng.random(len(table)) < 0.5 for table in tables]
+        prev_valid = rng.random(len(tables)) < 0.8
+        power_limit = rng.choice([0.0, 1.0, 2.5, 4.0], size=len(tables))
+        power_now = rng.choice([0, 500, 2500, 4000, 7000], size=len(tables))
+
+        result = matrix.limit_power(
+            padded(price), power_limit, power_now, padded(previous), prev_valid
+        )
+
+        for row, table in enumerate(tables):
+            prev_states = (
+                table.with_on(previous[row])
+                if prev_valid[row]
+                else ApplianceTable.empty()
+            )
+            expected = limit_power_table(
+                table.with_on(price[row]),
+                float(power_limit[row]),
+                int(power_now[row]),
+                prev_states,
+            )
+            assert result[row, : len(table)].tolist() == expected.on.tolist()
+
+
+class TestMultiSiteEngine:
+    @pytest.mark.unit
+    def test_from_directory_finds_sites(self, sites_directory) -> None:
+        engine = MultiSiteEngine.from_directory(str(sites_directory))
+
+        assert list(engine.sites) == ["cabin", "house"]
+        assert MultiSiteEngine.from_directory(str(sites_directory / "x")).sites == {}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_decides_all_sites_in_one_batch(self, sites_directory) -> None:
+        engine = MultiSiteEngine.from_directory(str(sites_directory))
+        engine.sites["cabin"].realtime.power_reading = 2100
+
+        decisions = await engine.decide()
+
+        cabin = decisions["cabin"]
+        # Setpoint 1.0: all ON by price, Floor shed to get under 2 kW
+        assert cabin.price_states.on_names() == ["Boiler 1", "Floor"]
+        assert cabin.states.on_names() == ["Boiler 1"]
+        assert cabin.power_limit == 2.0
+        # Setpoint 0.0: only the cheapest slot is ON, no power limit
+        house = decisions["house"]
+        assert house.states.on.tolist() == house.price_states.on.tolist()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_keeps_previous_states_between_decisions(
+        self, sites_directory
+    ) -> None:
+        engine = MultiSiteEngine.from_directory(str(sites_directory))
+        cabin = engine.sites["cabin"].realtime
+        cabin.power_reading = 2100
+        await engine.decide()
+
+        # 1.9 kW is under the limit, but not by the 0.8 kW the Floor needs
+        cabin.power_reading = 1900
+        decisions = await engine.decide()
+
+        assert decisions["cabin"].states.on_names() == ["Boiler 1"]
+
+    @pytest.mark.unit
+    def test_from_directory_rejects_incomplete_sites(self, sites_directory) -> None:
+        settings = sites_directory / "cabin" / "settings.toml"
+        settings.write_text(
+            settings.read_text().replace(
+                "[Settings]\n", '[Settings]\nSheddingStrategy = "knapsack"\n'
+            )
+        )
+        with pytest.raises(ValueError, match="SheddingStrategy"):
+            MultiSiteEngine.from_directory(str(sites_directory))
+
+        (sites_directory / "house" / ".env").unlink()
+        with pytest.raises(ValueError, match="no TIBBER_TOKEN"):
+            Site.from_directory(str(sites_directory / "house"))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_a_failing_site_does_not_hold_back_the_others(
+        self, sites_directory
+    ) -> None:
+        engine = MultiSiteEngine.from_directory(str(sites_directory))
+        settings = sites_directory / "house" / "settings.toml"
+        settings.write_text(
+            settings.read_text().replace(
+                "[Settings]\n", "[Settings]\nUseCapacityTariff = true\n"
+            )
+        )
+
+        decisions = await engine.decide()
+
+        assert list(decisions) == ["cabin"]
+        assert "UseCapacityTariff" in engine.errors["house"]
+        assert (await engine.latest("cabin")).states.on_names() == ["Boiler 1", "Floor"]
+        with pytest.raises(LookupError, match="house"):
+            await engine.latest("house")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_run_recomputes_only_the_triggered_site(
+        self, sites_directory
+    ) -> None:
+        engine = MultiSiteEngine.from_directory(str(sites_directory))
+        task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.05)
+        house = engine.snapshots["house"]
+
+        engine.sites["cabin"].realtime.power_reading = 2100
+        engine.trigger("cabin")
+        await asyncio.sleep(0.05)
+
+        cabin = await engine.latest("cabin")
+        assert cabin.power_now == 2100
+        assert cabin.states.on_names() == ["Boiler 1"]
+        assert await engine.latest("house") is house
+        task.cancel()
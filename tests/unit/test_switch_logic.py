@@ -1,7 +1,19 @@
+from unittest.mock import patch
+
 import pandas as pd
 import pytest
 
-from price_driven_switch.backend.switch_logic import limit_power, load_appliances_df
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.decision_events import (
+    AppliancesSwitched,
+    PowerChecked,
+)
+from price_driven_switch.backend.switch_logic import (
+    decide_power_limit,
+    get_price_based_states,
+    limit_power,
+    load_appliances_df,
+)
 
 
 @pytest.mark.unit
@@ -135,3 +147,81 @@ def test_limit_power_specific_cases():
 
         # Check if the 'on' status of each appliance matches the expected value
         assert list(result_df["on"]) == case["expected_on"]
+
+
+def knapsack_case() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """One large, least important appliance next to two small ones."""
+    states = pd.DataFrame(
+        {
+            "Power": [3.0, 0.5, 0.5],
+            "Priority": [1, 2, 3],
+            "on": [True, True, True],
+        },
+        index=pd.Index(["Heater", "Boiler", "Floor"], name="Appliance"),
+    )
+    return states, states.copy()
+
+
+@pytest.mark.unit
+def test_knapsack_strategy_sheds_less_than_greedy() -> None:
+    states, previous = knapsack_case()
+
+    greedy = limit_power(states, 3.6, 4000, previous)
+    knapsack = limit_power(states, 3.6, 4000, previous, strategy="knapsack")
+
+    # Greedy switches off the whole 3 kW tier, 0.5 kW is enough
+    assert greedy["on"].tolist() == [False, True, True]
+    assert knapsack["on"].tolist() == [True, False, True]
+
+
+@pytest.mark.unit
+def test_knapsack_strategy_restores_best_fit() -> None:
+    states, previous = knapsack_case()
+    previous["on"] = False
+
+    greedy = limit_power(states, 4.1, 500, previous)
+    knapsack = limit_power(states, 4.1, 500, previous, strategy="knapsack")
+
+    # 3.6 kW reserve: greedy restores by priority number while it fits
+    assert greedy["on"].tolist() == [True, True, False]
+    assert knapsack["on"].tolist() == [True, False, True]
+
+
+@pytest.mark.unit
+def test_knapsack_strategy_falls_back_to_greedy() -> None:
+    states, previous = knapsack_case()
+
+    result = limit_power(
+        states, 3.6, 4000, previous, strategy="knapsack", budget_ms=0.0
+    )
+
+    assert result["on"].tolist() == [False, True, True]
+
+
+@pytest.mark.unit
+def test_get_price_based_states_leaves_input_unchanged(settings_dict_fixture) -> None:
+    appliances = load_appliances_df(settings_dict_fixture)
+
+    result = get_price_based_states(appliances, 0.4)
+
+    assert "on" in result
+    assert "on" not in appliances
+
+
+@pytest.mark.unit
+def test_decide_power_limit_returns_events_without_logging() -> None:
+    states, previous = knapsack_case()
+    switch_states = ApplianceTable.from_frame(states)
+
+    with patch("price_driven_switch.backend.logging_utils.logger") as mock_logger:
+        result = decide_power_limit(
+            switch_states, 3.6, 4000, ApplianceTable.from_frame(previous)
+        )
+
+    mock_logger.info.assert_not_called()
+    assert result.states.on.tolist() == [False, True, True]
+    assert switch_states.on.all()
+    checked, switched = result.events
+    assert isinstance(checked, PowerChecked) and checked.action == "OVER"
+    assert isinstance(switched, AppliancesSwitched) and not switched.on
+    assert list(switched) == [("Heater", 3.0, 1)]
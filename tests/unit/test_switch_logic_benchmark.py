@@ -0,0 +1,75 @@
+import statistics
+import timeit
+
+import numpy as np
+import pytest
+from loguru import logger
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.switch_logic import limit_power_table
+
+APPLIANCE_COUNT = 1000
+
+
+def apartment_block(on: np.ndarray) -> ApplianceTable:
+    rng = np.random.default_rng(42)
+    names = tuple(f"Appliance {number}" for number in range(APPLIANCE_COUNT))
+    return ApplianceTable(
+        names=names,
+        power=rng.uniform(0.5, 3.0, APPLIANCE_COUNT).round(2),
+        # Sparse priorities are no slower than dense ones
+        priority=rng.choice([1, 10, 100, 1000], APPLIANCE_COUNT),
+        setpoint=rng.uniform(0, 1, APPLIANCE_COUNT),
+        on=on,
+        group=(None,) * APPLIANCE_COUNT,
+    )
+
+
+@pytest.fixture(autouse=True)
+def silence_log_sinks():
+    """Time the decision itself, not the file sinks other modules configured."""
+    logger.disable("price_driven_switch")
+    yield
+    logger.enable("price_driven_switch")
+
+
+def median_time(function) -> float:
+    function()  # first run logs every state change
+    return statistics.median(timeit.repeat(function, number=1, repeat=50))
+
+
+@pytest.mark.benchmark
+def test_shedding_1000_appliances_under_1ms() -> None:
+    switch_states = apartment_block(np.ones(APPLIANCE_COUNT, dtype=bool))
+    total_w = switch_states.power.sum() * 1000
+
+    def shed_half():
+        return limit_power_table(
+            switch_states,
+            power_limit=total_w / 2000,
+            power_now=int(total_w),
+            prev_states=ApplianceTable.empty(),
+        )
+
+    result = shed_half()
+    assert 0 < result.on.sum() < APPLIANCE_COUNT
+    assert median_time(shed_half) < 1e-3
+
+
+@pytest.mark.benchmark
+def test_restoring_1000_appliances_under_1ms() -> None:
+    switch_states = apartment_block(np.ones(APPLIANCE_COUNT, dtype=bool))
+    prev_states = switch_states.with_on(np.arange(APPLIANCE_COUNT) % 2 == 0)
+    total_w = switch_states.power.sum() * 1000
+
+    def restore():
+        return limit_power_table(
+            switch_states,
+            power_limit=total_w / 1000,
+            power_now=int(total_w / 2),
+            prev_states=prev_states,
+        )
+
+    result = restore()
+    assert result.on.sum() > prev_states.on.sum()
+    assert median_time(restore) < 1e-3
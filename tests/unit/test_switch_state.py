@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from price_driven_switch.backend.appliance_table import ApplianceTable
+from price_driven_switch.backend.switch_logic import limit_power
+from price_driven_switch.backend.switch_state import (
+    StateConflictError,
+    SwitchStateStore,
+)
+
+
+def frame(on: bool) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"Power": [1.0], "Priority": [1], "Setpoint": [0.5], "on": [on]},
+        index=pd.Index(["Boiler 1"], name="Appliance"),
+    )
+
+
+def states(on: bool) -> ApplianceTable:
+    return ApplianceTable.from_frame(frame(on))
+
+
+class TestSwitchStateStore:
+    @pytest.mark.unit
+    def test_compare_and_swap_increments_sequence(self) -> None:
+        store = SwitchStateStore(states(False))
+
+        record = store.compare_and_swap(0, states(True))
+
+        assert record is not None
+        assert record.sequence == 1
+        assert store.current is record
+        assert record.states.on.tolist() == [True]
+
+    @pytest.mark.unit
+    def test_stale_compare_and_swap_is_rejected(self) -> None:
+        store = SwitchStateStore(states(False))
+        store.compare_and_swap(0, states(True))
+
+        assert store.compare_and_swap(0, states(False)) is None
+        assert store.current.sequence == 1
+
+    @pytest.mark.unit
+    def test_record_states_are_read_only(self) -> None:
+        store = SwitchStateStore(states(False))
+        record = store.compare_and_swap(0, states(True))
+
+        with pytest.raises(ValueError):
+            record.states.on[0] = False
+
+        assert record.states.on.tolist() == [True]
+
+    @pytest.mark.unit
+    def test_update_retries_after_concurrent_decision(self) -> None:
+        store = SwitchStateStore(states(False))
+        seen = []
+
+        def decide(previous):
+            seen.append(previous.sequence)
+            if len(seen) == 1:
+                # Another decision is published while this one is computed
+                store.compare_and_swap(previous.sequence, states(False))
+            return states(True)
+
+        record = store.update(decide)
+
+        assert seen == [0, 1]
+        assert record.sequence == 2
+
+    @pytest.mark.unit
+    def test_update_gives_up_after_max_attempts(self) -> None:
+        store = SwitchStateStore(states(False))
+
+        def always_conflicting(previous):
+            store.compare_and_swap(previous.sequence, states(False))
+            return states(True)
+
+        with pytest.raises(StateConflictError):
+            store.update(always_conflicting, max_attempts=3)
+
+
+@pytest.mark.unit
+def test_limit_power_does_not_modify_its_inputs() -> None:
+    switch_states = frame(True)
+    prev_states = frame(True)
+
+    result = limit_power(
+        switch_states, power_limit=1, power_now=5000, prev_states=prev_states
+    )
+
+    assert bool(result.at["Boiler 1", "on"]) is False
+    assert bool(switch_states.at["Boiler 1", "on"]) is True
+    assert bool(prev_states.at["Boiler 1", "on"]) is True
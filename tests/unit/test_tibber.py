@@ -3,7 +3,10 @@ from unittest.mock import AsyncMock, patch
 import pytest
 from python_graphql_client import GraphqlClient
 
-from price_driven_switch.backend.tibber_connection import TibberConnection
+from price_driven_switch.backend.tibber_connection import (
+    TibberConnection,
+    TibberRealtimeConnection,
+)
 
 
 class TestTibbberConnection:
@@ -88,3 +91,46 @@ class TestTibbberConnection:
             tibber = TibberConnection("agsga")
             result = await tibber.check_token_validity()
             assert result is False
+
+
+class TestTibberRealtimeConnection:
+    @pytest.mark.unit
+    def test_update_callback_notifies_listeners(self, tibber_test_token):
+        connection = TibberRealtimeConnection(tibber_test_token)
+        readings = []
+        connection.add_listener(readings.append)
+
+        connection._update_callback({"data": {"liveMeasurement": {"power": 1234}}})
+        connection._update_callback({"data": {}})
+
+        assert readings == [1234]
+        assert connection.power_reading == 1234
+
+    @pytest.mark.unit
+    def test_failing_listener_does_not_stop_the_others(self, tibber_test_token):
+        connection = TibberRealtimeConnection(tibber_test_token)
+        readings = []
+
+        def failing(_power: int) -> None:
+            raise ValueError("broken estimator")
+
+        connection.add_listener(failing)
+        connection.add_listener(readings.append)
+
+        connection._update_callback({"data": {"liveMeasurement": {"power": 1234}}})
+        connection._update_callback({"data": {"liveMeasurement": {"power": 1300}}})
+
+        assert readings == [1234, 1300]
+
+    @pytest.mark.unit
+    def test_update_callback_records_history(self, tibber_test_token):
+        connection = TibberRealtimeConnection(tibber_test_token)
+
+        connection._update_callback(
+            {"data": {"liveMeasurement": {"power": 1234, "voltagePhase1": 230.5}}}
+        )
+
+        _, values = connection.history.ordered()
+        fields = connection.history.fields
+        assert values[0, fields.index("power")] == 1234
+        assert values[0, fields.index("voltagePhase1")] == 230.5